@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import metrics
+from catalog import ANALYTICS_TABLES, dataset_path
+from longform import DEFAULT_MEASURE, dataset_panel
+from response_cache import write_atomic
+from states import state_key
+from storage import load_versioned, read_store, write_store
+
+# Aggregate tables kept per dataset version, e.g. data/analytics/saved/:
+#   <table>.npstore   the table itself (columnar, see storage.py)
+#   <table>.json      the version it was built from and a hash of every state's row
+# A new version of the data only recomputes what its changed rows affect: growth for the
+# changed states, ranks and percentiles for the periods where some value changed, and the
+# joined rows of the changed states.
+ANALYTICS_DIR = os.path.join('data', 'analytics')
+PLASTIC_MEASURE = DEFAULT_MEASURE
+DISCHARGE_MEASURE = 'wastewater_discharge__mld_'
+BOD_MEASURE = 'bod_load__tpd_'
+REGION_TABLES = {
+    'plastic': ('plastic', PLASTIC_MEASURE),
+    'wastewater_discharge': ('wastewater', DISCHARGE_MEASURE),
+    'bod_load': ('wastewater', BOD_MEASURE),
+}
+JOINED_TABLE = 'plastic_bod'
+TABLES = ANALYTICS_TABLES
+JOINED_VALUES = {'plastic_waste_tonnes': 'plastic', 'bod_load_tpd': 'bod_load',
+                 'wastewater_discharge_mld': 'wastewater_discharge'}
+
+_latest = {}  # name -> the table last built, which the next version is refreshed from
+
+def _digest(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _unique_rows(panel):
+    # First row of each normalized state name, in panel order.
+    keys, rows = {}, []
+    for position, region in enumerate(panel['regions']):
+        key = state_key(region)
+        if key not in keys:
+            keys[key] = position
+            rows.append(position)
+    return list(keys), np.asarray(rows, dtype=np.intp)
+
+def _matrix(table, column):
+    return table[column].to_numpy(dtype=np.float64).reshape(len(table.attrs['keys']), -1)
+
+def yoy_growth(values, periods):
+    # Change from the year before, as a fraction; NaN where either year is missing or zero.
+    growth = np.full(values.shape, np.nan)
+    if values.shape[1] > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = values[:, 1:] / values[:, :-1] - 1
+        consecutive = np.diff(periods) == 1
+        growth[:, 1:] = np.where(consecutive & np.isfinite(change), change, np.nan)
+    return growth
+
+def rank_column(values):
+    # Rank 1 is the largest value, ties share the better rank; the percentile is the share
+    # of reporting states at or below the value. Both NaN where nothing was reported.
+    reported = ~np.isnan(values)
+    ordered = np.sort(values[reported])
+    at_or_below = np.searchsorted(ordered, values, side='right')
+    rank = np.where(reported, 1 + len(ordered) - at_or_below, np.nan)
+    percentile = np.where(reported, 100.0 * at_or_below / max(len(ordered), 1), np.nan)
+    return rank, percentile
+
+def region_table(panel, previous=None):
+    # One row per state and period (state-major): value, rank, percentile and YoY growth.
+    keys, rows = _unique_rows(panel)
+    periods = np.asarray(panel['periods'], dtype=np.int64)
+    values = panel['values'][rows]
+    regions = [panel['regions'][row] for row in rows]
+    hashes = [_digest(region, values[i].tobytes()) for i, region in enumerate(regions)]
+
+    usable = previous is not None and previous.attrs['periods'] == periods.tolist()
+    old_rows = {key: i for i, key in enumerate(previous.attrs['keys'])} if usable else {}
+    old_hashes = previous.attrs['row_hashes'] if usable else []
+    same = np.array([key in old_rows and old_hashes[old_rows[key]] == digest for key, digest in zip(keys, hashes)],
+                    dtype=bool)
+    changed = ~same if usable else np.ones(len(keys), dtype=bool)
+
+    growth = np.full(values.shape, np.nan)
+    rank = np.full(values.shape, np.nan)
+    percentile = np.full(values.shape, np.nan)
+    dirty = np.ones(len(periods), dtype=bool)
+    if usable:
+        old_position = np.array([old_rows.get(key, -1) for key in keys], dtype=np.intp)
+        kept = old_position[same]
+        growth[same] = _matrix(previous, 'yoy_growth')[kept]
+        # A period needs new ranks when a value in it changed, appeared or disappeared.
+        old_values = _matrix(previous, 'value')
+        matched = old_position >= 0
+        before = np.full(values.shape, np.nan)
+        before[matched] = old_values[old_position[matched]]
+        differs = ~((before == values) | (np.isnan(before) & np.isnan(values)))
+        removed = np.setdiff1d(np.arange(len(old_values)), old_position[matched])
+        dirty = differs.any(axis=0) | (~np.isnan(old_values[removed])).any(axis=0)
+        # Elsewhere ranks carry over; a state new to the data has nothing reported there.
+        for column, target in (('rank', rank), ('percentile', percentile)):
+            carried = np.full(values.shape, np.nan)
+            carried[matched] = _matrix(previous, column)[old_position[matched]]
+            target[:, ~dirty] = carried[:, ~dirty]
+    growth[changed] = yoy_growth(values[changed], periods)
+    for column in np.flatnonzero(dirty):
+        rank[:, column], percentile[:, column] = rank_column(values[:, column])
+    metrics.count('analytics_rows_recomputed', int(changed.sum()), table='region')
+
+    repeat = len(periods)
+    table = pd.DataFrame({
+        'state': np.repeat(np.asarray(regions, dtype=object), repeat),
+        'key': np.repeat(np.asarray(keys, dtype=object), repeat),
+        'period': np.tile(periods, len(keys)),
+        'label': np.tile(np.asarray(panel['labels'], dtype=object), len(keys)),
+        'value': values.ravel(),
+        'rank': rank.ravel(),
+        'percentile': percentile.ravel(),
+        'yoy_growth': growth.ravel(),
+    })
+    table.attrs.update(version=panel['hash'], periods=periods.tolist(), keys=keys, row_hashes=hashes,
+                       recomputed={'rows': int(changed.sum()), 'periods': int(dirty.sum())})
+    return table
+
+def joined_table(tables, previous=None):
+    # Plastic waste next to Ganga BOD load and discharge, for the states (matched by
+    # normalized name) and periods present in both datasets.
+    sources = {column: tables[name] for column, name in JOINED_VALUES.items()}
+    plastic = tables['plastic']
+    rows = {column: {key: i for i, key in enumerate(table.attrs['keys'])} for column, table in sources.items()}
+    keys = [key for key in plastic.attrs['keys'] if all(key in index for index in rows.values())]
+    periods = [period for period in plastic.attrs['periods'] if all(period in table.attrs['periods'] for table in sources.values())]
+    hashes = [_digest(*(table.attrs['row_hashes'][rows[column][key]] for column, table in sources.items())) for key in keys]
+
+    usable = previous is not None and previous.attrs['periods'] == periods
+    old_rows = {key: i for i, key in enumerate(previous.attrs['keys'])} if usable else {}
+    old_position = np.array([old_rows.get(key, -1) for key in keys], dtype=np.intp)
+    same = np.array([old >= 0 and previous.attrs['row_hashes'][old] == digest
+                     for old, digest in zip(old_position, hashes)], dtype=bool)
+    columns = {}
+    for column, table in sources.items():
+        values = np.full((len(keys), len(periods)), np.nan)
+        if same.any():
+            values[same] = _matrix(previous, column)[old_position[same]]
+        changed = np.flatnonzero(~same)
+        picks = [table.attrs['periods'].index(period) for period in periods]
+        source_rows = np.array([rows[column][keys[i]] for i in changed], dtype=np.intp)
+        if len(changed):
+            values[changed] = _matrix(table, 'value')[source_rows][:, picks]
+        columns[column] = values
+    recomputed = int((~same).sum())
+    metrics.count('analytics_rows_recomputed', recomputed, table=JOINED_TABLE)
+
+    names = plastic['state'].to_numpy()[::max(len(plastic.attrs['periods']), 1)]
+    states = [names[rows['plastic_waste_tonnes'][key]] for key in keys]
+    labels = dict(zip(plastic['period'], plastic['label']))
+    table = pd.DataFrame({
+        'state': np.repeat(np.asarray(states, dtype=object), len(periods)),
+        'key': np.repeat(np.asarray(keys, dtype=object), len(periods)),
+        'period': np.tile(np.asarray(periods, dtype=np.int64), len(keys)),
+        'label': np.tile(np.asarray([labels[period] for period in periods], dtype=object), len(keys)),
+        **{column: values.ravel() for column, values in columns.items()},
+    })
+    table.attrs.update(version=_digest(*(table.attrs['version'] for table in sources.values())),
+                       periods=periods, keys=keys, row_hashes=hashes, recomputed={'rows': recomputed})
+    return table
+
+def _refresh(name, build, version):
+    previous = _latest.get(name)
+    if previous is not None and previous.attrs['version'] == version:
+        return previous
+    with metrics.span('analytics_refresh', table=name):
+        table = build(previous)
+    _latest[name] = table
+    return table
+
+def dataset_table(df, name):
+    # The materialized table of one dataset. Its version is the content hash of the panel it
+    # is built from, so the same data is served from the last table and new data refreshes
+    # it incrementally.
+    panel = dataset_panel(df, REGION_TABLES[name][1])
+    return _refresh(name, lambda previous: region_table(panel, previous), panel['hash'])
+
+def cross_table(plastic_df, wastewater_df):
+    tables = {'plastic': dataset_table(plastic_df, 'plastic'),
+              'bod_load': dataset_table(wastewater_df, 'bod_load'),
+              'wastewater_discharge': dataset_table(wastewater_df, 'wastewater_discharge')}
+    version = _digest(*(tables[name].attrs['version'] for name in JOINED_VALUES.values()))
+    return _refresh(JOINED_TABLE, lambda previous: joined_table(tables, previous), version)
+
+def period_rows(table, label=None):
+    # One period of a table (the latest by default), states in table order, or None for an
+    # unknown period.
+    if label is None:
+        if table.empty:
+            return None
+        label = table['label'].iloc[len(table.attrs['periods']) - 1]
+    rows = table[table['label'] == label]
+    return None if rows.empty else rows
+
+class AnalyticsStore:
+    # The tables on disk, so the next process (or the next fetch) starts from them.
+    def __init__(self, root=ANALYTICS_DIR):
+        self.root = root
+
+    def _path(self, name, suffix):
+        return os.path.join(self.root, f"{name}{suffix}")
+
+    def load(self, name):
+        try:
+            with open(self._path(name, '.json'), 'r', encoding='utf-8') as f:
+                attrs = json.load(f)
+            table = read_store(self._path(name, '.npstore'), mmap=False)
+        except (OSError, ValueError, KeyError):
+            return None
+        table.attrs.update(attrs)
+        return table
+
+    def save(self, name, table):
+        os.makedirs(self.root, exist_ok=True)
+        write_store(table, self._path(name, '.npstore'))
+        attrs = {key: table.attrs[key] for key in ('version', 'periods', 'keys', 'row_hashes')}
+        write_atomic(self._path(name, '.json'), json.dumps(attrs).encode('utf-8'))
+
+def materialize(source='saved', root=None):
+    # Every table for one data source, refreshed from what is on disk and saved back.
+    # Returns name -> table; a dataset whose file is missing is left out.
+    store = AnalyticsStore(root or os.path.join(ANALYTICS_DIR, source))
+    frames = {}
+    for dataset in ('plastic', 'wastewater'):
+        try:
+            frames[dataset] = load_versioned(dataset_path(dataset, source))[1]
+        except FileNotFoundError:
+            continue
+    names = [name for name, (dataset, _) in REGION_TABLES.items() if dataset in frames]
+    if len(frames) == 2:
+        names.append(JOINED_TABLE)
+    tables = {}
+    for name in names:
+        saved = store.load(name)
+        if name not in _latest and saved is not None:
+            _latest[name] = saved
+        if name == JOINED_TABLE:
+            tables[name] = cross_table(frames['plastic'], frames['wastewater'])
+        else:
+            tables[name] = dataset_table(frames[REGION_TABLES[name][0]], name)
+        if saved is None or saved.attrs['version'] != tables[name].attrs['version']:
+            store.save(name, tables[name])
+    return tables
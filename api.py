@@ -1,70 +1,388 @@
 import aiohttp
 import asyncio
+import email.utils
 import pandas as pd
+import random
 import sys
 import time
+from datetime import datetime, timezone
+import metrics
+from catalog import DATASETS, REQUESTS_PER_SECOND, dataset_path
+from ingest import CsvIngest, ListSink, RecordParser
+from response_cache import ResponseCache, cache_key
 
 API_KEY = "579b464db66ec23bdd0000010cebaf31b6854cb77de768e7e2d13018"
+PAGE_SIZE = 100
+MAX_CONCURRENT_PAGES = 8  # per resource
+MAX_CONNECTIONS = 16  # for everything fetched together
+BURST = 10
+MAX_BACKOFF = 60.0
+MAX_RETRY_AFTER = 120.0  # a server asking for a longer wait is treated as a failure, not waited out
 
-async def fetch_data_async(url, topic, retries=3, backoff_factor=2):
-    print(f"🚀 Initiating {topic} data fetch from data.gov.in...")
-    progress = 0
-    bar_length = 50
-    start_time = time.time()
-
-    async def update_progress():
-        nonlocal progress
-        while progress < 90:
-            filled = int(bar_length * progress // 100)
-            bar = '=' * filled + ' ' * (bar_length - filled)
-            elapsed_time = time.time() - start_time + 0.1
-            simulated_speed = (progress * 10) / elapsed_time
-            sys.stdout.write(f"\r[{bar}] {progress}%  Speed: {simulated_speed:.1f} KB/s")
-            sys.stdout.flush()
-            await asyncio.sleep(0.2)
-            progress += 10
-        filled = int(bar_length * progress // 100)
-        bar = '=' * filled + ' ' * (bar_length - filled)
-        elapsed_time = time.time() - start_time + 0.1
-        simulated_speed = (progress * 10) / elapsed_time
-        sys.stdout.write(f"\r[{bar}] {progress}%  Speed: {simulated_speed:.1f} KB/s")
+class HTTPStatusError(Exception):
+    def __init__(self, topic, status, retry_after=None):
+        super().__init__(f"Failed to fetch {topic} data: HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+class RateLimiter:
+    # Token bucket shared by every request of a fetch: `rate` requests per second on average
+    # and at most `burst` at once. A 429 pauses the whole bucket, since the quota is shared too.
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        # Waiters queue on the lock, so tokens go out in arrival order.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                metrics.count('rate_limit_waits')
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date.
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+def backoff_delay(attempt, backoff_factor, retry_after=None):
+    # The server's Retry-After wins. Otherwise "full jitter": a random wait below the
+    # exponential bound, so requests that failed together do not all retry together.
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 0.1 * retry_after)
+    return random.uniform(0, min(backoff_factor ** attempt, MAX_BACKOFF))
+
+class DownloadProgress:
+    def __init__(self, quiet=False, bar_length=50, refresh_interval=0.1):
+        self.quiet = quiet
+        self.bar_length = bar_length
+        self.refresh_interval = refresh_interval
+        self.start_time = time.time()
+        self.last_render = 0.0
+        self.received = 0
+        self.known_lengths = []
+        self.unsized_responses = 0
+        self.pending_pages = 0
+        self.total_known = False
+
+    def expected_bytes(self):
+        # Until the first page reports the record total we cannot know how many pages remain.
+        if not self.total_known or self.unsized_responses or not self.known_lengths:
+            return None
+        average = sum(self.known_lengths) / len(self.known_lengths)
+        return sum(self.known_lengths) + average * self.pending_pages
+
+    def set_remaining_pages(self, count):
+        self.pending_pages += count
+        self.total_known = True
+
+    def start_response(self, content_length):
+        self.pending_pages = max(self.pending_pages - 1, 0)
+        if content_length is None:
+            self.unsized_responses += 1
+        else:
+            self.known_lengths.append(content_length)
+
+    def discard_response(self, content_length, received):
+        self.pending_pages += 1
+        self.received -= received
+        if content_length is None:
+            self.unsized_responses -= 1
+        else:
+            self.known_lengths.remove(content_length)
+
+    def advance(self, nbytes):
+        self.received += nbytes
+        now = time.time()
+        if now - self.last_render >= self.refresh_interval:
+            self.last_render = now
+            self.render()
+
+    def render(self, done=False):
+        if self.quiet:
+            return
+        elapsed_time = max(time.time() - self.start_time, 1e-6)
+        speed = self.received / 1024 / elapsed_time
+        expected = self.expected_bytes()
+        if done:
+            percent = 100
+        elif expected:
+            percent = min(int(100 * self.received / expected), 99)
+        else:
+            percent = None
+        if percent is None:
+            sys.stdout.write(f"\r{self.received / 1024:,.1f} KB received  Speed: {speed:.1f} KB/s")
+        else:
+            filled = self.bar_length * percent // 100
+            bar = '=' * filled + ' ' * (self.bar_length - filled)
+            sys.stdout.write(f"\r[{bar}] {percent}%  Speed: {speed:.1f} KB/s")
         sys.stdout.flush()
 
+    def finish(self):
+        if not self.quiet:
+            self.render(done=True)
+            print()
+
+    def clear(self):
+        if not self.quiet:
+            sys.stdout.write("\r" + " " * 70 + "\r")
+            sys.stdout.flush()
+
+    def log(self, message):
+        if not self.quiet:
+            print(message)
+
+async def fetch_page_async(session, url, topic, offset, limit, progress, sink, retries=3, backoff_factor=2, chunk_size=64 * 1024, cache=None, limiter=None):
+    # Records are parsed as the bytes arrive and handed to the sink; the page's other
+    # top-level fields (total, count, ...) are returned once the body is complete.
+    params = {'offset': str(offset), 'limit': str(limit)}
+    key = meta = None
+
+    async def deliver(body):
+        parser = RecordParser()
+        await sink.begin()
+        with metrics.span('json_decode', topic=topic):
+            records = parser.feed(body)
+            header = parser.close()
+        await sink.write(records)
+        metrics.count('http_bytes', len(body), topic=topic, source='cache')
+        await sink.commit()
+        return header
+
+    if cache is not None:
+        key = cache_key(url, params)
+        meta = await asyncio.to_thread(cache.lookup, key)
+        if meta is not None and cache.is_fresh(meta):
+            body = await asyncio.to_thread(cache.read_body, key)
+            if body is not None:
+                metrics.count('response_cache_hits', topic=topic)
+                await asyncio.to_thread(cache.touch, key, meta)
+                progress.start_response(len(body))
+                progress.advance(len(body))
+                return await deliver(body)
+            meta = None
+        metrics.count('response_cache_misses', topic=topic)
+
     for attempt in range(retries):
-        progress_task = asyncio.create_task(update_progress())
+        content_length = None
+        received = 0
+        started = False
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    await progress_task
-                    if response.status == 200:
-                        progress = 100
-                        filled = bar_length
-                        bar = '=' * filled
-                        elapsed_time = time.time() - start_time + 0.1
-                        simulated_speed = (progress * 10) / elapsed_time
-                        sys.stdout.write(f"\r[{bar}] {progress}%  Speed: {simulated_speed:.1f} KB/s")
-                        sys.stdout.flush()
-                        print()
-                        data = await response.json()
-                        return pd.DataFrame(data['records'])
-                    else:
-                        raise Exception(f"Failed to fetch {topic} data: HTTP {response.status}")
+            headers = cache.conditional_headers(meta) if meta is not None else None
+            if limiter is not None:
+                await limiter.acquire()
+            # "Connect" runs until the response headers are in: pool wait, connection and server time.
+            connecting = metrics.start()
+            async with session.get(url, params=params, headers=headers) as response:
+                metrics.stop('http_connect', connecting, topic=topic)
+                metrics.count('http_responses', topic=topic, status=response.status)
+                if response.status == 304 and meta is not None:
+                    body = await asyncio.to_thread(cache.read_body, key)
+                    if body is None:
+                        meta = None
+                        raise Exception(f"Cached {topic} page disappeared during revalidation")
+                    metrics.count('response_cache_revalidated', topic=topic)
+                    await asyncio.to_thread(cache.revalidated, key, meta,
+                                            response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    progress.start_response(len(body))
+                    progress.advance(len(body))
+                    return await deliver(body)
+                if response.status != 200:
+                    raise HTTPStatusError(topic, response.status, parse_retry_after(response.headers.get('Retry-After')))
+                content_length = response.content_length
+                progress.start_response(content_length)
+                started = True
+                await sink.begin()
+                parser = RecordParser()
+                # The raw page is only kept when it is going into the response cache.
+                chunks = [] if cache is not None else None
+                transfer = metrics.start()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if chunks is not None:
+                        chunks.append(chunk)
+                    received += len(chunk)
+                    progress.advance(len(chunk))
+                    with metrics.span('json_decode', topic=topic):
+                        records = parser.feed(chunk)
+                    if records:
+                        await sink.write(records)
+                with metrics.span('json_decode', topic=topic):
+                    header = parser.close()
+                metrics.stop('http_transfer', transfer, topic=topic)
+                metrics.count('http_bytes', received, topic=topic, source='network')
+                if cache is not None:
+                    await asyncio.to_thread(cache.store, key, b''.join(chunks),
+                                            response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                await sink.commit()
+                return header
         except Exception as e:
-            progress_task.cancel()
-            sys.stdout.write("\r" + " " * 70 + "\r")
-            sys.stdout.flush()
-            if attempt < retries - 1:
-                wait_time = backoff_factor ** attempt
-                print(f"❌ Attempt {attempt + 1} failed: {str(e)}. Retrying in {wait_time} seconds...")
+            if started:
+                metrics.count('http_bytes', received, topic=topic, source='network')
+                progress.discard_response(content_length, received)
+                await sink.rollback()
+            progress.clear()
+            retry_after = getattr(e, 'retry_after', None)
+            if attempt < retries - 1 and (retry_after is None or retry_after <= MAX_RETRY_AFTER):
+                metrics.count('http_retries', topic=topic)
+                wait_time = backoff_delay(attempt, backoff_factor, retry_after)
+                if limiter is not None and getattr(e, 'status', None) == 429:
+                    limiter.pause(wait_time)
+                progress.log(f"❌ Attempt {attempt + 1} failed: {str(e)}. Retrying in {wait_time:.1f} seconds...")
                 await asyncio.sleep(wait_time)
             else:
-                print(f"❌ Failed to fetch {topic} data after {retries} attempts: {str(e)}")
+                progress.log(f"❌ Failed to fetch {topic} data after {retries} attempts: {str(e)}")
                 raise e
 
-async def fetch_plastic_waste_data():
-    url = f"https://api.data.gov.in/resource/ad39c33f-9d07-41a8-9a7d-06081e01617f?api-key={API_KEY}&format=json&limit=100"
-    return await fetch_data_async(url, "Plastic Waste")
+async def gather_or_cancel(coros):
+    # asyncio.gather, except that the first failure cancels the other tasks and waits for them
+    # to stop, so none keeps using the session, the limiter or a sink that is being discarded.
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def fetch_records_async(url, topic, new_sink, retries=3, backoff_factor=2, page_size=PAGE_SIZE, max_concurrency=MAX_CONCURRENT_PAGES, quiet=False, cache=None, session=None, limiter=None):
+    # new_sink(offset, capacity) returns where the records of one offset range go. A session
+    # passed in is shared with other fetches and left open.
+    if session is None:
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await fetch_records_async(url, topic, new_sink, retries, backoff_factor, page_size,
+                                             max_concurrency, quiet, cache, session, limiter)
+    progress = DownloadProgress(quiet=quiet)
+    progress.log(f"🚀 Initiating {topic} data fetch from data.gov.in...")
+    first_sink = new_sink(0, None)
+    first_page = await fetch_page_async(session, url, topic, 0, page_size, progress, first_sink,
+                                        retries, backoff_factor, cache=cache, limiter=limiter)
+    fetched = first_sink.count
+    total = int(first_page.get('total') or fetched)
+
+    # The API may cap `limit` below what we asked for, so step by what it actually returned.
+    step = fetched if 0 < fetched < page_size else page_size
+    offsets = range(fetched, total, step) if fetched else range(0)
+    progress.set_remaining_pages(len(offsets))
+    if offsets:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_range(offset, count):
+            # A short page leaves a gap; keep asking for the missing rows until the range is full.
+            sink = new_sink(offset, count)
+            while sink.count < count:
+                before = sink.count
+                async with semaphore:
+                    await fetch_page_async(session, url, topic, offset + sink.count, count - sink.count,
+                                           progress, sink, retries, backoff_factor, cache=cache, limiter=limiter)
+                if sink.count == before:
+                    break
+            return sink.count
+
+        counts = await gather_or_cancel(fetch_range(offset, min(step, total - offset)) for offset in offsets)
+        fetched += sum(counts)
+
+    if cache is not None:
+        await asyncio.to_thread(cache.evict)
+
+    if fetched != total:
+        progress.clear()
+        raise Exception(f"Incomplete {topic} data: received {fetched} of {total} records")
+
+    metrics.count('fetched_rows', fetched, topic=topic)
+    progress.finish()
+    if len(offsets) > 0:
+        progress.log(f"📄 Fetched {fetched} of {total} {topic} records in {len(offsets) + 1} pages.")
+    return total
+
+async def fetch_data_async(url, topic, retries=3, backoff_factor=2, page_size=PAGE_SIZE, max_concurrency=MAX_CONCURRENT_PAGES, quiet=False, cache=None):
+    sinks = {}
+
+    def new_sink(offset, capacity):
+        sinks[offset] = ListSink(capacity)
+        return sinks[offset]
+
+    await fetch_records_async(url, topic, new_sink, retries, backoff_factor, page_size, max_concurrency, quiet, cache)
+    with metrics.span('dataframe_build', topic=topic):
+        return pd.DataFrame([record for offset in sorted(sinks) for record in sinks[offset].records])
+
+async def ingest_async(url, topic, csv_path, retries=3, backoff_factor=2, page_size=PAGE_SIZE, max_concurrency=MAX_CONCURRENT_PAGES, quiet=False, cache=None, session=None, limiter=None, required_fields=()):
+    # Streams every page straight into csv_path: no DataFrame, no whole-body buffer, and no
+    # re-read to validate, since rows, field names and column types are checked on the way in.
+    ingest = CsvIngest(csv_path, topic, required_fields)
+    try:
+        total = await fetch_records_async(url, topic, ingest.sink, retries, backoff_factor, page_size,
+                                          max_concurrency, quiet, cache, session, limiter)
+        result = await ingest.finish()
+    finally:
+        await ingest.discard()
+    result['total'] = total
+    return result
+
+def resource_url(resource_id):
+    return f"https://api.data.gov.in/resource/{resource_id}?api-key={API_KEY}&format=json"
+
+def resource(name, csv_path=None):
+    dataset = DATASETS[name]
+    return {'name': name, 'topic': dataset['topic'], 'url': resource_url(dataset['resource']),
+            'path': csv_path or dataset_path(name), 'fields': dataset['fields']}
+
+_default_cache = None
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+async def fetch_all(resources, quiet=False, use_cache=True, max_connections=MAX_CONNECTIONS, rate=REQUESTS_PER_SECOND, burst=BURST):
+    # Every resource in one event loop, over one connection pool and under one rate limit.
+    # Returns name -> ingest result, or the exception that resource failed with; one failed
+    # resource does not stop the others.
+    cache = default_cache() if use_cache else None
+    limiter = RateLimiter(rate, burst)
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*(ingest_async(spec['url'], spec['topic'], spec['path'], quiet=quiet, cache=cache,
+                                                      session=session, limiter=limiter, required_fields=spec['fields'])
+                                         for spec in resources), return_exceptions=True)
+    return {spec['name']: result for spec, result in zip(resources, results)}
+
+async def fetch_resource(name, csv_path=None, quiet=False, use_cache=True):
+    result = (await fetch_all([resource(name, csv_path)], quiet, use_cache))[name]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+async def fetch_plastic_waste_data(csv_path, quiet=False, use_cache=True):
+    return await fetch_resource('plastic', csv_path, quiet, use_cache)
 
-async def fetch_wastewater_data():
-    url = f"https://api.data.gov.in/resource/e374f644-b9d4-4e2a-b55f-f3888859abd6?api-key={API_KEY}&format=json&limit=100"
-    return await fetch_data_async(url, "Wastewater")
\ No newline at end of file
+async def fetch_wastewater_data(csv_path, quiet=False, use_cache=True):
+    return await fetch_resource('wastewater', csv_path, quiet, use_cache)
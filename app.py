@@ -1,22 +1,34 @@
 import os
-import asyncio
-import shutil
-import matplotlib.pyplot as plt
-from api import fetch_plastic_waste_data, fetch_wastewater_data
-from prediction import is_file_valid, run_plastic_waste_prediction, run_wastewater_prediction
-from plotting import plot_plastic_waste_data, plot_wastewater_data, set_current_topic
+import sys
+import argparse
+from catalog import ANALYTICS_TABLES, BACKTEST_MIN_TRAIN, DATA_DIRS, DATASETS, LATEST_YEAR, REQUESTS_PER_SECOND, TREND_MODELS, dataset_path
+from params import parse_states, parse_years
+
+# pandas, aiohttp and matplotlib are imported by the commands that use them, so the
+# menu and --help come up without paying for them.
 
 os.makedirs("data/api_data", exist_ok=True)
 os.makedirs("data/SavedData", exist_ok=True)
 
 last_plotted_topic = None
 
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_NO_DATA = 3
+EXIT_BROKEN_PIPE = 141  # 128 + SIGPIPE, as a shell reports a process killed by a closed pipe
+
 def close_previous_plots(current_topic):
     global last_plotted_topic
     if last_plotted_topic is not None and (last_plotted_topic != current_topic or last_plotted_topic == current_topic):
-        plt.close('all')
+        close_all_figures()
     last_plotted_topic = current_topic
 
+def close_all_figures():
+    # Nothing to close if no chart was ever drawn, and no reason to import pyplot to find out.
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
 def display_welcome():
     border = "🌍" * 25
     print(f"\n{border}")
@@ -78,6 +90,29 @@ def get_numeric_choice(prompt, valid_choices):
             return choice
         print(f"❌ Invalid choice. Please select one of: {', '.join(valid_choices)}.\n")
 
+def review_saved_update(dataset, api_path, confirm, quiet=False):
+    # Every fetch and every state of SavedData is kept as a snapshot, so replacing the
+    # saved copy never loses history and the user sees what would change before agreeing.
+    from snapshots import SnapshotStore, format_diff, short_id
+    from storage import copy_dataset
+    store = SnapshotStore()
+    topic, key = DATASETS[dataset]['topic'], DATASETS[dataset]['key']
+    saved_path = dataset_path(dataset, 'saved')
+    fetched = store.commit_csv(dataset, api_path, ref='api')
+    saved = store.commit_csv(dataset, saved_path, ref='saved') if os.path.exists(saved_path) else None
+    if fetched == saved:
+        if not quiet:
+            print(f"✅ Saved {topic} Data already matches the fetched data ({short_id(fetched)}).\n")
+        return False
+    if saved is not None and not quiet:
+        print(f"\n📊 Changes from Saved {topic} Data ({short_id(saved)} -> {short_id(fetched)}):")
+        print(format_diff(store.diff(dataset, saved, fetched, key=key), key=key))
+    if not confirm():
+        return False
+    copy_dataset(api_path, saved_path)
+    store.set_ref(dataset, 'saved', fetched)
+    return True
+
 def main():
     display_welcome()
     
@@ -97,14 +132,14 @@ def main():
                         break
                     elif sub_choice == "1":
                         try:
-                            df = asyncio.run(fetch_plastic_waste_data())
+                            import asyncio
+                            from api import fetch_plastic_waste_data
                             api_path = 'data/api_data/plastic_waste_data.csv'
-                            df.to_csv(api_path, index=False)
+                            result = asyncio.run(fetch_plastic_waste_data(api_path))
                             print(f"✅ Data fetched from data.gov.in API and saved to {api_path}\n")
-                            if is_file_valid(api_path):
-                                if display_overwrite_option("Plastic Waste"):
+                            if result['rows']:
+                                if review_saved_update('plastic', api_path, lambda: display_overwrite_option("Plastic Waste")):
                                     saved_path = 'data/SavedData/plastic_waste_data.csv'
-                                    shutil.copy2(api_path, saved_path)
                                     print(f"✅ Saved Plastic Waste Data updated with new data at {saved_path}\n")
                             else:
                                 print(f"❌ Fetched Plastic Waste data at {api_path} is empty or invalid. Cannot use this data.\n")
@@ -127,6 +162,7 @@ def main():
                             print(f"❌ Data file at {data_path} is empty. Please fetch Plastic Waste data again (Option 1).\n")
                             continue
                         
+                        from prediction import run_plastic_waste_prediction
                         run_plastic_waste_prediction(data_path)
                     elif sub_choice == "3":
                         display_data_source_options("Plastic Waste")
@@ -144,11 +180,13 @@ def main():
                         if os.path.getsize(data_path) == 0:
                             print(f"❌ Data file at {data_path} is empty. Please fetch Plastic Waste data again (Option 1).\n")
                             continue
+                        from prediction import is_file_valid
                         if not is_file_valid(data_path):
                             print(f"❌ Data file at {data_path} contains no valid data. Please fetch Plastic Waste data again (Option 1).\n")
                             continue
                         
                         close_previous_plots("Plastic Waste")
+                        from plotting import plot_plastic_waste_data, set_current_topic
                         set_current_topic("Plastic Waste")
                         
                         plot_plastic_waste_data(data_path)
@@ -160,14 +198,14 @@ def main():
                         break
                     elif sub_choice == "1":
                         try:
-                            df = asyncio.run(fetch_wastewater_data())
+                            import asyncio
+                            from api import fetch_wastewater_data
                             api_path = 'data/api_data/wastewater_data.csv'
-                            df.to_csv(api_path, index=False)
+                            result = asyncio.run(fetch_wastewater_data(api_path))
                             print(f"✅ Data fetched from data.gov.in API and saved to {api_path}\n")
-                            if is_file_valid(api_path):
-                                if display_overwrite_option("Wastewater"):
+                            if result['rows']:
+                                if review_saved_update('wastewater', api_path, lambda: display_overwrite_option("Wastewater")):
                                     saved_path = 'data/SavedData/wastewater_data.csv'
-                                    shutil.copy2(api_path, saved_path)
                                     print(f"✅ Saved Wastewater Data updated with new data at {saved_path}\n")
                             else:
                                 print(f"❌ Fetched Wastewater data at {api_path} is empty or invalid. Cannot use this data.\n")
@@ -190,6 +228,7 @@ def main():
                             print(f"❌ Data file at {data_path} is empty. Please fetch Wastewater data again (Option 1).\n")
                             continue
                         
+                        from prediction import run_wastewater_prediction
                         run_wastewater_prediction(data_path)
                     elif sub_choice == "3":
                         display_data_source_options("Wastewater")
@@ -207,16 +246,304 @@ def main():
                         if os.path.getsize(data_path) == 0:
                             print(f"❌ Data file at {data_path} is empty. Please fetch Wastewater data again (Option 1).\n")
                             continue
+                        from prediction import is_file_valid
                         if not is_file_valid(data_path):
                             print(f"❌ Data file at {data_path} contains no valid data. Please fetch Wastewater data again (Option 1).\n")
                             continue
                         
                         close_previous_plots("Wastewater")
+                        from plotting import plot_wastewater_data, set_current_topic
                         set_current_topic("Wastewater")
                         
                         plot_wastewater_data(data_path)
     finally:
-        plt.close('all')
+        close_all_figures()
+
+def dataset_function(dataset, role):
+    # Resolve a dataset's predict, scenarios or backtest callable, importing its module on first use.
+    import importlib
+    module = importlib.import_module({'predict': 'prediction', 'scenarios': 'prediction', 'backtest': 'prediction'}[role])
+    return getattr(module, DATASETS[dataset][role])
+
+def load_valid_dataset(dataset, source):
+    from prediction import is_file_valid
+    from storage import load_dataset
+    data_path = dataset_path(dataset, source)
+    if not is_file_valid(data_path):
+        print(f"❌ Data file at {data_path} is missing, empty or invalid. Run 'fetch' first.", file=sys.stderr)
+        return None
+    return load_dataset(data_path)
+
+async def fetch_datasets(names, quiet=False, use_cache=True, rate=REQUESTS_PER_SECOND):
+    import api
+    return await api.fetch_all([api.resource(name) for name in names], quiet=quiet, use_cache=use_cache, rate=rate)
+
+def cmd_fetch(args):
+    names = list(DATASETS) if args.all else list(dict.fromkeys(args.dataset or []))
+    if not names:
+        print("❌ Nothing to fetch. Use --all or --dataset.", file=sys.stderr)
+        return EXIT_USAGE
+    import asyncio
+    # Concurrent progress bars would overwrite each other on one terminal line, so
+    # several datasets are fetched quietly and reported one line each below.
+    concurrent = len(names) > 1
+    if concurrent and not args.quiet:
+        print(f"🚀 Fetching {', '.join(DATASETS[name]['topic'] for name in names)} data concurrently...")
+    results = asyncio.run(fetch_datasets(names, quiet=args.quiet or concurrent, use_cache=not args.no_cache, rate=args.rate))
+    status = EXIT_OK
+    for name, result in results.items():
+        topic = DATASETS[name]['topic']
+        if isinstance(result, BaseException):
+            print(f"❌ Failed to fetch {topic} data: {str(result)}", file=sys.stderr)
+            status = EXIT_FAILURE
+            continue
+        api_path = result['path']
+        if not result['rows']:
+            print(f"❌ Fetched {topic} data at {api_path} is empty or invalid.", file=sys.stderr)
+            status = EXIT_FAILURE
+            continue
+        if not args.quiet:
+            print(f"✅ {topic} data saved to {api_path}")
+        if args.update_saved and review_saved_update(name, api_path, lambda: True, quiet=args.quiet):
+            if not args.quiet:
+                print(f"✅ Saved {topic} Data updated at {dataset_path(name, 'saved')}")
+    return status
+
+def cmd_predict(args):
+    df = load_valid_dataset(args.dataset, args.source)
+    if df is None:
+        return EXIT_NO_DATA
+    try:
+        if args.scenarios:
+            result = dataset_function(args.dataset, 'scenarios')(df, args.states, args.years,
+                                                                 scenarios=args.scenarios, seed=args.seed)
+        else:
+            result = dataset_function(args.dataset, 'predict')(df, args.states, args.years, model=args.model)
+    except ValueError as e:
+        print(f"❌ {str(e)}", file=sys.stderr)
+        return EXIT_USAGE
+    return write_frame(result, args.out, 'predictions')
+
+def write_frame(result, out, noun, float_format=None):
+    if out:
+        result.to_csv(out, index=False, float_format=float_format)
+        print(f"✅ {len(result)} {noun} written to {out}")
+        return EXIT_OK
+    try:
+        result.to_csv(sys.stdout, index=False, float_format=float_format)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. `head`) went away; stop writing and keep the interpreter from flushing again at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_BROKEN_PIPE
+    return EXIT_OK
+
+def cmd_backtest(args):
+    df = load_valid_dataset(args.dataset, args.source)
+    if df is None:
+        return EXIT_NO_DATA
+    from backtest import default_results_path, error_summary, save_results
+    models = list(dict.fromkeys(args.model or TREND_MODELS))
+    results = dataset_function(args.dataset, 'backtest')(df, models, workers=args.workers, min_train=args.min_train)
+    if results.empty:
+        print(f"❌ Not enough history in {dataset_path(args.dataset, args.source)} to backtest: "
+              f"each forecast needs {args.min_train} earlier years.", file=sys.stderr)
+        return EXIT_NO_DATA
+    path = save_results(results, args.out or default_results_path(args.dataset))
+    # The summary goes to stdout as CSV, so the message about the saved file goes to stderr.
+    print(f"✅ {len(results)} forecasts saved to {path}", file=sys.stderr)
+    summary = error_summary(results, ('state', 'model') if args.by_state else ('model',))
+    return write_frame(summary, None, 'rows', float_format='%.6g')
+
+def cmd_analytics(args):
+    from analytics import materialize, period_rows
+    tables = materialize(args.source)
+    if args.table not in tables:
+        print(f"❌ The {args.table} table needs data that is missing in {DATA_DIRS[args.source]}. Run 'fetch' first.",
+              file=sys.stderr)
+        return EXIT_NO_DATA
+    table = tables[args.table]
+    if args.year:
+        table = period_rows(table, args.year)
+        if table is None:
+            print(f"❌ No {args.year} data in the {args.table} table.", file=sys.stderr)
+            return EXIT_USAGE
+        if 'rank' in table:
+            table = table.sort_values('rank', kind='stable')
+    # Values are kept as float32 (see longform.py): print the digits they actually have.
+    return write_frame(table, args.out, 'rows', float_format='%.7g')
+
+def cmd_plot(args):
+    if args.dataset == 'plastic' and not args.state and not args.year:
+        print("❌ Plastic Waste plots need --state and/or --year.", file=sys.stderr)
+        return EXIT_USAGE
+    from chart_cache import ChartCache
+    from charts import plastic_comparison_spec, plastic_state_specs, wastewater_specs
+    data_path = dataset_path(args.dataset, args.source)
+    if not os.path.isfile(data_path) or os.path.getsize(data_path) == 0:
+        print(f"❌ Data file at {data_path} is missing, empty or invalid. Run 'fetch' first.", file=sys.stderr)
+        return EXIT_NO_DATA
+
+    # Charts already drawn from this exact file are reused; pandas is only needed to list
+    # every state, and matplotlib only if something has to be drawn.
+    cache = ChartCache(args.out_dir)
+    dataset_hash = cache.dataset_hash(data_path)
+    df = None
+    states = args.state or []
+    if args.dataset == 'wastewater':
+        specs = wastewater_specs(args.out_dir)
+    else:
+        if any(state.lower() == 'all' for state in states):
+            df = load_valid_dataset(args.dataset, args.source)
+            if df is None:
+                return EXIT_NO_DATA
+            from charts import plastic_states
+            states = plastic_states(df)
+        specs = [spec for state in states for spec in plastic_state_specs(state, args.out_dir)]
+        if args.year:
+            specs.append(plastic_comparison_spec(args.year, args.out_dir))
+    cached = {}
+    for spec in specs:
+        key = cache.key(dataset_hash, spec)
+        path = cache.lookup(key)
+        if path is not None:
+            cached[key] = path
+
+    status = EXIT_OK
+    if len(cached) == len(specs):
+        saved_files = [cached[cache.key(dataset_hash, spec)] for spec in specs]
+    else:
+        if df is None:
+            df = load_valid_dataset(args.dataset, args.source)
+            if df is None:
+                return EXIT_NO_DATA
+        from charts import plastic_comparison_job, plastic_state_jobs, wastewater_jobs
+        from render import render_jobs
+        if args.dataset == 'wastewater':
+            jobs = wastewater_jobs(df, args.out_dir)
+            if not jobs:
+                return EXIT_FAILURE
+        else:
+            jobs = []
+            for state in states:
+                state_jobs = plastic_state_jobs(df, state, args.out_dir)
+                if not state_jobs and not any(s.lower() == 'all' for s in args.state or []):
+                    status = EXIT_FAILURE
+                jobs.extend(state_jobs)
+            if args.year:
+                comparison = plastic_comparison_job(df, args.year, args.out_dir)
+                if comparison is None:
+                    status = EXIT_FAILURE
+                else:
+                    jobs.append(comparison)
+        missing = [(key, job) for key, job in ((cache.key(dataset_hash, job), job) for job in jobs) if key not in cached]
+        if missing:
+            render_jobs([job for _, job in missing], workers=args.workers)
+            for key, job in missing:
+                cache.store(key, job['path'])
+        saved_files = [job['path'] for job in jobs]
+    cache.save()
+
+    print(f"✅ {DATASETS[args.dataset]['topic']} plots saved to the '{args.out_dir}/' directory:")
+    for file in saved_files:
+        print(f"  - {file}")
+    return status
+
+def cmd_serve(args):
+    import server
+    server.run(args.host, args.port, args.workers)
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='app.py',
+        description="DhartiMetrics climate data tool. Run without a command for the interactive menu.")
+    parser.add_argument('--metrics-log', metavar='PATH', help="append this run's timings and counters to a JSON-lines log")
+    parser.add_argument('--metrics-prom', metavar='PATH', help="write this run's timings and counters in Prometheus text format")
+    subparsers = parser.add_subparsers(dest='command')
+
+    fetch_parser = subparsers.add_parser('fetch', help="Fetch datasets from data.gov.in")
+    fetch_parser.add_argument('--all', action='store_true', help="fetch every dataset concurrently")
+    fetch_parser.add_argument('--dataset', action='append', choices=list(DATASETS), help="dataset to fetch (repeatable)")
+    fetch_parser.add_argument('--update-saved', action='store_true', help="also overwrite data/SavedData")
+    fetch_parser.add_argument('--no-cache', action='store_true', help="bypass the on-disk response cache")
+    fetch_parser.add_argument('--quiet', action='store_true', help="no progress output")
+    fetch_parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, metavar='N',
+                              help=f"at most N requests per second across all datasets (default {REQUESTS_PER_SECOND:g}, 0 for no limit)")
+    fetch_parser.set_defaults(handler=cmd_fetch)
+
+    predict_parser = subparsers.add_parser('predict', help="Predict every state over a range of years")
+    predict_parser.add_argument('--dataset', required=True, choices=list(DATASETS))
+    predict_parser.add_argument('--states', type=parse_states, default=None,
+                                help="'all' or a comma-separated list of states (default: all)")
+    predict_parser.add_argument('--years', type=parse_years, default=list(range(LATEST_YEAR + 1, 2031)),
+                                help=f"year or range, e.g. 2025 or {LATEST_YEAR + 1}-2030")
+    predict_parser.add_argument('--model', choices=TREND_MODELS, default=TREND_MODELS[0],
+                                help="trend fitted to each state's history (default: auto)")
+    predict_parser.add_argument('--scenarios', type=int, default=0, metavar='N',
+                                help="simulate N scenarios per state and report percentile bands and impact probabilities")
+    predict_parser.add_argument('--seed', type=int, default=None, help="random seed, for repeatable --scenarios runs")
+    predict_parser.add_argument('--source', choices=list(DATA_DIRS), default='saved')
+    predict_parser.add_argument('--out', help="CSV output path (default: stdout)")
+    predict_parser.set_defaults(handler=cmd_predict)
+
+    backtest_parser = subparsers.add_parser('backtest', help="Measure forecast error by replaying history")
+    backtest_parser.add_argument('--dataset', required=True, choices=list(DATASETS))
+    backtest_parser.add_argument('--model', action='append', choices=TREND_MODELS,
+                                 help="model to test (repeatable, default: all)")
+    backtest_parser.add_argument('--min-train', type=int, default=BACKTEST_MIN_TRAIN, metavar='N',
+                                 help=f"years of history before the first forecast (default {BACKTEST_MIN_TRAIN})")
+    backtest_parser.add_argument('--by-state', action='store_true', help="MAE and MAPE per state, not only per model")
+    backtest_parser.add_argument('--source', choices=list(DATA_DIRS), default='saved')
+    backtest_parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU core)")
+    backtest_parser.add_argument('--out', help="results store (default: data/backtests/<dataset>_<time>.npstore)")
+    backtest_parser.set_defaults(handler=cmd_backtest)
+
+    analytics_parser = subparsers.add_parser('analytics', help="Rankings, growth and percentiles, and plastic vs BOD by state")
+    analytics_parser.add_argument('--table', choices=ANALYTICS_TABLES, default=ANALYTICS_TABLES[0])
+    analytics_parser.add_argument('--year', help="one period only, ranked, e.g. 2020-21")
+    analytics_parser.add_argument('--source', choices=list(DATA_DIRS), default='saved')
+    analytics_parser.add_argument('--out', help="CSV output path (default: stdout)")
+    analytics_parser.set_defaults(handler=cmd_analytics)
+
+    plot_parser = subparsers.add_parser('plot', help="Render charts to PNG without opening windows")
+    plot_parser.add_argument('--dataset', required=True, choices=list(DATASETS))
+    plot_parser.add_argument('--state', action='append', help="state for the time-series charts (repeatable, or 'all')")
+    plot_parser.add_argument('--year', help="year for the cross-state comparison, e.g. 2020-21")
+    plot_parser.add_argument('--source', choices=list(DATA_DIRS), default='saved')
+    plot_parser.add_argument('--out-dir', default='plots')
+    plot_parser.add_argument('--workers', type=int, default=None,
+                             help="rendering processes (default: one per CPU core)")
+    plot_parser.set_defaults(handler=cmd_plot)
+
+    serve_parser = subparsers.add_parser('serve', help="Serve predictions and charts over HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--workers', type=int, default=None,
+                              help="rendering processes (default: one per CPU core)")
+    serve_parser.set_defaults(handler=cmd_serve)
+    return parser
+
+def run_command(args):
+    if args.command is None:
+        main()
+        return EXIT_OK
+    return args.handler(args)
+
+def cli(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not (args.metrics_log or args.metrics_prom):
+        return run_command(args)
+    import metrics
+    metrics.enable()
+    try:
+        return run_command(args)
+    finally:
+        if args.metrics_log:
+            metrics.write_json_log(args.metrics_log, {'command': args.command})
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(cli())
\ No newline at end of file
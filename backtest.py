@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import metrics
+from catalog import BACKTEST_MIN_TRAIN as MIN_TRAIN, LATEST_YEAR, TREND_MODELS
+from storage import read_store, write_store
+from trends import evaluate_trends, fit_trends
+
+# Rolling-origin backtests: for every period after the first MIN_TRAIN, fit each model on
+# the periods before it and predict it, exactly as the predict commands would have done at
+# the time. Work is split into (block of states, model, origin) tasks for a process pool;
+# the panel goes to the workers as a memory-mapped .npy file, not through pickling.
+BACKTEST_DIR = os.path.join('data', 'backtests')
+TASKS_PER_WORKER = 4
+MIN_BLOCK_ROWS = 1024
+
+def origins(periods, min_train=MIN_TRAIN):
+    # Index of each period that is predicted; the model sees every period before it.
+    return list(range(min_train, len(periods)))
+
+def forecast(values, periods, model, origin, fallback_growth=0.0):
+    # One step ahead from `origin`: fit on values[:, :origin], predict periods[origin].
+    times = np.asarray(periods, dtype=float) - LATEST_YEAR
+    params = fit_trends(times[:origin], values[:, :origin], model, fallback_growth)
+    return evaluate_trends(params, times[origin:origin + 1])[:, 0]
+
+def run_task(task):
+    values_path, start, stop, periods, model, origin, fallback_growth = task
+    values = np.load(values_path, mmap_mode='r')[start:stop]
+    return start, model, origin, forecast(values, periods, model, origin, fallback_growth)
+
+def measured_task(task):
+    # Runs in a pool worker: what it measured goes back with the result for the parent to merge.
+    metrics.enable(events=False)
+    metrics.reset()
+    result = run_task(task)
+    return result, metrics.state()
+
+def _tasks(values_path, rows, periods, models, splits, fallback_growth, workers):
+    # Blocks small enough to keep every worker busy, large enough for numpy to pay off.
+    # Model-major order, so the results come back already sorted by model, period and state.
+    per_block = max(MIN_BLOCK_ROWS, -(-rows * len(models) * len(splits) // (workers * TASKS_PER_WORKER)))
+    return [(values_path, start, min(start + per_block, rows), periods, model, origin, fallback_growth)
+            for model in models for origin in splits for start in range(0, rows, per_block)]
+
+def backtest_panel(panel, models=TREND_MODELS, fallback_growth=0.0, workers=None, min_train=MIN_TRAIN):
+    # One row per state x model x origin with the actual and predicted value of the held-out
+    # period. States with nothing reported in it are left out.
+    periods = np.asarray(panel['periods'], dtype=np.int64)
+    values = np.ascontiguousarray(panel['values'], dtype=np.float64)
+    models = list(models)
+    splits = origins(periods, min_train)
+    workers = max(1, workers or os.cpu_count() or 1)
+    workdir = tempfile.mkdtemp(prefix='backtest-')
+    try:
+        values_path = os.path.join(workdir, 'values.npy')
+        np.save(values_path, values)
+        tasks = _tasks(values_path, len(values), periods, models, splits, fallback_growth, workers)
+        with metrics.span('backtest', workers=workers):
+            if workers == 1 or len(tasks) <= 1:
+                results = [run_task(task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+                    if not metrics.enabled:
+                        results = list(pool.map(run_task, tasks))
+                    else:
+                        results = []
+                        for result, measurements in pool.map(measured_task, tasks):
+                            metrics.merge(measurements)
+                            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # States and models are stored as categories: a code per row and each name once.
+    rows, model_codes, origin_index, actual, predicted = [], [], [], [], []
+    for start, model, origin, forecasts in results:
+        held_out = values[start:start + len(forecasts), origin]
+        keep = np.flatnonzero(~np.isnan(held_out) & ~np.isnan(forecasts))
+        rows.append((start + keep).astype(np.int32))
+        model_codes.append(np.full(len(keep), models.index(model), dtype=np.int8))
+        origin_index.append(np.full(len(keep), origin, dtype=np.int16))
+        actual.append(held_out[keep])
+        predicted.append(forecasts[keep])
+    join = lambda parts, dtype: np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    origin_index = join(origin_index, np.int16)
+    return pd.DataFrame({
+        'state': pd.Categorical.from_codes(join(rows, np.int32), categories=list(panel['regions'])),
+        'model': pd.Categorical.from_codes(join(model_codes, np.int8), categories=models),
+        'trained_to': periods[origin_index - 1],
+        'period': periods[origin_index],
+        'actual': join(actual, np.float64),
+        'predicted': join(predicted, np.float64),
+    })
+
+def error_summary(results, by=('state', 'model')):
+    # MAE in the data's own units, and MAPE (%) over the held-out values that are not zero.
+    errors = results.assign(abs_error=(results['predicted'] - results['actual']).abs())
+    actual = errors['actual'].abs()
+    errors['ape'] = np.where(actual > 0, 100.0 * errors['abs_error'] / actual.where(actual > 0, 1.0), np.nan)
+    grouped = errors.groupby(list(by), sort=True, observed=True)
+    return grouped.agg(mae=('abs_error', 'mean'), mape=('ape', 'mean'), splits=('abs_error', 'size')).reset_index()
+
+def default_results_path(dataset, root=BACKTEST_DIR):
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return os.path.join(root, f"{dataset}_{stamp}.npstore")
+
+def save_results(results, path):
+    return write_store(results, path)
+
+def load_results(path):
+    return read_store(path)
@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_SIZES = [1_000]
+EXTRA_YEARS = [10]  # plastic datasets are also generated with this many year columns
+FETCH_RECORDS = [1_000, 10_000]
+FETCH_PADDING = 0  # extra bytes per record, to try larger payloads
+FETCH_LATENCY = 0.0  # seconds the stub waits before answering each page
+# The wastewater and comparison charts draw a bar and a tick label per state: 10^3 synthetic
+# wastewater rows already take tens of seconds to draw, and past that nobody would read the
+# chart anyway.
+PLOT_MAX_ROWS = 1_000
+SCENARIO_MAX_ROWS = 100
+REPEAT = 5
+TIME_BUDGET = 10.0  # seconds per benchmark; large datasets stop repeating once it is spent
+DEFAULT_THRESHOLD = 1.25
+DEFAULT_OUT = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'latest.json')
+GROUPS = ('startup', 'fetch', 'load', 'predict', 'plot')
+
+def measure(fn, repeat=REPEAT, budget=TIME_BUDGET, setup=None):
+    timings = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        t0 = time.perf_counter()
+        fn() if setup is None else fn(state)
+        timings.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > budget:
+            break
+    return {'runs': len(timings), 'min': min(timings), 'median': statistics.median(timings),
+            'mean': statistics.fmean(timings)}
+
+def bench_name(group, name, params):
+    details = ' '.join(f"{key}={value}" for key, value in params.items())
+    return f"{group}.{name}[{details}]" if details else f"{group}.{name}"
+
+class Suite:
+    def __init__(self, repeat=REPEAT, budget=TIME_BUDGET, quiet=False):
+        self.repeat = repeat
+        self.budget = budget
+        self.quiet = quiet
+        self.results = []
+
+    def run(self, group, name, params, fn, setup=None, rows=None):
+        result = measure(fn, self.repeat, self.budget, setup)
+        result = {'name': bench_name(group, name, params), 'group': group, 'params': params, **result}
+        if rows:
+            result['rows_per_s'] = rows / result['median']
+        self.results.append(result)
+        if not self.quiet:
+            print(f"  {result['name']:<70} {result['median'] * 1000:>10.2f} ms  ({result['runs']} runs)")
+        return result
+
+class StubServer:
+    # A data.gov.in lookalike on a thread of its own, so serving pages does not share the
+    # event loop (or its timings) with the client being measured.
+    def __init__(self, records, latency=0.0):
+        self.records = records
+        self.latency = latency
+        self._pages = {}
+        self._ready = threading.Event()
+        self._thread = None
+        self._loop = None
+        self.url = None
+
+    async def _handler(self, request):
+        from aiohttp import web
+        offset = int(request.query.get('offset', 0))
+        limit = int(request.query.get('limit', 10))
+        body = self._pages.get((offset, limit))
+        if body is None:
+            page = self.records[offset:offset + limit]
+            body = self._pages[(offset, limit)] = json.dumps(
+                {'total': len(self.records), 'count': len(page), 'records': page}).encode('utf-8')
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.Response(body=body, content_type='application/json')
+
+    def _serve(self):
+        from aiohttp import web
+
+        async def start():
+            app = web.Application()
+            app.router.add_get('/resource/bench', self._handler)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.url = f"http://127.0.0.1:{port}/resource/bench?api-key=bench&format=json"
+
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+def bench_startup(suite):
+    def import_app():
+        subprocess.run([sys.executable, '-c', 'import app'], cwd=REPO_ROOT, check=True)
+    suite.run('startup', 'import_app', {}, import_app)
+
+def bench_fetch(suite, record_counts, padding, latency, workdir):
+    from api import fetch_data_async, ingest_async
+    for total in record_counts:
+        params = {'records': total, 'padding': padding, 'latency': latency}
+        with StubServer(synthetic.api_records(total, padding), latency) as stub:
+            suite.run('fetch', 'fetch_data_async', params,
+                      lambda: asyncio.run(fetch_data_async(stub.url, 'Bench', quiet=True)), rows=total)
+            csv_path = os.path.join(workdir, 'fetched.csv')
+            suite.run('fetch', 'ingest_async', params,
+                      lambda: asyncio.run(ingest_async(stub.url, 'Bench', csv_path, quiet=True)), rows=total)
+
+def bench_load(suite, datasets):
+    from prediction import is_file_valid
+    from storage import clear_loaded, convert_csv, load_dataset, read_dataset, store_path_for
+    for label, kind, path, params in datasets:
+        rows = params.get('rows')
+        shutil.rmtree(store_path_for(path), ignore_errors=True)
+        suite.run('load', 'read_dataset_csv', params, lambda: read_dataset(path), rows=rows)
+        # Validation parses through the shared loader: cold parses (and hashes) the file,
+        # warm finds it unchanged.
+        suite.run('load', 'is_file_valid_csv', params, lambda _: is_file_valid(path), setup=clear_loaded, rows=rows)
+        suite.run('load', 'load_dataset_warm', params, lambda: load_dataset(path), rows=rows)
+        convert_csv(path)
+        suite.run('load', 'read_dataset_npstore', params, lambda: read_dataset(path), rows=rows)
+        suite.run('load', 'is_file_valid_npstore', params, lambda _: is_file_valid(path), setup=clear_loaded, rows=rows)
+        clear_loaded()
+        shutil.rmtree(store_path_for(path), ignore_errors=True)
+
+def bench_predict(suite, datasets):
+    import trends
+    from catalog import DATASETS
+    from prediction import (predict_plastic_waste, predict_plastic_waste_batch, predict_plastic_waste_scenarios,
+                            predict_wastewater_bod, predict_wastewater_bod_batch, predict_wastewater_bod_scenarios)
+    from storage import read_dataset
+    single = {'plastic': predict_plastic_waste, 'wastewater': predict_wastewater_bod}
+    batch = {'plastic': predict_plastic_waste_batch, 'wastewater': predict_wastewater_bod_batch}
+    scenarios = {'plastic': predict_plastic_waste_scenarios, 'wastewater': predict_wastewater_bod_scenarios}
+    for label, kind, path, params in datasets:
+        df = read_dataset(path)
+        state = df[DATASETS[kind]['key']].iloc[len(df) // 2]
+        rows = len(df)
+        # Cold runs clear the fitted trends first, so they include the fit; warm runs reuse it.
+        suite.run('predict', f"{kind}_single_cold", params,
+                  lambda _: single[kind](df, state, 2030), setup=trends.clear_cache)
+        suite.run('predict', f"{kind}_single_warm", params, lambda: single[kind](df, state, 2030))
+        suite.run('predict', f"{kind}_batch_cold", params,
+                  lambda _: batch[kind](df), setup=trends.clear_cache, rows=rows)
+        suite.run('predict', f"{kind}_batch_warm", params, lambda: batch[kind](df), rows=rows)
+        # Every state x year to 2050 x 10^4 scenarios; state-sized data only, as the cost
+        # grows with the number of regions.
+        if rows <= SCENARIO_MAX_ROWS:
+            suite.run('predict', f"{kind}_scenarios", params, lambda: scenarios[kind](df, seed=0), rows=rows)
+
+def bench_plot(suite, datasets, workdir, max_rows=PLOT_MAX_ROWS):
+    import matplotlib
+    matplotlib.use('Agg')
+    from plotting import plot_plastic_waste_comparison, plot_plastic_waste_state, plot_wastewater_charts
+    from storage import read_dataset
+    for label, kind, path, params in datasets:
+        if params.get('rows', 0) > max_rows:
+            continue
+        df = read_dataset(path)
+        if kind == 'plastic':
+            state = df['state_ut_wise'].iloc[len(df) // 2]
+            charts = {
+                'plot_plastic_waste_state': lambda out_dir: plot_plastic_waste_state(df, state, out_dir, keep_open=False),
+                'plot_plastic_waste_comparison': lambda out_dir: plot_plastic_waste_comparison(df, '2020-21', out_dir, keep_open=False),
+            }
+        else:
+            charts = {'plot_wastewater_charts': lambda out_dir: plot_wastewater_charts(df, out_dir, keep_open=False)}
+        for name, plot in charts.items():
+            # Cold: an empty output directory, so every chart is drawn and saved.
+            # Warm: the charts from the previous run are reused through the chart cache.
+            suite.run('plot', f"{name}_cold", params, plot, setup=lambda: tempfile.mkdtemp(dir=workdir))
+            warm_dir = tempfile.mkdtemp(dir=workdir)
+            plot(warm_dir)
+            suite.run('plot', f"{name}_warm", params, lambda: plot(warm_dir))
+
+def shipped_datasets():
+    from catalog import DATA_DIRS, DATASETS
+    datasets = []
+    for kind, info in DATASETS.items():
+        path = os.path.join(REPO_ROOT, DATA_DIRS['saved'], info['file'])
+        if os.path.exists(path):
+            datasets.append(('shipped', kind, path, {'data': 'shipped', 'dataset': kind}))
+    return datasets
+
+def synthetic_datasets(sizes, extra_years, seed=0, data_dir=synthetic.BENCH_DATA_DIR):
+    datasets = []
+    for rows in sizes:
+        for years in [5, *extra_years]:
+            path = synthetic.dataset_path('plastic', rows, years, seed, data_dir)
+            datasets.append(('synthetic', 'plastic', path,
+                             {'data': 'synthetic', 'dataset': 'plastic', 'rows': rows, 'years': years}))
+        path = synthetic.dataset_path('wastewater', rows, seed=seed, directory=data_dir)
+        datasets.append(('synthetic', 'wastewater', path, {'data': 'synthetic', 'dataset': 'wastewater', 'rows': rows}))
+    return datasets
+
+def stage(datasets, workdir):
+    # Benchmarks write columnar stores next to the CSVs, so they work on copies.
+    staged = []
+    for label, kind, path, params in datasets:
+        name = '_'.join(str(value) for value in params.values()) + '.csv'
+        copy = os.path.join(workdir, name)
+        shutil.copyfile(path, copy)
+        staged.append((label, kind, copy, params))
+    return staged
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def run_suite(groups=GROUPS, sizes=SIZES, extra_years=EXTRA_YEARS, fetch_records=FETCH_RECORDS,
+              padding=FETCH_PADDING, latency=FETCH_LATENCY, repeat=REPEAT, budget=TIME_BUDGET,
+              plot_max_rows=PLOT_MAX_ROWS, data_dir=synthetic.BENCH_DATA_DIR, quiet=False):
+    suite = Suite(repeat, budget, quiet)
+    workdir = tempfile.mkdtemp(prefix='dharti-bench-')
+    try:
+        datasets = []
+        if {'load', 'predict', 'plot'} & set(groups):
+            datasets = stage(shipped_datasets() + synthetic_datasets(sizes, extra_years, data_dir=data_dir), workdir)
+        for group in groups:
+            if not quiet:
+                print(f"📊 {group}")
+            if group == 'startup':
+                bench_startup(suite)
+            elif group == 'fetch':
+                bench_fetch(suite, fetch_records, padding, latency, workdir)
+            elif group == 'load':
+                bench_load(suite, datasets)
+            elif group == 'predict':
+                bench_predict(suite, datasets)
+            elif group == 'plot':
+                bench_plot(suite, datasets, workdir, plot_max_rows)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    meta = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'commit': git_commit(),
+    }
+    return {'meta': meta, 'results': suite.results}
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    # Medians are compared by name; a benchmark missing from either run is not a regression.
+    previous = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        rows.append({'name': result['name'], 'baseline': before['median'], 'current': result['median'],
+                     'ratio': ratio, 'regressed': ratio > threshold})
+    return rows
+
+def print_comparison(rows, threshold):
+    print(f"\n📊 Compared with baseline (regression above {threshold:.2f}x):")
+    for row in rows:
+        mark = '❌' if row['regressed'] else '✅'
+        print(f"{mark} {row['name']:<70} {row['baseline'] * 1000:>10.2f} -> {row['current'] * 1000:>10.2f} ms  ({row['ratio']:.2f}x)")
+
+def write_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+
+def parse_sizes(text):
+    try:
+        return [int(float(part)) for part in text.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid sizes: {text} (use e.g. 1000,1e5)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark fetching, loading, prediction and plotting")
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS), help="Benchmark groups to run")
+    parser.add_argument('--sizes', type=parse_sizes, default=SIZES, help="Synthetic dataset row counts, e.g. 1e3,1e4,1e5,1e6")
+    parser.add_argument('--years', type=parse_sizes, default=EXTRA_YEARS, help="Extra plastic year-column counts to generate")
+    parser.add_argument('--fetch-records', type=parse_sizes, default=FETCH_RECORDS, help="Records served by the API stub")
+    parser.add_argument('--padding', type=int, default=FETCH_PADDING, help="Extra bytes per served record")
+    parser.add_argument('--latency', type=float, default=FETCH_LATENCY, help="Stub delay per page, in seconds")
+    parser.add_argument('--plot-max-rows', type=int, default=PLOT_MAX_ROWS, help="Largest synthetic dataset to plot")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Runs per benchmark")
+    parser.add_argument('--quick', action='store_true', help="Small sizes, single runs and shipped-data charts only")
+    parser.add_argument('--out', default=DEFAULT_OUT, help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Slowdown ratio counted as a regression")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.quick:
+        args.sizes, args.years, args.fetch_records, args.repeat = QUICK_SIZES, [], [1_000], 1
+        args.plot_max_rows = 0
+    results = run_suite(args.only, args.sizes, args.years, args.fetch_records, args.padding, args.latency,
+                        args.repeat, plot_max_rows=args.plot_max_rows)
+    write_results(results, args.out)
+    print(f"\n✅ {len(results['results'])} results saved to {args.out}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row['regressed'] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
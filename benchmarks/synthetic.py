@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pandas as pd
+
+BENCH_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+FIRST_YEAR = 2016
+MISSING_SHARE = 0.05  # about as many 'NA' cells as the shipped plastic waste file
+
+def year_columns(count):
+    # Field names in the API's style, always ending with the shipped '__2016_17'..'_2020_21';
+    # extra years are earlier ones.
+    names = []
+    for start in range(FIRST_YEAR + 5 - count, FIRST_YEAR + 5):
+        prefix = '__' if start == FIRST_YEAR else '_'
+        names.append(f"{prefix}{start}_{(start + 1) % 100:02d}")
+    return names
+
+def state_names(rows):
+    return [f"State {i:07d}" for i in range(rows)]
+
+def plastic_frame(rows, years=5, seed=0):
+    # Each state gets its own level and trend with noise, and a few cells are 'NA',
+    # so fits and charts see the shapes they meet in real data.
+    rng = np.random.default_rng(seed)
+    level = rng.lognormal(mean=9.5, sigma=1.5, size=rows)
+    trend = rng.normal(0.02, 0.1, size=rows)
+    steps = np.arange(years) - (years - 1)
+    values = level[:, None] * (1 + trend[:, None]) ** steps[None, :] * rng.normal(1, 0.1, size=(rows, years))
+    values = np.round(np.abs(values), 2)
+    frame = {'_sl__no_': np.arange(1, rows + 1), 'state_ut_wise': state_names(rows)}
+    missing = rng.random((rows, years)) < MISSING_SHARE
+    for i, column in enumerate(year_columns(years)):
+        frame[column] = np.where(missing[:, i], 'NA', values[:, i].astype(str))
+    return pd.DataFrame(frame)
+
+def wastewater_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    discharge = np.round(rng.lognormal(mean=4, sigma=1, size=rows), 2)
+    return pd.DataFrame({
+        'state': state_names(rows),
+        'no__of_gpis': rng.integers(10, 1000, size=rows),
+        'wastewater_discharge__mld_': discharge,
+        'bod_load__tpd_': np.round(discharge * rng.uniform(0.01, 0.05, size=rows), 2),
+    })
+
+def dataset_path(kind, rows, years=5, seed=0, directory=BENCH_DATA_DIR):
+    # Generated files are kept between runs; the name records everything that shaped them.
+    name = f"{kind}_{rows}_rows_{years}_years_seed{seed}.csv" if kind == 'plastic' else f"{kind}_{rows}_rows_seed{seed}.csv"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        frame = plastic_frame(rows, years, seed) if kind == 'plastic' else wastewater_frame(rows, seed)
+        tmp_path = path + '.tmp'
+        frame.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return path
+
+def api_records(total, padding=0, seed=0):
+    # Records as data.gov.in serves them: every value a string, optionally padded to
+    # reach a target payload size per record.
+    frame = plastic_frame(total, seed=seed).astype(str)
+    records = frame.to_dict(orient='records')
+    if padding:
+        for record in records:
+            record['note'] = 'x' * padding
+    return records
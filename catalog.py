@@ -0,0 +1,32 @@
+import os
+
+# Dataset metadata the CLI needs before any heavy module is imported. Callables are
+# named rather than referenced so that building the parser never pulls in pandas,
+# aiohttp or matplotlib. Each dataset is also a data.gov.in resource: its ID, the
+# fields a fetched copy must have, and the file it is saved to.
+LATEST_YEAR = 2021
+# 'auto' (the default) is the straight line, except that a falling line, which would reach
+# zero, is replaced by the state's log-linear trend.
+TREND_MODELS = ('auto', 'linear', 'loglinear')
+BACKTEST_MIN_TRAIN = 2  # years of history before the first backtested forecast
+REQUESTS_PER_SECOND = 10.0  # shared by every download running at once, to stay inside the API quota
+
+# Materialized aggregate tables (see analytics.py): one per dataset measure, and the join.
+ANALYTICS_TABLES = ('plastic', 'wastewater_discharge', 'bod_load', 'plastic_bod')
+
+DATA_DIRS = {'api': 'data/api_data', 'saved': 'data/SavedData'}
+
+DATASETS = {
+    'plastic': {'topic': 'Plastic Waste', 'file': 'plastic_waste_data.csv', 'key': 'state_ut_wise',
+                'resource': 'ad39c33f-9d07-41a8-9a7d-06081e01617f', 'fields': ['state_ut_wise'],
+                'predict': 'predict_plastic_waste_batch', 'scenarios': 'predict_plastic_waste_scenarios',
+                'backtest': 'backtest_plastic_waste'},
+    'wastewater': {'topic': 'Wastewater', 'file': 'wastewater_data.csv', 'key': 'state',
+                   'resource': 'e374f644-b9d4-4e2a-b55f-f3888859abd6',
+                   'fields': ['state', 'wastewater_discharge__mld_', 'bod_load__tpd_'],
+                   'predict': 'predict_wastewater_bod_batch', 'scenarios': 'predict_wastewater_bod_scenarios',
+                   'backtest': 'backtest_wastewater_bod'},
+}
+
+def dataset_path(dataset, source='api'):
+    return os.path.join(DATA_DIRS[source], DATASETS[dataset]['file'])
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import time
+import metrics
+from charts import DPI
+from response_cache import write_atomic
+from states import state_key
+
+MANIFEST_FILE = '.chart-cache.json'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_VERSION = 1  # bump when a drawing change should invalidate every saved chart
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ChartCache:
+    # Remembers which PNGs in an output directory were drawn from which data, so an
+    # unchanged chart is handed back without importing matplotlib. The manifest lives
+    # next to the charts; least recently used charts are deleted past max_bytes.
+    def __init__(self, out_dir='plots', max_bytes=DEFAULT_MAX_BYTES):
+        self.out_dir = out_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+        self.hits = 0
+        self.misses = 0
+        self._manifest = None
+
+    def _load(self):
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = None
+            if not isinstance(manifest, dict) or manifest.get('version') != CACHE_VERSION:
+                manifest = {'version': CACHE_VERSION, 'datasets': {}, 'charts': {}}
+            self._manifest = manifest
+        return self._manifest
+
+    def dataset_hash(self, csv_path):
+        # Hashing a file is only repeated when its size or modification time changes.
+        stat = os.stat(csv_path)
+        datasets = self._load()['datasets']
+        entry = datasets.get(os.path.abspath(csv_path))
+        if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': file_hash(csv_path)}
+            datasets[os.path.abspath(csv_path)] = entry
+        return entry['hash']
+
+    def key(self, dataset_hash, spec):
+        state = spec.get('state')
+        fields = [dataset_hash, spec['chart'], state_key(state) if state else None, spec.get('year'),
+                  list(spec['figsize']), DPI, os.path.normpath(spec['path'])]
+        return hashlib.sha256(json.dumps(fields).encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        charts = self._load()['charts']
+        entry = charts.get(key)
+        if entry is not None:
+            try:
+                if os.path.getsize(entry['path']) == entry['size']:
+                    entry['last_used'] = time.time()
+                    self.hits += 1
+                    metrics.count('chart_cache_hits')
+                    return entry['path']
+            except OSError:
+                pass
+            del charts[key]
+        self.misses += 1
+        metrics.count('chart_cache_misses')
+        return None
+
+    def store(self, key, path):
+        charts = self._load()['charts']
+        # A chart file holds one version only, so an older entry for the same path is stale.
+        for stale in [k for k, entry in charts.items() if entry['path'] == path]:
+            del charts[stale]
+        charts[key] = {'path': path, 'size': os.path.getsize(path), 'last_used': time.time()}
+
+    def total_bytes(self):
+        return sum(entry['size'] for entry in self._load()['charts'].values())
+
+    def evict(self):
+        charts = self._load()['charts']
+        total = self.total_bytes()
+        victims = []
+        for key, entry in sorted(charts.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            victims.append(entry['path'])
+            total -= entry['size']
+            del charts[key]
+            try:
+                os.remove(entry['path'])
+            except FileNotFoundError:
+                pass
+        return victims
+
+    def save(self):
+        self.evict()
+        os.makedirs(self.out_dir or '.', exist_ok=True)
+        write_atomic(self.manifest_path, json.dumps(self._load()).encode('utf-8'))
@@ -0,0 +1,105 @@
+import os
+import numpy as np
+from analytics import dataset_table, period_rows
+from longform import DEFAULT_MEASURE, dataset_panel, region_index
+from states import state_key
+
+# What each chart shows, how big it is drawn and where it is saved. Nothing here needs
+# matplotlib, so a chart that is already cached can be found without importing it.
+# The years on the charts are whatever periods the data has (see longform.py).
+DISCHARGE_MEASURE = 'wastewater_discharge__mld_'
+BOD_MEASURE = 'bod_load__tpd_'
+
+STATE_CHARTS = [('line', "Line Plot"), ('scatter', "Scatter Plot"), ('bar', "Bar Plot"), ('area', "Area Plot")]
+STATE_KINDS = {kind for kind, _ in STATE_CHARTS}
+WASTEWATER_CHARTS = ('wastewater_discharge', 'bod_load', 'wastewater_combined')
+WASTEWATER_FILES = {
+    'wastewater_discharge': 'wastewater_discharge_bar.png',
+    'bod_load': 'bod_load_bar.png',
+    'wastewater_combined': 'wastewater_bod_combined.png',
+}
+FIGSIZES = {
+    'line': (8, 6), 'scatter': (8, 6), 'bar': (8, 6), 'area': (8, 6),
+    'comparison': (12, 6),
+    'wastewater_discharge': (10, 6), 'bod_load': (10, 6), 'wastewater_combined': (12, 6),
+}
+DPI = 100
+
+def state_slug(state):
+    return state.lower().replace(' ', '_')
+
+def chart_spec(chart, path, state=None, year=None):
+    return {'chart': chart, 'figsize': FIGSIZES[chart], 'path': path, 'state': state, 'year': year}
+
+def plastic_state_specs(state, out_dir='plots'):
+    return [chart_spec(kind, os.path.join(out_dir, f"plastic_waste_{state_slug(state)}_{kind}.png"), state=state)
+            for kind, _ in STATE_CHARTS]
+
+def plastic_comparison_spec(year_input, out_dir='plots'):
+    return chart_spec('comparison', os.path.join(out_dir, f"plastic_waste_comparison_{year_input.replace('-', '_')}.png"),
+                      year=year_input)
+
+def wastewater_specs(out_dir='plots'):
+    return [chart_spec(chart, os.path.join(out_dir, WASTEWATER_FILES[chart])) for chart in WASTEWATER_CHARTS]
+
+def plastic_years(df):
+    return dataset_panel(df, DEFAULT_MEASURE)['labels']
+
+def plastic_states(df):
+    # The regions of the panel, whatever the dataset calls its region field; totals are left out.
+    return dataset_panel(df, DEFAULT_MEASURE)['regions']
+
+def plastic_state_jobs(df, state, out_dir='plots'):
+    panel = dataset_panel(df, DEFAULT_MEASURE)
+    position = region_index(panel).get(state_key(state))
+    if position is None:
+        print(f"❌ No data found for state: {state}\n")
+        return []
+
+    row_values = panel['values'][position]
+    valid = ~np.isnan(row_values)
+    waste_values = row_values[valid].tolist()
+    valid_years = [year for year, keep in zip(panel['labels'], valid) if keep]
+    if not waste_values:
+        print(f"❌ No valid data available for {state} to plot.\n")
+        return []
+
+    titles = dict(STATE_CHARTS)
+    return [dict(spec, title=f"Plastic Waste in {state}: {titles[spec['chart']]}", x=valid_years, y=waste_values)
+            for spec in plastic_state_specs(state, out_dir)]
+
+def plastic_comparison_job(df, year_input, out_dir='plots'):
+    # A lookup in the materialized plastic table (see analytics.py).
+    rows = period_rows(dataset_table(df, 'plastic'), year_input)
+    if rows is None:
+        print("❌ Invalid year. Skipping comparison plot.\n")
+        return None
+    rows = rows[rows['value'].notna()]
+    if rows.empty:
+        return None
+    return dict(plastic_comparison_spec(year_input, out_dir), title=f"Plastic Waste Across States in {year_input}",
+                x=rows['state'].tolist(), y=rows['value'].tolist())
+
+def wastewater_jobs(df, out_dir='plots'):
+    # Totals rows are left out of the long table, so only states are drawn.
+    discharge_panel = dataset_panel(df, DISCHARGE_MEASURE)
+    bod_panel = dataset_panel(df, BOD_MEASURE)
+    if not discharge_panel['regions']:
+        print("❌ No valid data available for plotting.\n")
+        return []
+    states = discharge_panel['regions']
+    discharge = discharge_panel['values'][:, -1].tolist()
+    bod_load = bod_panel['values'][:, -1].tolist()
+    series = {'wastewater_discharge': {'y': discharge}, 'bod_load': {'y': bod_load},
+              'wastewater_combined': {'y': discharge, 'y2': bod_load}}
+    return [dict(spec, x=states, **series[spec['chart']]) for spec in wastewater_specs(out_dir)]
+
+def all_state_jobs(df, out_dir='plots', year_input=None):
+    jobs = []
+    for state in plastic_states(df):
+        jobs.extend(plastic_state_jobs(df, state, out_dir))
+    if year_input is not None:
+        comparison = plastic_comparison_job(df, year_input, out_dir)
+        if comparison is not None:
+            jobs.append(comparison)
+    return jobs
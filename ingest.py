@@ -0,0 +1,309 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import metrics
+from storage import convert_csv
+
+MISSING_TEXT = 'NA'
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+_STRING_END = re.compile(rb'["\\]')
+_LEADING_ZERO = re.compile(r'^[+-]?0\d')
+
+class RecordParser:
+    # Incremental parser for an API page: each object inside the top-level "records" array is
+    # decoded as soon as its closing brace arrives, and the other top-level fields (total,
+    # count, ...) are returned by close(). Only the unfinished record is ever buffered.
+    def __init__(self, key=b'records'):
+        self.key = key
+        self._buffer = b''
+        self._scan = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._last_key = None
+        self._in_records = False
+        self._record_start = None
+        self._header = bytearray()
+        self._header_from = 0
+
+    def feed(self, data):
+        buf = self._buffer + data
+        records = []
+        i = self._scan
+        while True:
+            if self._in_string:
+                match = _STRING_END.search(buf, i)
+                if match is None:
+                    i = len(buf)
+                    break
+                i = match.start()
+                if buf[i] == 0x5C:  # backslash: skip the escaped byte, once it has arrived
+                    if i + 1 >= len(buf):
+                        break
+                    i += 2
+                    continue
+                self._in_string = False
+                if self._depth == 1:
+                    self._last_key = buf[self._string_start + 1:i]
+                i += 1
+                continue
+            match = _STRUCTURE.search(buf, i)
+            if match is None:
+                i = len(buf)
+                break
+            i = match.start()
+            char = buf[i:i + 1]
+            if char == b'"':
+                self._in_string = True
+                self._string_start = i
+            elif char in (b'{', b'['):
+                self._depth += 1
+                if self._depth == 2 and char == b'[' and self._last_key == self.key and not self._in_records:
+                    self._header += buf[self._header_from:i] + b'[]'
+                    self._in_records = True
+                elif self._in_records and self._depth == 3 and char == b'{':
+                    self._record_start = i
+            else:
+                if self._in_records and self._depth == 3 and char == b'}':
+                    records.append(json.loads(buf[self._record_start:i + 1]))
+                    self._record_start = None
+                self._depth -= 1
+                if self._in_records and self._depth == 1:
+                    self._in_records = False
+                    self._header_from = i + 1
+            i += 1
+        self._trim(buf, i)
+        return records
+
+    def _trim(self, buf, scanned):
+        keep = scanned
+        if self._record_start is not None:
+            keep = min(keep, self._record_start)
+        if self._in_string and self._depth == 1:
+            keep = min(keep, self._string_start)
+        if not self._in_records:
+            self._header += buf[self._header_from:keep]
+            self._header_from = keep
+        self._buffer = buf[keep:]
+        self._scan = scanned - keep
+        self._header_from -= keep
+        self._string_start -= keep
+        if self._record_start is not None:
+            self._record_start -= keep
+
+    def close(self):
+        if self._depth or self._in_string:
+            raise ValueError("Response ended in the middle of the JSON document")
+        self._header += self._buffer[self._header_from:]
+        self._buffer = b''
+        return json.loads(bytes(self._header)) if self._header.strip() else {}
+
+class ColumnStats:
+    # Tracks, value by value, what storage.coerce_column would decide for the whole column.
+    def __init__(self):
+        self.values = 0
+        self.missing = False
+        self.non_numeric = False
+        self.fractional = False
+        self.leading_zero = False
+
+    def add(self, text):
+        if text in ('', MISSING_TEXT):
+            self.missing = True
+            return
+        self.values += 1
+        if self.non_numeric or self.leading_zero:
+            return
+        if _LEADING_ZERO.match(text):
+            self.leading_zero = True
+            return
+        try:
+            number = float(text)
+        except ValueError:
+            self.non_numeric = True
+            return
+        if number % 1 != 0:
+            self.fractional = True
+
+    def merge(self, other):
+        self.values += other.values
+        self.missing |= other.missing
+        self.non_numeric |= other.non_numeric
+        self.fractional |= other.fractional
+        self.leading_zero |= other.leading_zero
+
+    def kind(self):
+        if not self.values or self.non_numeric or self.leading_zero:
+            return 'str'
+        return 'float' if self.missing or self.fractional else 'int'
+
+class Schema:
+    def __init__(self, topic, columns=None):
+        self.topic = topic
+        self.columns = list(columns) if columns is not None else None
+        self.stats = {}
+
+    def observe(self, record):
+        # The first record fixes the column order; every later one must have the same fields.
+        if self.columns is None:
+            self.columns = list(record)
+            self.stats = {col: ColumnStats() for col in self.columns}
+
+    def row(self, record, stats):
+        if len(record) != len(self.columns) or any(col not in record for col in self.columns):
+            raise ValueError(f"{self.topic} record has fields {sorted(record)}, expected {sorted(self.columns)}")
+        values = []
+        for col in self.columns:
+            value = record[col]
+            text = MISSING_TEXT if value is None else str(value).strip()
+            stats[col].add(text)
+            values.append(text)
+        return values
+
+    def new_stats(self):
+        return {col: ColumnStats() for col in self.columns or []}
+
+    def commit(self, stats):
+        for col, column_stats in stats.items():
+            self.stats[col].merge(column_stats)
+
+    def kinds(self):
+        return {col: self.stats[col].kind() for col in self.columns or []}
+
+class ListSink:
+    # Collects the records of one offset range in memory; used when the caller wants a DataFrame.
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.records = []
+        self._mark = 0
+
+    @property
+    def count(self):
+        return len(self.records)
+
+    async def begin(self):
+        self._mark = len(self.records)
+
+    async def write(self, records):
+        if self.capacity is not None:
+            records = records[:self.capacity - len(self.records)]
+        self.records.extend(records)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        del self.records[self._mark:]
+
+class CsvPartSink:
+    # Streams the rows of one offset range to a headerless CSV part file. A page that fails
+    # halfway is rolled back by truncating the file to where the page started.
+    def __init__(self, path, schema, capacity=None):
+        self.path = path
+        self.schema = schema
+        self.capacity = capacity
+        self.count = 0
+        self._file = None
+        self._mark = (0, 0)
+        self._stats = None
+
+    async def begin(self):
+        if self._file is None:
+            self._file = await asyncio.to_thread(open, self.path, 'w+b')
+        self._mark = (self.count, await asyncio.to_thread(self._file.tell))
+        self._stats = None
+
+    async def write(self, records):
+        if self.capacity is not None:
+            records = records[:self.capacity - self.count]
+        if not records:
+            return
+        if self._stats is None:
+            self.schema.observe(records[0])
+            self._stats = self.schema.new_stats()
+        with metrics.span('csv_write', stage='rows', topic=self.schema.topic):
+            buffer = io.StringIO(newline='')
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerows(self.schema.row(record, self._stats) for record in records)
+            await asyncio.to_thread(self._file.write, buffer.getvalue().encode('utf-8'))
+        self.count += len(records)
+
+    async def commit(self):
+        if self._stats is not None:
+            self.schema.commit(self._stats)
+        self._stats = None
+
+    async def rollback(self):
+        self.count, position = self._mark
+        self._stats = None
+        await asyncio.to_thread(self._file.seek, position)
+        await asyncio.to_thread(self._file.truncate)
+
+    async def close(self):
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+class CsvIngest:
+    # Builds one CSV from page parts written concurrently, then renames it over the target so
+    # readers only ever see the old file or the complete new one.
+    def __init__(self, csv_path, topic, required_fields=()):
+        self.csv_path = csv_path
+        self.schema = Schema(topic)
+        self.required_fields = list(required_fields)
+        parent = os.path.dirname(os.path.abspath(csv_path))
+        os.makedirs(parent, exist_ok=True)
+        self.parts_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+        self.sinks = {}
+
+    def sink(self, offset, capacity=None):
+        sink = CsvPartSink(os.path.join(self.parts_dir, f"{offset}.part"), self.schema, capacity)
+        self.sinks[offset] = sink
+        return sink
+
+    def rows(self):
+        return sum(sink.count for sink in self.sinks.values())
+
+    def _assemble(self):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.csv_path)), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                header = io.StringIO(newline='')
+                csv.writer(header, lineterminator='\n').writerow(self.schema.columns or [])
+                out.write(header.getvalue().encode('utf-8'))
+                for offset in sorted(self.sinks):
+                    with open(self.sinks[offset].path, 'rb') as part:
+                        shutil.copyfileobj(part, out)
+            os.replace(tmp_path, self.csv_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def finish(self):
+        for sink in self.sinks.values():
+            await sink.close()
+        # Checked before the rename, so a resource whose schema changed leaves the old file in place.
+        columns = self.schema.columns
+        missing = [field for field in self.required_fields if columns is not None and field not in columns]
+        if missing:
+            raise ValueError(f"{self.schema.topic} data is missing field(s) {missing}; got {columns}")
+        with metrics.span('csv_write', stage='assemble', topic=self.schema.topic):
+            await asyncio.to_thread(self._assemble)
+        # The typed copy is written from the column kinds found while streaming, so numbers are
+        # decoded once here rather than on every load.
+        if self.schema.columns:
+            with metrics.span('store_write', topic=self.schema.topic):
+                await asyncio.to_thread(convert_csv, self.csv_path, None, self.schema.kinds())
+        return {'path': self.csv_path, 'rows': self.rows(), 'columns': self.schema.columns or [],
+                'kinds': self.schema.kinds()}
+
+    async def discard(self):
+        for sink in self.sinks.values():
+            await sink.close()
+        await asyncio.to_thread(shutil.rmtree, self.parts_dir, True)
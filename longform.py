@@ -0,0 +1,144 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from catalog import LATEST_YEAR
+from states import build_state_index
+from storage import frame_hash
+
+# data.gov.in names period fields after the period: '__2016_17' or 'sales_2019_20' for a
+# financial year, 'population_2011' for a calendar year. Whatever precedes the year is the
+# measure; plain year fields all belong to DEFAULT_MEASURE.
+PERIOD_FIELD = re.compile(r'^(?P<measure>.*?)_*(?P<start>(?:19|20)\d{2})(?:_(?P<end>\d{2}))?_*$')
+SERIAL_FIELD = re.compile(r'^_*(?:s|sl|sr)_*no_*$')
+DEFAULT_MEASURE = 'value'
+TOTAL_NAMES = {'total', 'grand total', 'all india', 'india'}
+MAX_CACHED_FRAMES = 4
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()  # the service builds tables from worker threads
+
+def parse_period(field):
+    # A financial year is placed at the year it ends: '2016_17' -> 2017, labelled '2016-17'.
+    match = PERIOD_FIELD.match(field)
+    if match is None:
+        return None
+    start = int(match['start'])
+    measure = match['measure'].strip('_') or DEFAULT_MEASURE
+    if match['end'] is None:
+        return measure, start, str(start)
+    end = start - start % 100 + int(match['end'])
+    if end <= start:
+        end += 100
+    return measure, end, f"{start}-{match['end']}"
+
+def region_fields(columns):
+    district = next((col for col in columns if 'district' in col), None)
+    state = next((col for col in columns if 'state' in col and col != district), None)
+    return state, district
+
+def value_fields(df, default_period=LATEST_YEAR):
+    # (column, measure, period, label) for every numeric field, periods in order.
+    state, district = region_fields(df.columns)
+    fields = []
+    for col in df.columns:
+        if col in (state, district) or SERIAL_FIELD.match(col):
+            continue
+        parsed = parse_period(col)
+        if parsed is not None:
+            fields.append((col, *parsed))
+        elif df[col].dtype.kind in 'biuf':
+            fields.append((col, col, default_period, str(default_period)))
+    return sorted(fields, key=lambda field: (field[1], field[2]))
+
+def to_long(df, default_period=LATEST_YEAR):
+    # One row per region, measure and period. Regions are districts when the data has a
+    # district field (with their state alongside) and states otherwise; totals are dropped.
+    state, district = region_fields(df.columns)
+    if state is None and district is None:
+        raise ValueError(f"No state or district field among {list(df.columns)}")
+    region = district or state
+    names = df[region]
+    keep = names.notna() & ~names.astype('string').str.strip().str.lower().isin(TOTAL_NAMES)
+    if district and state:
+        keep &= df[state].notna()
+    df = df[keep]
+    fields = value_fields(df, default_period)
+    repeat = len(fields)
+
+    def categorical(column):
+        codes, uniques = pd.factorize(df[column])
+        return pd.Categorical.from_codes(np.tile(codes, repeat), uniques)
+
+    data = {'region': categorical(region)}
+    if district and state:
+        data['state'] = categorical(state)
+    measures = list(dict.fromkeys(field[1] for field in fields))
+    data['measure'] = pd.Categorical.from_codes(np.repeat([measures.index(field[1]) for field in fields], len(df)),
+                                                measures)
+    data['period'] = np.repeat(np.array([field[2] for field in fields], dtype=np.int16), len(df))
+    values = [pd.to_numeric(df[field[0]], errors='coerce').to_numpy(dtype=np.float32) for field in fields]
+    data['value'] = np.concatenate(values) if values else np.empty(0, dtype=np.float32)
+    long = pd.DataFrame(data)
+    long.attrs['labels'] = {(field[1], field[2]): field[3] for field in fields}
+    return long
+
+def region_panel(long, measure=DEFAULT_MEASURE, level='state'):
+    # Regions x periods for one measure. At state level, district rows are summed; a state
+    # and period with no reported district stays NaN.
+    rows = long[long['measure'] == measure]
+    column = 'state' if level == 'state' and 'state' in long else 'region'
+    codes, regions = pd.factorize(rows[column], sort=False)
+    periods = np.unique(rows['period'].to_numpy())
+    slots = codes * len(periods) + np.searchsorted(periods, rows['period'].to_numpy())
+    values = rows['value'].to_numpy(dtype=np.float64)
+    reported = ~np.isnan(values)
+    size = len(regions) * len(periods)
+    totals = np.bincount(slots[reported], weights=values[reported], minlength=size)
+    counts = np.bincount(slots[reported], minlength=size)
+    matrix = np.where(counts > 0, totals, np.nan).reshape(len(regions), len(periods))
+    labels = [long.attrs['labels'].get((measure, int(period)), str(period)) for period in periods]
+    regions = [str(name) for name in regions]
+    digest = hashlib.blake2b(measure.encode('utf-8'), digest_size=16)
+    digest.update('\0'.join(regions).encode('utf-8'))
+    digest.update(periods.astype(np.int64).tobytes())
+    digest.update(matrix.tobytes())
+    return {'regions': regions, 'periods': periods.astype(np.int64), 'labels': labels, 'values': matrix,
+            'hash': digest.hexdigest()}
+
+def region_index(panel):
+    # Normalized name -> row, built on the first lookup by name; whole-panel work never needs it.
+    if 'index' not in panel:
+        panel['index'] = build_state_index(panel['regions'])
+    return panel['index']
+
+def _cached(df):
+    # Keyed by content, so an equal copy shares the tables and an in-place edit gets new ones.
+    key = frame_hash(df)
+    with _tables_lock:
+        entry = _tables.get(key)
+        if entry is not None:
+            _tables.move_to_end(key)
+            return entry
+        entry = _tables[key] = {}
+        if len(_tables) > MAX_CACHED_FRAMES:
+            _tables.popitem(last=False)
+        return entry
+
+def _long_table(entry, df):
+    if 'long' not in entry:
+        entry['long'] = to_long(df)
+    return entry['long']
+
+def long_table(df):
+    # Built once for each content of the wide DataFrame.
+    return _long_table(_cached(df), df)
+
+def dataset_panel(df, measure=DEFAULT_MEASURE, level='state'):
+    entry = _cached(df)
+    key = (measure, level)
+    if key not in entry:
+        entry[key] = region_panel(_long_table(entry, df), measure, level)
+    return entry[key]
@@ -0,0 +1,195 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from response_cache import write_atomic
+
+PREFIX = 'dharti'
+MAX_EVENTS = 10_000  # individual spans kept for the JSON log; totals keep counting past it
+
+# Everything below is a no-op until enable() is called: span() hands back one shared
+# object whose __enter__/__exit__ do nothing, and count() returns at its first line.
+enabled = False
+keep_events = True
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_timers = {}
+_counters = {}
+_events = []
+_dropped_events = 0
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started, self.started, **self.labels)
+        return False
+
+def _key(name, labels):
+    return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+def enable(events=True):
+    global enabled, keep_events
+    enabled = True
+    keep_events = events
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    global _origin, _dropped_events
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _events.clear()
+        _dropped_events = 0
+        _origin = time.perf_counter()
+
+def span(name, **labels):
+    if not enabled:
+        return _NULL_SPAN
+    return Span(name, labels)
+
+def start():
+    # For sections that do not fit a with-block: pair with stop(), which ignores None.
+    return time.perf_counter() if enabled else None
+
+def stop(name, started, **labels):
+    if started is not None:
+        record(name, time.perf_counter() - started, started, **labels)
+
+def record(name, seconds, started=None, **labels):
+    global _dropped_events
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        timer = _timers.get(key)
+        if timer is None:
+            _timers[key] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+        if keep_events:
+            if len(_events) < MAX_EVENTS:
+                offset = (started if started is not None else time.perf_counter() - seconds) - _origin
+                _events.append((key, offset, seconds))
+            else:
+                _dropped_events += 1
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def timed(name, **labels):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with Span(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def state():
+    # A picklable copy, so pool workers can send what they measured back to the parent.
+    with _lock:
+        return {'timers': [(key, list(timer)) for key, timer in _timers.items()],
+                'counters': list(_counters.items()),
+                'events': list(_events),
+                'dropped_events': _dropped_events}
+
+def merge(other):
+    global _dropped_events
+    with _lock:
+        for key, (calls, seconds, longest) in other['timers']:
+            timer = _timers.setdefault(key, [0, 0.0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+            timer[2] = max(timer[2], longest)
+        for key, value in other['counters']:
+            _counters[key] = _counters.get(key, 0) + value
+        room = max(MAX_EVENTS - len(_events), 0) if keep_events else 0
+        _events.extend(other['events'][:room])
+        _dropped_events += other['dropped_events'] + len(other['events']) - min(room, len(other['events']))
+
+def summary():
+    with _lock:
+        return {
+            'timers': [{'name': name, 'labels': dict(labels), 'count': calls, 'seconds': seconds, 'max_seconds': longest}
+                       for (name, labels), (calls, seconds, longest) in sorted(_timers.items())],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(_counters.items())],
+            'spans': [{'name': name, 'labels': dict(labels), 'start': offset, 'seconds': seconds}
+                      for (name, labels), offset, seconds in _events],
+            'dropped_spans': _dropped_events,
+        }
+
+def write_json_log(path, extra=None):
+    # One JSON object per run, appended, so a log file collects the history of many runs.
+    entry = {'time': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'argv': sys.argv[1:], **(extra or {})}
+    entry.update(summary())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _series(name, labels, value):
+    text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+    return f"{name}{{{text}}} {value!r}" if text else f"{name} {value!r}"
+
+def prometheus_text():
+    lines = []
+    with _lock:
+        timers = sorted(_timers.items())
+        counters = sorted(_counters.items())
+    if timers:
+        seconds = f"{PREFIX}_span_seconds"
+        lines += [f"# HELP {seconds} Time spent in instrumented sections.", f"# TYPE {seconds} summary"]
+        for (name, labels), (calls, total, _) in timers:
+            labels = (('span', name),) + labels
+            lines.append(_series(f"{seconds}_sum", labels, total))
+            lines.append(_series(f"{seconds}_count", labels, calls))
+        longest = f"{PREFIX}_span_max_seconds"
+        lines += [f"# HELP {longest} Longest single run of each instrumented section.", f"# TYPE {longest} gauge"]
+        for (name, labels), (_, _, value) in timers:
+            lines.append(_series(longest, (('span', name),) + labels, value))
+    for name in sorted({name for (name, _), _ in counters}):
+        metric = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines += [_series(metric, labels, value) for (counter, labels), value in counters if counter == name]
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path):
+    # Written whole and renamed into place, as node_exporter's textfile collector expects.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    write_atomic(path, prometheus_text().encode('utf-8'))
@@ -0,0 +1,24 @@
+import argparse
+from catalog import LATEST_YEAR
+
+# Parsers for the states and years a prediction is asked for, shared by the command line
+# (as argparse types) and the service's query strings. Nothing heavy is imported here.
+
+def parse_years(text):
+    years = []
+    for part in text.split(','):
+        start, sep, end = part.strip().partition('-')
+        try:
+            years.extend(range(int(start), int(end) + 1) if sep else [int(start)])
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid year range: {text!r} (e.g. 2022-2030)")
+    if not years:
+        raise argparse.ArgumentTypeError(f"invalid year range: {text!r} (e.g. 2022-2030)")
+    if min(years) <= LATEST_YEAR:
+        raise argparse.ArgumentTypeError(f"years must be after {LATEST_YEAR}: {text!r}")
+    return years
+
+def parse_states(text):
+    if text.strip().lower() == 'all':
+        return None
+    return [state.strip() for state in text.split(',') if state.strip()]
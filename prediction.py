@@ -1,81 +1,217 @@
 import os
+import numpy as np
 import pandas as pd
+import metrics
+from catalog import LATEST_YEAR, TREND_MODELS
+from analytics import cross_table, dataset_table, period_rows
+from backtest import MIN_TRAIN, backtest_panel
+from longform import DEFAULT_MEASURE, dataset_panel, region_index
+from scenarios import DEFAULT_SCENARIOS, growth_model, project
+from states import state_key
+from storage import load_dataset
+from trends import evaluate_trends, fitted_trends
+
+# Periods are discovered from the field names (see longform.py), so a new financial year
+# or a district-level file needs no change here.
+PLASTIC_MEASURE = DEFAULT_MEASURE
+BOD_MEASURE = 'bod_load__tpd_'
+# Growth assumed for a state whose history is too short to fit a trend (one year or less).
+PLASTIC_GROWTH_RATE = 0.02  # 2% annual increase
+BOD_GROWTH_RATE = 0.01  # 1% annual increase
+DEFAULT_MODEL = TREND_MODELS[0]
+PLASTIC_IMPACT_THRESHOLDS = (50000, 200000)  # tonnes
+BOD_IMPACT_THRESHOLDS = (2, 5)  # tonnes/day
+IMPACT_LEVELS = ['Low', 'Moderate', 'High']
+PLASTIC_IMPACTS = [
+    ("Environmental: Low land and water pollution risk.",
+     "Economic: Manageable waste management costs."),
+    ("Environmental: Moderate pollution risk, affecting local ecosystems.",
+     "Economic: Increased costs for waste management and recycling."),
+    ("Environmental: High pollution risk, severe impact on land and water bodies.",
+     "Economic: Significant costs for waste management, cleanup, and policy enforcement."),
+]
+BOD_IMPACTS = [
+    ("Ecological: Low impact on river ecosystem health.",
+     "Social: Minimal impact on community well-being."),
+    ("Ecological: Moderate impact, reduced oxygen levels affecting aquatic life.",
+     "Social: Potential health risks for communities relying on the river."),
+    ("Ecological: Severe impact, significant harm to aquatic ecosystems.",
+     "Social: Major health and livelihood risks for river-dependent communities."),
+]
 
 def is_file_valid(file_path):
     if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
         return False
     try:
-        df = pd.read_csv(file_path)
+        # The parse is cached, so loading the file after validating it costs nothing more.
+        df = load_dataset(file_path)
         return not df.empty
     except (pd.errors.EmptyDataError, Exception):
         return False
 
-def predict_plastic_waste(df, state, year):
-    state = state.title()
-    state_data = df[df['state_ut_wise'].str.lower() == state.lower()]
-    if state_data.empty:
-        return None, f"No data found for state: {state}"
+def impact_level(value, thresholds):
+    low, high = thresholds
+    if value < low:
+        return 0
+    if low <= value <= high:
+        return 1
+    return 2
 
-    years = ['__2016_17', '_2017_18', '_2018_19', '_2019_20', '_2020_21']
-    waste_values = []
-    for year_col in years:
-        value = state_data.iloc[0][year_col]
-        if pd.isna(value) or value == 'NA':
-            continue
-        waste_values.append(float(value))
+def impact_levels(values, thresholds):
+    low, high = thresholds
+    return np.where(values < low, 0, np.where(values <= high, 1, 2))
 
-    if not waste_values:
-        return None, f"No valid data available for {state} to make a prediction."
+def plastic_panel(df):
+    return dataset_panel(df, PLASTIC_MEASURE)
 
-    avg_waste = sum(waste_values) / len(waste_values)
-    annual_growth_rate = 0.02  # 2% annual increase
-    latest_year = 2021
-    years_diff = year - latest_year
-    predicted_waste = avg_waste * (1 + annual_growth_rate) ** years_diff
-
-    impacts = []
-    if predicted_waste < 50000:
-        impacts.append("Environmental: Low land and water pollution risk.")
-        impacts.append("Economic: Manageable waste management costs.")
-    elif 50000 <= predicted_waste <= 200000:
-        impacts.append("Environmental: Moderate pollution risk, affecting local ecosystems.")
-        impacts.append("Economic: Increased costs for waste management and recycling.")
-    else:
-        impacts.append("Environmental: High pollution risk, severe impact on land and water bodies.")
-        impacts.append("Economic: Significant costs for waste management, cleanup, and policy enforcement.")
+def bod_panel(df):
+    return dataset_panel(df, BOD_MEASURE)
 
-    return predicted_waste, impacts
+def _trends(panel, model, fallback_growth):
+    return fitted_trends(panel, panel['periods'] - LATEST_YEAR, model, fallback_growth)
+
+def plastic_trends(df, model=DEFAULT_MODEL):
+    return _trends(plastic_panel(df), model, PLASTIC_GROWTH_RATE)
+
+def bod_trends(df, model=DEFAULT_MODEL):
+    return _trends(bod_panel(df), model, BOD_GROWTH_RATE)
 
-def predict_wastewater_bod(df, state, year):
+def _predict_one(panel, params, state, year):
+    position = region_index(panel).get(state_key(state))
+    if position is None:
+        return None
+    return float(evaluate_trends(params, [year - LATEST_YEAR], rows=[position])[0, 0])
+
+@metrics.timed('predict', dataset='plastic', mode='single')
+def predict_plastic_waste(df, state, year, model=DEFAULT_MODEL):
     state = state.title()
-    state_data = df[df['state'].str.lower() == state.lower()]
-    if state_data.empty:
+    predicted_waste = _predict_one(plastic_panel(df), plastic_trends(df, model), state, year)
+    if predicted_waste is None:
         return None, f"No data found for state: {state}"
+    if np.isnan(predicted_waste):
+        return None, f"No valid data available for {state} to make a prediction."
+
+    impacts = list(PLASTIC_IMPACTS[impact_level(predicted_waste, PLASTIC_IMPACT_THRESHOLDS)])
+    return predicted_waste, impacts
 
-    bod_load = float(state_data.iloc[0]['bod_load__tpd_'])
-    wastewater_discharge = float(state_data.iloc[0]['wastewater_discharge__mld_'])
-
-    annual_increase_rate = 0.01
-    latest_year = 2021
-    years_diff = year - latest_year
-    predicted_bod = bod_load * (1 + annual_increase_rate) ** years_diff
-
-    impacts = []
-    if predicted_bod < 2:
-        impacts.append("Ecological: Low impact on river ecosystem health.")
-        impacts.append("Social: Minimal impact on community well-being.")
-    elif 2 <= predicted_bod <= 5:
-        impacts.append("Ecological: Moderate impact, reduced oxygen levels affecting aquatic life.")
-        impacts.append("Social: Potential health risks for communities relying on the river.")
-    else:
-        impacts.append("Ecological: Severe impact, significant harm to aquatic ecosystems.")
-        impacts.append("Social: Major health and livelihood risks for river-dependent communities.")
+@metrics.timed('predict', dataset='wastewater', mode='single')
+def predict_wastewater_bod(df, state, year, model=DEFAULT_MODEL):
+    state = state.title()
+    predicted_bod = _predict_one(bod_panel(df), bod_trends(df, model), state, year)
+    if predicted_bod is None:
+        return None, f"No data found for state: {state}"
+    if np.isnan(predicted_bod):
+        return None, f"No valid data available for {state} to make a prediction."
 
+    impacts = list(BOD_IMPACTS[impact_level(predicted_bod, BOD_IMPACT_THRESHOLDS)])
     return predicted_bod, impacts
 
+def state_standing(df, state, table='plastic'):
+    # The state's rank among reporting states in the latest period, from the materialized
+    # table: (rank, states reporting, period label), or None if it reported nothing.
+    rows = period_rows(dataset_table(df, table))
+    if rows is None:
+        return None
+    match = rows[rows['key'] == state_key(state)]
+    if match.empty or np.isnan(match['rank'].iloc[0]):
+        return None
+    return int(match['rank'].iloc[0]), int(rows['value'].notna().sum()), match['label'].iloc[0]
+
+def plastic_vs_bod(plastic_df, wastewater_df):
+    return cross_table(plastic_df, wastewater_df)
+
+def _batch_rows(panel, states):
+    if states is None:
+        return np.arange(len(panel['regions']))
+    positions, missing = [], []
+    for state in states:
+        position = region_index(panel).get(state_key(state))
+        if position is None:
+            missing.append(state)
+        else:
+            positions.append(position)
+    if missing:
+        raise ValueError(f"No data found for state(s): {', '.join(missing)}")
+    return np.asarray(positions, dtype=np.intp)
+
+def _batch_frame(names, years, predicted, value_column, impacts, thresholds, impact_columns):
+    keep = ~np.isnan(predicted).any(axis=1)
+    names, predicted = names[keep], predicted[keep]
+    levels = impact_levels(predicted, thresholds).ravel()
+    frame = pd.DataFrame({
+        'state': np.repeat(names, len(years)),
+        'year': np.tile(years, len(names)),
+        value_column: predicted.ravel(),
+        'impact_level': pd.Categorical.from_codes(levels, IMPACT_LEVELS),
+    })
+    for i, column in enumerate(impact_columns):
+        frame[column] = pd.Categorical.from_codes(levels, [labels[i] for labels in impacts])
+    return frame
+
+@metrics.timed('predict', dataset='plastic', mode='batch')
+def predict_plastic_waste_batch(df, states=None, years=range(LATEST_YEAR + 1, 2051), model=DEFAULT_MODEL):
+    panel = plastic_panel(df)
+    rows = _batch_rows(panel, states)
+    years = np.asarray(list(years), dtype=np.int64)
+    predicted = evaluate_trends(plastic_trends(df, model), years - LATEST_YEAR, rows=rows)
+    names = np.asarray(panel['regions'], dtype=object)[rows]
+    return _batch_frame(names, years, predicted, 'predicted_waste_tonnes', PLASTIC_IMPACTS,
+                        PLASTIC_IMPACT_THRESHOLDS, ['environmental_impact', 'economic_impact'])
+
+@metrics.timed('predict', dataset='wastewater', mode='batch')
+def predict_wastewater_bod_batch(df, states=None, years=range(LATEST_YEAR + 1, 2051), model=DEFAULT_MODEL):
+    panel = bod_panel(df)
+    rows = _batch_rows(panel, states)
+    years = np.asarray(list(years), dtype=np.int64)
+    predicted = evaluate_trends(bod_trends(df, model), years - LATEST_YEAR, rows=rows)
+    names = np.asarray(panel['regions'], dtype=object)[rows]
+    return _batch_frame(names, years, predicted, 'predicted_bod_tpd', BOD_IMPACTS,
+                        BOD_IMPACT_THRESHOLDS, ['ecological_impact', 'social_impact'])
+
+def _scenario_frame(names, years, result, value_column):
+    keep = ~np.isnan(result['percentiles'][50]).any(axis=1)
+    names = names[keep]
+    frame = pd.DataFrame({'state': np.repeat(names, len(years)), 'year': np.tile(years, len(names))})
+    for percentile, band in result['percentiles'].items():
+        frame[f"{value_column}_p{percentile}"] = band[keep].ravel()
+    probabilities = result['probabilities'][keep]
+    for i, level in enumerate(IMPACT_LEVELS):
+        frame[f"probability_{level.lower()}"] = probabilities[..., i].ravel()
+    return frame
+
+def _scenarios(panel, states, years, thresholds, fallback_growth, scenarios, seed):
+    rows = _batch_rows(panel, states)
+    years = np.asarray(list(years), dtype=np.int64)
+    model = growth_model(panel['values'], panel['periods'], fallback_growth)
+    names = np.asarray(panel['regions'], dtype=object)[rows]
+    return names, years, project(model, years, thresholds, scenarios, seed, rows)
+
+@metrics.timed('predict', dataset='plastic', mode='scenarios')
+def predict_plastic_waste_scenarios(df, states=None, years=range(LATEST_YEAR + 1, 2051), scenarios=DEFAULT_SCENARIOS, seed=None):
+    # Percentile bands and the chance of each impact level, from `scenarios` draws of each
+    # state's starting level and growth rate.
+    names, years, result = _scenarios(plastic_panel(df), states, years, PLASTIC_IMPACT_THRESHOLDS,
+                                      PLASTIC_GROWTH_RATE, scenarios, seed)
+    return _scenario_frame(names, years, result, 'waste_tonnes')
+
+@metrics.timed('predict', dataset='wastewater', mode='scenarios')
+def predict_wastewater_bod_scenarios(df, states=None, years=range(LATEST_YEAR + 1, 2051), scenarios=DEFAULT_SCENARIOS, seed=None):
+    names, years, result = _scenarios(bod_panel(df), states, years, BOD_IMPACT_THRESHOLDS,
+                                      BOD_GROWTH_RATE, scenarios, seed)
+    return _scenario_frame(names, years, result, 'bod_tpd')
+
+@metrics.timed('predict', dataset='plastic', mode='backtest')
+def backtest_plastic_waste(df, models=TREND_MODELS, workers=None, min_train=MIN_TRAIN):
+    # How far off predict_plastic_waste would have been, one year ahead, from every past year.
+    return backtest_panel(plastic_panel(df), models, PLASTIC_GROWTH_RATE, workers, min_train)
+
+@metrics.timed('predict', dataset='wastewater', mode='backtest')
+def backtest_wastewater_bod(df, models=TREND_MODELS, workers=None, min_train=MIN_TRAIN):
+    return backtest_panel(bod_panel(df), models, BOD_GROWTH_RATE, workers, min_train)
+
 def run_plastic_waste_prediction(data_path):
     try:
-        df = pd.read_csv(data_path)
+        df = load_dataset(data_path)
         if df.empty:
             print(f"❌ No data found in {data_path}. Please fetch Plastic Waste data again (Option 1).\n")
             return False
@@ -87,17 +223,20 @@ def run_plastic_waste_prediction(data_path):
         return False
     
     while True:
-        print("\nAvailable states/UTs:", ", ".join(df['state_ut_wise'].unique()))
+        print("\nAvailable states/UTs:", ", ".join(plastic_panel(df)['regions']))
         state = input("Enter state/UT name (e.g., Andhra Pradesh): ").strip()
         year = input("Enter year to predict plastic waste (e.g., 2025): ").strip()
         try:
             year = int(year)
-            if year <= 2021:
-                print("❌ Please enter a future year (after 2021).\n")
+            if year <= LATEST_YEAR:
+                print(f"❌ Please enter a future year (after {LATEST_YEAR}).\n")
                 continue
             predicted_waste, result = predict_plastic_waste(df, state, year)
             if predicted_waste is not None:
                 print(f"\nPredicted plastic waste for {state.title()} in {year}: {predicted_waste:,.2f} tonnes")
+                standing = state_standing(df, state, 'plastic')
+                if standing is not None:
+                    print(f"Ranked {standing[0]} of {standing[1]} states/UTs in {standing[2]}")
                 print("Impacts:")
                 for impact in result:
                     print(f"  - {impact}")
@@ -113,7 +252,7 @@ def run_plastic_waste_prediction(data_path):
 
 def run_wastewater_prediction(data_path):
     try:
-        df = pd.read_csv(data_path)
+        df = load_dataset(data_path)
         if df.empty:
             print(f"❌ No data found in {data_path}. Please fetch Wastewater data again (Option 1).\n")
             return False
@@ -125,17 +264,20 @@ def run_wastewater_prediction(data_path):
         return False
     
     while True:
-        print("\nAvailable states:", ", ".join(df['state'].unique()))
+        print("\nAvailable states:", ", ".join(bod_panel(df)['regions']))
         state = input("Enter state name (e.g., Uttar Pradesh): ").strip()
         year = input("Enter year to predict BOD load (e.g., 2025): ").strip()
         try:
             year = int(year)
-            if year <= 2021:
-                print("❌ Please enter a future year (after 2021).\n")
+            if year <= LATEST_YEAR:
+                print(f"❌ Please enter a future year (after {LATEST_YEAR}).\n")
                 continue
             predicted_bod, result = predict_wastewater_bod(df, state, year)
             if predicted_bod is not None:
                 print(f"\nPredicted BOD load for {state.title()} in {year}: {predicted_bod:.2f} tonnes/day")
+                standing = state_standing(df, state, 'bod_load')
+                if standing is not None:
+                    print(f"Ranked {standing[0]} of {standing[1]} states in {standing[2]}")
                 print("Impacts:")
                 for impact in result:
                     print(f"  - {impact}")
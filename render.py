@@ -0,0 +1,230 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+import metrics
+from charts import DPI, STATE_KINDS, all_state_jobs
+
+WASTE_LABEL = "Plastic Waste (tonnes)"
+BAR_WIDTH = 0.8
+COMBINED_BAR_WIDTH = 0.35
+
+def _set_category_ticks(ax, labels, offset=0.0, rotate=False):
+    positions = [i + offset for i in range(len(labels))]
+    if rotate:
+        ax.set_xticks(positions, labels=labels, rotation=45, ha='right')
+    else:
+        ax.set_xticks(positions, labels=labels)
+
+def _draw_state(ax, job):
+    y, kind = job['y'], job['chart']
+    x = range(len(y))
+    if kind == 'line':
+        ax.plot(x, y, color="blue", label=WASTE_LABEL)
+    elif kind == 'scatter':
+        ax.scatter(x, y, color="blue", edgecolor="black", label=WASTE_LABEL)
+    elif kind == 'bar':
+        ax.bar(x, y, color="blue", edgecolor="black", label=WASTE_LABEL)
+    else:
+        ax.fill_between(x, y, color="blue", alpha=0.5, label=WASTE_LABEL)
+    _set_category_ticks(ax, job['x'])
+    ax.set_title(job['title'], fontsize=16)
+    ax.set_xlabel("Years", fontsize=12)
+    ax.set_ylabel(WASTE_LABEL, fontsize=12)
+    ax.legend(loc=2)
+    ax.grid(True)
+
+def _draw_comparison(ax, job):
+    ax.bar(range(len(job['y'])), job['y'], color="purple", edgecolor="black")
+    _set_category_ticks(ax, job['x'], rotate=True)
+    ax.set_title(job['title'], fontsize=16)
+    ax.set_xlabel("States/UTs", fontsize=12)
+    ax.set_ylabel(WASTE_LABEL, fontsize=12)
+    ax.grid(True, axis='y')
+
+def _draw_discharge(ax, job):
+    ax.bar(range(len(job['y'])), job['y'], color="teal", edgecolor="black")
+    _set_category_ticks(ax, job['x'], rotate=True)
+    ax.set_title("Wastewater Discharge into Ganga by State (2020-21)", fontsize=16)
+    ax.set_xlabel("States", fontsize=12)
+    ax.set_ylabel("Wastewater Discharge (MLD)", fontsize=12)
+    ax.grid(True, axis='y')
+
+def _draw_bod_load(ax, job):
+    ax.bar(range(len(job['y'])), job['y'], color="orange", edgecolor="black")
+    _set_category_ticks(ax, job['x'], rotate=True)
+    ax.set_title("BOD Load into Ganga by State (2020-21)", fontsize=16)
+    ax.set_xlabel("States", fontsize=12)
+    ax.set_ylabel("BOD Load (tonnes/day)", fontsize=12)
+    ax.grid(True, axis='y')
+
+def _draw_combined(ax, job):
+    x = range(len(job['x']))
+    ax.bar(x, job['y'], COMBINED_BAR_WIDTH, label="Wastewater Discharge (MLD)", color="teal")
+    ax.bar([i + COMBINED_BAR_WIDTH for i in x], job['y2'], COMBINED_BAR_WIDTH, label="BOD Load (tonnes/day)", color="orange")
+    _set_category_ticks(ax, job['x'], offset=COMBINED_BAR_WIDTH / 2, rotate=True)
+    ax.set_title("Wastewater Discharge and BOD Load by State (2020-21)", fontsize=16)
+    ax.set_xlabel("States", fontsize=12)
+    ax.set_ylabel("Values", fontsize=12)
+    ax.legend()
+    ax.grid(True, axis='y')
+
+DRAWERS = {
+    'line': _draw_state, 'scatter': _draw_state, 'bar': _draw_state, 'area': _draw_state,
+    'comparison': _draw_comparison,
+    'wastewater_discharge': _draw_discharge,
+    'bod_load': _draw_bod_load,
+    'wastewater_combined': _draw_combined,
+}
+
+def draw_job(fig, job):
+    DRAWERS[job['chart']](fig.add_subplot(), job)
+    fig.tight_layout()
+
+SUBPLOT_SIDES = ('left', 'right', 'bottom', 'top')
+
+BAR_GROUPS = {
+    'bar': [('y', 0.0)], 'comparison': [('y', 0.0)],
+    'wastewater_discharge': [('y', 0.0)], 'bod_load': [('y', 0.0)],
+    'wastewater_combined': [('y', 0.0), ('y2', COMBINED_BAR_WIDTH)],
+}
+
+def _update_bars(ax, bars, positions, heights, width):
+    # Grow the pool of bars when a chart needs more than it has ever shown; hide the surplus.
+    while len(bars) < len(heights):
+        bar = Rectangle((0, 0), width, 0)
+        bar.update_from(bars[0])
+        ax.add_patch(bar)
+        bars.append(bar)
+    for i, bar in enumerate(bars):
+        if i < len(heights):
+            bar.set_x(positions[i] - width / 2)
+            bar.set_width(width)
+            bar.set_height(heights[i])
+            bar.set_visible(True)
+        else:
+            bar.set_visible(False)
+
+class ChartRenderer:
+    def __init__(self):
+        self._charts = {}
+
+    def _create(self, job):
+        fig = Figure(figsize=job['figsize'])
+        draw_job(fig, job)
+        ax = fig.axes[0]
+        return {'fig': fig, 'ax': ax, 'bars': [list(container.patches) for container in ax.containers]}
+
+    def _update(self, chart, job):
+        ax, kind = chart['ax'], job['chart']
+        y = np.asarray(job['y'], dtype=float)
+        x = np.arange(len(y), dtype=float)
+        tick_offset = 0.0
+        if 'title' in job:
+            ax.title.set_text(job['title'])
+        if kind == 'line':
+            ax.lines[0].set_data(x, y)
+            points = np.column_stack([x, y])
+        elif kind == 'scatter':
+            ax.collections[0].set_offsets(np.column_stack([x, y]))
+            points = np.column_stack([x, y])
+        elif kind == 'area':
+            outline = np.column_stack([np.concatenate([x[:1], x, x[-1:]]), np.concatenate([[0.0], y, [0.0]])])
+            ax.collections[0].set_verts([outline])
+            points = outline
+        else:
+            groups = BAR_GROUPS[kind]
+            width = COMBINED_BAR_WIDTH if len(groups) > 1 else BAR_WIDTH
+            points = []
+            for bars, (field, offset) in zip(chart['bars'], groups):
+                heights = np.asarray(job[field], dtype=float)
+                _update_bars(ax, bars, x + offset, heights, width)
+                points.append(np.column_stack([x + offset - width / 2, np.zeros_like(heights)]))
+                points.append(np.column_stack([x + offset + width / 2, heights]))
+            points = np.vstack(points)
+            tick_offset = width / 2 if len(groups) > 1 else 0.0
+        _set_category_ticks(ax, job['x'], offset=tick_offset, rotate=kind not in STATE_KINDS)
+        ax.ignore_existing_data_limits = True
+        ax.update_datalim(points)
+        ax.autoscale_view()
+        # tight_layout starts from the current margins, so reset them to match a freshly drawn figure.
+        chart['fig'].subplots_adjust(**{side: rcParams[f'figure.subplot.{side}'] for side in SUBPLOT_SIDES})
+        chart['fig'].tight_layout()
+
+    def _draw(self, job):
+        key = (job['chart'], tuple(job['figsize']))
+        chart = self._charts.get(key)
+        with metrics.span('draw', chart=job['chart']):
+            if chart is None:
+                chart = self._charts[key] = self._create(job)
+            else:
+                self._update(chart, job)
+        return chart['fig']
+
+    def render(self, job):
+        fig = self._draw(job)
+        with metrics.span('savefig', chart=job['chart']):
+            fig.savefig(job['path'], dpi=DPI)
+        return job['path']
+
+    def render_bytes(self, job):
+        fig = self._draw(job)
+        buffer = io.BytesIO()
+        with metrics.span('savefig', chart=job['chart']):
+            fig.savefig(buffer, format='png', dpi=DPI)
+        metrics.count('png_bytes', buffer.tell(), chart=job['chart'])
+        return buffer.getvalue()
+
+    def close(self):
+        for chart in self._charts.values():
+            chart['fig'].clear()
+        self._charts.clear()
+
+_renderer = None
+
+def shared_renderer():
+    # One renderer per process, so pool workers keep reusing their figures between jobs.
+    global _renderer
+    if _renderer is None:
+        _renderer = ChartRenderer()
+    return _renderer
+
+def render_job(job):
+    return shared_renderer().render(job)
+
+def render_png(job):
+    return shared_renderer().render_bytes(job)
+
+def measured(render, job):
+    # Runs in a pool worker: what it measured goes back with the result for the parent to merge.
+    metrics.enable(events=False)
+    metrics.reset()
+    result = render(job)
+    return result, metrics.state()
+
+def render_jobs(jobs, workers=None):
+    for out_dir in {os.path.dirname(job['path']) for job in jobs}:
+        os.makedirs(out_dir or '.', exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        renderer = ChartRenderer()
+        try:
+            return [renderer.render(job) for job in jobs]
+        finally:
+            renderer.close()
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if not metrics.enabled:
+            return list(pool.map(render_job, jobs, chunksize=chunksize))
+        paths = []
+        for path, measurements in pool.map(partial(measured, render_job), jobs, chunksize=chunksize):
+            metrics.merge(measurements)
+            paths.append(path)
+        return paths
+
+def render_all_states(df, out_dir='plots', year_input=None, workers=None):
+    return render_jobs(all_state_jobs(df, out_dir, year_input), workers)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+CACHE_DIR = os.path.join('data', 'cache', 'http')
+DEFAULT_TTL = 3600  # seconds a cached page is served without contacting the API
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+IGNORED_PARAMS = {'api-key'}
+
+def cache_key(url, params=None):
+    parts = urlsplit(url)
+    resource_id = parts.path.rstrip('/').rsplit('/', 1)[-1]
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in IGNORED_PARAMS]
+    query.extend((k, str(v)) for k, v in (params or {}).items() if k not in IGNORED_PARAMS)
+    canonical = resource_id + '?' + '&'.join(f"{k}={v}" for k, v in sorted(query))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def write_atomic(path, data):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ResponseCache:
+    def __init__(self, directory=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._index = None  # key -> (size, last_used), loaded from disk once
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, f"{key}.body")
+
+    def _load_index(self):
+        if self._index is None:
+            index = {}
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    key = name[:-len('.json')]
+                    meta = self.lookup(key)
+                    if meta is not None:
+                        index[key] = (meta['size'], meta['last_used'])
+            self._index = index
+        return self._index
+
+    def _update_index(self, key, meta):
+        with self._lock:
+            self._load_index()[key] = (meta['size'], meta['last_used'])
+
+    def lookup(self, key):
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, meta):
+        return self.ttl is not None and time.time() - meta['stored_at'] < self.ttl
+
+    def read_body(self, key):
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def conditional_headers(self, meta):
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def _write_meta(self, key, meta):
+        write_atomic(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+        self._update_index(key, meta)
+
+    def store(self, key, body, etag=None, last_modified=None):
+        now = time.time()
+        write_atomic(self._body_path(key), body)
+        self._write_meta(key, {
+            'etag': etag, 'last_modified': last_modified,
+            'stored_at': now, 'last_used': now, 'size': len(body),
+        })
+
+    def revalidated(self, key, meta, etag=None, last_modified=None):
+        now = time.time()
+        meta = dict(meta, stored_at=now, last_used=now)
+        if etag:
+            meta['etag'] = etag
+        if last_modified:
+            meta['last_modified'] = last_modified
+        self._write_meta(key, meta)
+        return meta
+
+    def touch(self, key, meta):
+        self._write_meta(key, dict(meta, last_used=time.time()))
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for size, _ in self._load_index().values())
+
+    def remove(self, key):
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._load_index().pop(key, None)
+
+    def evict(self):
+        if self.max_bytes is None:
+            return []
+        with self._lock:
+            index = self._load_index()
+            total = sum(size for size, _ in index.values())
+            victims = []
+            for key, (size, _) in sorted(index.items(), key=lambda entry: entry[1][1]):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+        for key in victims:
+            self.remove(key)
+        return victims
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._load_index())
+        for key in keys:
+            self.remove(key)
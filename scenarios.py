@@ -0,0 +1,95 @@
+import numpy as np
+import metrics
+
+DEFAULT_SCENARIOS = 10_000
+PERCENTILES = (5, 25, 50, 75, 95)
+# Spread assumed when a state's history is too short to measure one: 2% a year on the
+# growth rate, 5% on the starting level.
+DEFAULT_GROWTH_SPREAD = 0.02
+DEFAULT_BASELINE_SPREAD = 0.05
+MIN_GROWTH_SPREAD = 0.005
+CHUNK_VALUES = 1 << 24  # float32 cells simulated at once (64 MB)
+
+def growth_model(values, periods, fallback_growth=0.0):
+    # Per row of `values` (regions x periods): the last reported value and its period, the
+    # mean annual log growth between consecutive reports and its standard error, and how far
+    # the reports scatter around that growth path. Rows with one report grow at
+    # `fallback_growth`; rows with none are NaN.
+    values = np.asarray(values, dtype=float)
+    periods = np.asarray(periods, dtype=float)
+    observed = ~np.isnan(values)
+    count = observed.sum(axis=1)
+    # Index of the last report in each row (0 for an empty row, masked out below).
+    last_index = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    rows = np.arange(len(values))
+    last = np.where(count > 0, values[rows, last_index], np.nan)
+    last_period = periods[last_index]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        logs = np.log(np.where(values > 0, values, np.nan))
+        # Carry the previous report forward so a gap year still gives one rate over two years.
+        filled = np.where(~np.isnan(logs), np.arange(values.shape[1]), -1)
+        filled = np.maximum.accumulate(filled, axis=1)
+        previous = np.concatenate([np.full((len(values), 1), -1), filled[:, :-1]], axis=1)
+        has_previous = ~np.isnan(logs) & (previous >= 0)
+        previous = np.maximum(previous, 0)
+        rates = (logs - logs[rows[:, None], previous]) / (periods[None, :] - periods[previous])
+        rates = np.where(has_previous, rates, np.nan)
+        steps = has_previous.sum(axis=1)
+        mean_rate = np.nansum(rates, axis=1) / steps
+        spread = np.sqrt(np.nansum((rates - mean_rate[:, None]) ** 2, axis=1) / (steps - 1))
+        growth_spread = np.where(steps >= 2, np.maximum(spread / np.sqrt(steps), MIN_GROWTH_SPREAD),
+                                 DEFAULT_GROWTH_SPREAD)
+        growth = np.where(steps >= 1, mean_rate, np.log1p(fallback_growth))
+
+        path = logs[rows, last_index][:, None] + growth[:, None] * (periods[None, :] - last_period[:, None])
+        residuals = np.where(np.isnan(logs), np.nan, logs - path)
+        positive = (~np.isnan(logs)).sum(axis=1)
+        baseline_spread = np.sqrt(np.nansum(residuals ** 2, axis=1) / np.maximum(positive - 1, 1))
+        baseline_spread = np.where(positive >= 3, baseline_spread, DEFAULT_BASELINE_SPREAD)
+    return {'last': last, 'last_period': last_period, 'growth': growth, 'growth_spread': growth_spread,
+            'baseline_spread': baseline_spread}
+
+def simulate(model, years, scenarios=DEFAULT_SCENARIOS, rng=None, rows=None):
+    # log(value) for every row x year x scenario: each scenario draws one starting level
+    # (around the last report) and one growth rate (around the measured one) and keeps both
+    # for every year. Returned as float32, rows x years x scenarios, so summaries read each
+    # row-year's scenarios contiguously.
+    rng = rng if rng is not None else np.random.default_rng()
+    pick = (lambda a: a) if rows is None else (lambda a: a[rows])
+    last, last_period = pick(model['last']), pick(model['last_period'])
+    # A last report of zero starts at the smallest positive float rather than log(0).
+    level = np.log(np.maximum(last, np.finfo(np.float32).tiny)).astype(np.float32)
+    shape = (len(last), scenarios)
+    baseline = level[:, None] + pick(model['baseline_spread']).astype(np.float32)[:, None] * rng.standard_normal(shape, dtype=np.float32)
+    growth = pick(model['growth']).astype(np.float32)[:, None] + \
+        pick(model['growth_spread']).astype(np.float32)[:, None] * rng.standard_normal(shape, dtype=np.float32)
+    elapsed = (np.asarray(years, dtype=np.float32)[None, :] - last_period[:, None].astype(np.float32))
+    return baseline[:, None, :] + growth[:, None, :] * elapsed[:, :, None]
+
+def summarize(log_values, thresholds, percentiles=PERCENTILES):
+    # Percentiles are taken on the logs and exponentiated afterwards (exp keeps their order),
+    # and categories are counted against log thresholds, so no full-size exp is needed.
+    bands = np.exp(np.percentile(log_values, percentiles, axis=-1).astype(np.float64))
+    low, high = np.log(thresholds[0]), np.log(thresholds[1])
+    scenarios = log_values.shape[-1]
+    below = np.count_nonzero(log_values < low, axis=-1)
+    above = np.count_nonzero(log_values > high, axis=-1)
+    return {'percentiles': dict(zip(percentiles, bands)),
+            'probabilities': np.stack([below, scenarios - below - above, above], axis=-1) / scenarios}
+
+@metrics.timed('scenarios')
+def project(model, years, thresholds, scenarios=DEFAULT_SCENARIOS, seed=None, rows=None, percentiles=PERCENTILES):
+    # simulate() + summarize() over blocks of rows, so memory stays bounded however many
+    # regions there are. The same seed gives the same result.
+    rng = np.random.default_rng(seed)
+    rows = np.arange(len(model['last'])) if rows is None else np.asarray(rows)
+    years = np.asarray(years)
+    step = max(1, CHUNK_VALUES // max(len(years) * scenarios, 1))
+    parts = [summarize(simulate(model, years, scenarios, rng, rows[start:start + step]), thresholds, percentiles)
+             for start in range(0, len(rows), step)]
+    if not parts:
+        return {'percentiles': {p: np.empty((0, len(years))) for p in percentiles},
+                'probabilities': np.empty((0, len(years), 3))}
+    return {'percentiles': {p: np.concatenate([part['percentiles'][p] for part in parts]) for p in percentiles},
+            'probabilities': np.concatenate([part['probabilities'] for part in parts])}
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from aiohttp import web
+import metrics
+from catalog import DATA_DIRS, DATASETS, LATEST_YEAR, TREND_MODELS, dataset_path
+from prediction import predict_plastic_waste_batch, predict_wastewater_bod_batch
+from charts import STATE_KINDS, WASTEWATER_CHARTS, plastic_comparison_job, plastic_state_jobs, wastewater_jobs
+from render import measured, render_png
+from longform import dataset_panel, region_index
+from params import parse_states, parse_years
+from states import state_key
+from storage import load_versioned
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+PNG_CACHE_BYTES = 64 * 1024 * 1024
+PREDICTORS = {'plastic': predict_plastic_waste_batch, 'wastewater': predict_wastewater_bod_batch}
+
+class ResidentDatasets:
+    # Datasets come from the process-wide loader (storage.load_versioned): parsed once per
+    # version, with the content hash as the version that rendered charts are keyed by.
+    def __init__(self):
+        self._locks = {}
+
+    async def get(self, dataset, source):
+        path = dataset_path(dataset, source)
+        # One load per dataset at a time, so concurrent requests wait for the same parse.
+        async with self._locks.setdefault((dataset, source), asyncio.Lock()):
+            try:
+                return await asyncio.to_thread(load_versioned, path)
+            except FileNotFoundError:
+                return None, None
+
+class PngCache:
+    # Rendered charts by request, least recently used first out once over max_bytes.
+    # Identical requests that arrive while a chart is being drawn wait for that one render.
+    def __init__(self, max_bytes=PNG_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.renders = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def lookup(self, key):
+        png = self._entries.get(key)
+        if png is not None:
+            self._entries.move_to_end(key)
+            metrics.count('png_cache_hits')
+        return png
+
+    async def get(self, key, render):
+        png = self.lookup(key)
+        if png is not None:
+            return png
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(render())
+            pending.add_done_callback(lambda future: self._finish(key, future))
+            self.renders += 1
+            metrics.count('png_renders')
+        # A client that disconnects must not cancel the render the other waiters share.
+        return await asyncio.shield(pending)
+
+    def _finish(self, key, future):
+        del self._pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        png = future.result()
+        self._entries[key] = png
+        self.total_bytes += len(png)
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= len(evicted)
+
+RESIDENT = web.AppKey('resident', ResidentDatasets)
+PNGS = web.AppKey('pngs', PngCache)
+POOL = web.AppKey('pool', ProcessPoolExecutor)
+
+def error(status, message):
+    return web.json_response({'error': message}, status=status)
+
+def http_error(error_class, message):
+    return error_class(text=json.dumps({'error': message}), content_type='application/json')
+
+def dataset_arg(request):
+    dataset = request.match_info['dataset']
+    source = request.query.get('source', 'saved')
+    if dataset not in DATASETS:
+        raise http_error(web.HTTPNotFound, f"Unknown dataset: {dataset}")
+    if source not in DATA_DIRS:
+        raise http_error(web.HTTPBadRequest, f"Unknown source: {source}")
+    return dataset, source
+
+async def render_in_pool(pool, job):
+    loop = asyncio.get_running_loop()
+    if not metrics.enabled:
+        return await loop.run_in_executor(pool, render_png, job)
+    png, measurements = await loop.run_in_executor(pool, partial(measured, render_png), job)
+    metrics.merge(measurements)
+    return png
+
+@web.middleware
+async def timing(request, handler):
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else 'unmatched'
+    status = 500
+    started = metrics.start()
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.stop('request', started, route=route)
+        metrics.count('requests', route=route, status=status)
+
+async def health(request):
+    return web.json_response({'status': 'ok'})
+
+async def list_datasets(request):
+    result = {}
+    for dataset, info in DATASETS.items():
+        _, df = await request.app[RESIDENT].get(dataset, 'saved')
+        result[dataset] = {
+            'topic': info['topic'],
+            'states': [] if df is None else df[info['key']].dropna().tolist(),
+            'charts': sorted(STATE_KINDS) + ['comparison'] if dataset == 'plastic' else list(WASTEWATER_CHARTS),
+        }
+    return web.json_response(result)
+
+async def predict(request):
+    dataset, source = dataset_arg(request)
+    try:
+        states = parse_states(request.query['states']) if 'states' in request.query else None
+        years = parse_years(request.query.get('years', f"{LATEST_YEAR + 1}-2030"))
+    except argparse.ArgumentTypeError as e:
+        return error(400, str(e))
+    model = request.query.get('model', TREND_MODELS[0])
+    if model not in TREND_MODELS:
+        return error(400, f"Unknown model: {model}")
+    _, df = await request.app[RESIDENT].get(dataset, source)
+    if df is None:
+        return error(404, f"No {source} data for {dataset}")
+    try:
+        # Fitting and evaluating run in a thread, so other requests are served meanwhile.
+        frame = await asyncio.to_thread(PREDICTORS[dataset], df, states, years, model=model)
+    except ValueError as e:
+        return error(404, str(e))
+    frame = frame.astype({column: str for column in frame.columns if frame[column].dtype == 'category'})
+    return web.json_response({'dataset': dataset, 'model': model, 'predictions': frame.to_dict(orient='records')})
+
+def chart_job(dataset, df, chart, state, year):
+    if dataset == 'wastewater':
+        if chart not in WASTEWATER_CHARTS:
+            return None, f"Unknown chart: {chart}"
+        jobs = wastewater_jobs(df, out_dir='')
+    elif chart == 'comparison':
+        if year is None:
+            return None, "The comparison chart needs ?year=, e.g. 2020-21"
+        job = plastic_comparison_job(df, year, out_dir='')
+        jobs = [] if job is None else [job]
+    elif chart in STATE_KINDS:
+        if state is None or state_key(state) not in region_index(dataset_panel(df)):
+            return None, f"No data found for state: {state}"
+        jobs = plastic_state_jobs(df, state, out_dir='')
+    else:
+        return None, f"Unknown chart: {chart}"
+    job = next((job for job in jobs if job['chart'] == chart), None)
+    return job, None if job is not None else f"No data to plot for {chart}"
+
+async def chart(request):
+    dataset, source = dataset_arg(request)
+    name = request.match_info['chart']
+    state, year = request.query.get('state'), request.query.get('year')
+    signature, df = await request.app[RESIDENT].get(dataset, source)
+    if df is None:
+        return error(404, f"No {source} data for {dataset}")
+    key = (dataset, source, signature, name, state and state.lower(), year)
+    png = request.app[PNGS].lookup(key)
+    if png is None:
+        # Building a job can mean building the long table or an analytics table first.
+        job, message = await asyncio.to_thread(chart_job, dataset, df, name, state, year)
+        if job is None:
+            return error(404, message)
+        png = await request.app[PNGS].get(key, lambda: render_in_pool(request.app[POOL], job))
+    return web.Response(body=png, content_type='image/png')
+
+async def metrics_text(request):
+    return web.Response(body=metrics.prometheus_text().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+def create_app(workers=None, png_cache_bytes=PNG_CACHE_BYTES):
+    app = web.Application(middlewares=[timing])
+    app[RESIDENT] = ResidentDatasets()
+    app[PNGS] = PngCache(png_cache_bytes)
+
+    async def start_pool(app):
+        # Drawing is CPU-bound, so it runs in worker processes and the event loop keeps serving.
+        app[POOL] = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    async def stop_pool(app):
+        app[POOL].shutdown(cancel_futures=True)
+
+    app.on_startup.append(start_pool)
+    app.on_cleanup.append(stop_pool)
+    app.router.add_get('/health', health)
+    app.router.add_get('/datasets', list_datasets)
+    app.router.add_get('/predict/{dataset}', predict)
+    app.router.add_get('/charts/{dataset}/{chart}.png', chart)
+    app.router.add_get('/metrics', metrics_text)
+    return app
+
+def run(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None):
+    # A long-running service keeps totals for /metrics but not a log of every single span.
+    metrics.enable(events=False)
+    print(f"🚀 DhartiMetrics service on http://{host}:{port}/ (predictions: /predict/<dataset>, charts: /charts/<dataset>/<chart>.png)")
+    web.run_app(create_app(workers), host=host, port=port, print=None)
@@ -0,0 +1,212 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from catalog import DATASETS
+from response_cache import write_atomic
+
+SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+
+# Layout of one dataset's history, e.g. data/snapshots/plastic/:
+#   snapshots/<id>.json  column names and the ordered row hashes of one version
+#   rows/<id>.jsonl      the rows that version introduced, one [hash, values] per line
+#   refs.json            named pointers such as 'api' and 'saved'
+# A snapshot id is the hash of its content, so committing an identical fetch writes nothing,
+# and a row shared by many versions is stored once.
+
+def row_hash(values):
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def snapshot_id(columns, hashes):
+    return hashlib.sha256(json.dumps([columns, hashes]).encode('utf-8')).hexdigest()
+
+def short_id(snapshot):
+    return snapshot[:12]
+
+def read_csv_rows(path):
+    # Rows are kept as the exact CSV text, so the same data always hashes the same way
+    # no matter how pandas would have typed it.
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        return columns, [row for row in reader if row]
+
+class SnapshotStore:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self._rows = {}  # dataset -> {row hash: values}, loaded on first use
+
+    def _dir(self, dataset, *parts):
+        return os.path.join(self.root, dataset, *parts)
+
+    def _manifest_path(self, dataset, snapshot):
+        return self._dir(dataset, 'snapshots', f"{snapshot}.json")
+
+    def _known_rows(self, dataset):
+        if dataset not in self._rows:
+            rows = {}
+            rows_dir = self._dir(dataset, 'rows')
+            if os.path.isdir(rows_dir):
+                for name in sorted(os.listdir(rows_dir)):
+                    if name.endswith('.jsonl'):
+                        with open(os.path.join(rows_dir, name), 'r', encoding='utf-8') as f:
+                            for line in f:
+                                digest, values = json.loads(line)
+                                rows[digest] = values
+            self._rows[dataset] = rows
+        return self._rows[dataset]
+
+    def manifest(self, dataset, snapshot):
+        try:
+            with open(self._manifest_path(dataset, snapshot), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"No snapshot {short_id(snapshot)} for {dataset}") from None
+
+    def commit(self, dataset, columns, rows, ref=None, source=None):
+        columns = list(columns)
+        rows = [[str(value) for value in row] for row in rows]
+        hashes = [row_hash(row) for row in rows]
+        snapshot = snapshot_id(columns, hashes)
+        if not os.path.exists(self._manifest_path(dataset, snapshot)):
+            known = self._known_rows(dataset)
+            new_rows = {}
+            for digest, row in zip(hashes, rows):
+                if digest not in known:
+                    new_rows.setdefault(digest, row)
+            os.makedirs(self._dir(dataset, 'rows'), exist_ok=True)
+            os.makedirs(self._dir(dataset, 'snapshots'), exist_ok=True)
+            # Rows go first and the manifest last, so a crash never leaves a snapshot
+            # pointing at rows that were not written.
+            if new_rows:
+                lines = ''.join(json.dumps([digest, row], ensure_ascii=False) + '\n' for digest, row in new_rows.items())
+                write_atomic(self._dir(dataset, 'rows', f"{snapshot}.jsonl"), lines.encode('utf-8'))
+                known.update(new_rows)
+            manifest = {'id': snapshot, 'columns': columns, 'rows': hashes,
+                        'new_rows': len(new_rows), 'created_at': time.time(), 'source': source}
+            write_atomic(self._manifest_path(dataset, snapshot), json.dumps(manifest).encode('utf-8'))
+        if ref is not None:
+            self.set_ref(dataset, ref, snapshot)
+        return snapshot
+
+    def commit_csv(self, dataset, csv_path, ref=None):
+        columns, rows = read_csv_rows(csv_path)
+        return self.commit(dataset, columns, rows, ref=ref, source=csv_path)
+
+    def refs(self, dataset):
+        try:
+            with open(self._dir(dataset, 'refs.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def resolve(self, dataset, ref):
+        return self.refs(dataset).get(ref)
+
+    def set_ref(self, dataset, ref, snapshot):
+        refs = self.refs(dataset)
+        if refs.get(ref) != snapshot:
+            refs[ref] = snapshot
+            os.makedirs(self._dir(dataset), exist_ok=True)
+            write_atomic(self._dir(dataset, 'refs.json'), json.dumps(refs, indent=2).encode('utf-8'))
+
+    def history(self, dataset):
+        snapshots_dir = self._dir(dataset, 'snapshots')
+        if not os.path.isdir(snapshots_dir):
+            return []
+        manifests = [self.manifest(dataset, name[:-len('.json')])
+                     for name in os.listdir(snapshots_dir) if name.endswith('.json')]
+        return sorted(manifests, key=lambda manifest: manifest['created_at'])
+
+    def rows(self, dataset, snapshot):
+        manifest = self.manifest(dataset, snapshot)
+        known = self._known_rows(dataset)
+        return manifest['columns'], [known[digest] for digest in manifest['rows']]
+
+    def export_csv(self, dataset, snapshot, csv_path):
+        columns, rows = self.rows(dataset, snapshot)
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(columns)
+        writer.writerows(rows)
+        write_atomic(csv_path, buffer.getvalue().encode('utf-8'))
+        return csv_path
+
+    def diff(self, dataset, old, new, key=None):
+        old_manifest, new_manifest = self.manifest(dataset, old), self.manifest(dataset, new)
+        old_hashes, new_hashes = set(old_manifest['rows']), set(new_manifest['rows'])
+        # Only rows whose hash differs are looked at, so the cost follows the size of the change.
+        known = self._known_rows(dataset)
+        removed = [dict(zip(old_manifest['columns'], known[h])) for h in old_manifest['rows'] if h not in new_hashes]
+        added = [dict(zip(new_manifest['columns'], known[h])) for h in new_manifest['rows'] if h not in old_hashes]
+        changed = []
+        if key is not None:
+            old_by_key = {row.get(key): row for row in removed}
+            paired = set()
+            for row in added:
+                before = old_by_key.get(row.get(key))
+                if before is not None and row.get(key) not in paired:
+                    paired.add(row.get(key))
+                    columns = [col for col in dict.fromkeys([*before, *row]) if before.get(col) != row.get(col)]
+                    changed.append((row.get(key), {col: (before.get(col), row.get(col)) for col in columns}))
+            removed = [row for row in removed if row.get(key) not in paired]
+            added = [row for row in added if row.get(key) not in paired]
+        return {
+            'added': added, 'removed': removed, 'changed': changed,
+            'unchanged': len(old_hashes & new_hashes),
+            'columns_added': [col for col in new_manifest['columns'] if col not in old_manifest['columns']],
+            'columns_removed': [col for col in old_manifest['columns'] if col not in new_manifest['columns']],
+        }
+
+def format_diff(diff, key=None, limit=10):
+    lines = [f"  {len(diff['added'])} added, {len(diff['removed'])} removed, "
+             f"{len(diff['changed'])} changed, {diff['unchanged']} unchanged rows"]
+    if diff['columns_added']:
+        lines.append(f"  + columns: {', '.join(diff['columns_added'])}")
+    if diff['columns_removed']:
+        lines.append(f"  - columns: {', '.join(diff['columns_removed'])}")
+    entries = [f"  ~ {name}: " + ', '.join(f"{col} {old} -> {new}" for col, (old, new) in cols.items())
+               for name, cols in diff['changed']]
+    entries += [f"  + {row.get(key) if key else row}" for row in diff['added']]
+    entries += [f"  - {row.get(key) if key else row}" for row in diff['removed']]
+    lines.extend(entries[:limit])
+    if len(entries) > limit:
+        lines.append(f"  ... and {len(entries) - limit} more")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = "Usage: python snapshots.py log DATASET | diff DATASET OLD NEW | restore DATASET ID CSV"
+    store = SnapshotStore()
+    if len(argv) == 2 and argv[0] == 'log':
+        refs = store.refs(argv[1])
+        for manifest in store.history(argv[1]):
+            names = [ref for ref, snapshot in refs.items() if snapshot == manifest['id']]
+            stamp = time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest['created_at']))
+            print(f"{short_id(manifest['id'])}  {stamp}  {len(manifest['rows'])} rows "
+                  f"({manifest['new_rows']} new)  {' '.join(names)}")
+        return 0
+    if len(argv) == 4 and argv[0] in ('diff', 'restore'):
+        dataset = argv[1]
+        ids = {manifest['id'] for manifest in store.history(dataset)}
+        resolved = []
+        for name in argv[2:4] if argv[0] == 'diff' else argv[2:3]:
+            snapshot = store.resolve(dataset, name) or next((i for i in ids if i.startswith(name)), None)
+            if snapshot is None:
+                print(f"❌ No snapshot or ref {name!r} for {dataset}")
+                return 1
+            resolved.append(snapshot)
+        if argv[0] == 'diff':
+            key = DATASETS.get(dataset, {}).get('key')
+            print(format_diff(store.diff(dataset, *resolved, key=key), key=key, limit=50))
+        else:
+            print(f"✅ {short_id(resolved[0])} -> {store.export_csv(dataset, resolved[0], argv[3])}")
+        return 0
+    print(usage)
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main())
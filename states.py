@@ -0,0 +1,39 @@
+import re
+
+# Spellings that refer to the same State/UT. The first name in each group is the canonical key.
+ALIAS_GROUPS = [
+    ['delhi', 'nct of delhi', 'delhi ncr', 'new delhi', 'national capital territory of delhi', 'nct delhi'],
+    ['jammu and kashmir', 'j and k', 'jk', 'jammu kashmir'],
+    ['andaman and nicobar islands', 'andaman and nicobar', 'a and n islands', 'andaman nicobar islands'],
+    ['dadra and nagar haveli and daman and diu', 'dnh and dd', 'dnhdd'],
+    ['odisha', 'orissa'],
+    ['puducherry', 'pondicherry'],
+    ['uttarakhand', 'uttaranchal'],
+    ['tamil nadu', 'tamilnadu'],
+    ['uttar pradesh', 'up'],
+    ['madhya pradesh', 'mp'],
+    ['andhra pradesh', 'ap'],
+    ['himachal pradesh', 'hp'],
+    ['west bengal', 'wb'],
+]
+
+ALIASES = {alias: group[0] for group in ALIAS_GROUPS for alias in group}
+
+def normalize_state_name(name):
+    name = str(name).lower().replace('&', ' and ')
+    name = re.sub(r'[^a-z0-9 ]+', ' ', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    if name.startswith('the '):
+        name = name[4:]
+    return name
+
+def state_key(name):
+    normalized = normalize_state_name(name)
+    return ALIASES.get(normalized, normalized)
+
+def build_state_index(names):
+    index = {}
+    for position, name in enumerate(names):
+        if isinstance(name, str):
+            index.setdefault(state_key(name), position)
+    return index
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import metrics
+
+STORE_SUFFIX = '.npstore'
+META_FILE = 'meta.json'
+NA_VALUES = ['NA', '']
+KIND_DTYPES = {'int': 'int64', 'float': 'float64', 'str': 'str'}
+
+_loaded = {}
+_load_locks = {}
+
+def store_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+def coerce_column(series):
+    if series.dtype.kind in 'biuf' or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    text = series.astype('string').str.strip()
+    missing = series.isna() | text.isin(NA_VALUES)
+    # Code-like fields such as district or LGD codes keep their leading zeros as text.
+    if text[~missing].str.match(r'^[+-]?0\d').any():
+        return series
+    numeric = pd.to_numeric(text.mask(missing), errors='coerce')
+    if numeric.notna().sum() == (~missing).sum() and (~missing).any():
+        if not missing.any() and (numeric % 1 == 0).all():
+            return numeric.astype('int64')
+        return numeric.astype('float64')
+    return series
+
+def coerce_types(df):
+    return pd.DataFrame({col: coerce_column(df[col]) for col in df.columns})
+
+def _column_array(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # A code per row and each name once; code -1 is a missing value.
+        return series.cat.codes.to_numpy(), 'category', None
+    if series.dtype.kind in 'biu':
+        return series.to_numpy(dtype='int64'), 'int', None
+    if series.dtype.kind == 'f':
+        return series.to_numpy(dtype='float64'), 'float', None
+    strings = series.astype('string')
+    values = strings.fillna('').to_numpy(dtype=str)
+    return values, 'str', strings.isna().to_numpy()
+
+def write_store(df, store_path, source_path=None, coerce=True):
+    if coerce:
+        df = coerce_types(df)
+    parent = os.path.dirname(os.path.abspath(store_path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        columns = []
+        for i, col in enumerate(df.columns):
+            values, kind, null_mask = _column_array(df[col])
+            np.save(os.path.join(tmp_dir, f"{i}.npy"), values, allow_pickle=False)
+            column = {'name': col, 'kind': kind, 'file': f"{i}.npy"}
+            if kind == 'category':
+                categories = df[col].cat.categories.astype(str).to_numpy(dtype=str)
+                np.save(os.path.join(tmp_dir, f"{i}.categories.npy"), categories, allow_pickle=False)
+                column['categories'] = f"{i}.categories.npy"
+            if null_mask is not None and null_mask.any():
+                np.save(os.path.join(tmp_dir, f"{i}.null.npy"), null_mask, allow_pickle=False)
+                column['nulls'] = f"{i}.null.npy"
+            columns.append(column)
+        meta = {'rows': len(df), 'columns': columns, 'source': None}
+        if source_path is not None and os.path.exists(source_path):
+            stat = os.stat(source_path)
+            meta['source'] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        if os.path.exists(store_path):
+            shutil.rmtree(store_path)
+        os.replace(tmp_dir, store_path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return store_path
+
+def read_store_meta(store_path):
+    with open(os.path.join(store_path, META_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def read_store(store_path, columns=None, mmap=True):
+    meta = read_store_meta(store_path)
+    by_name = {c['name']: c for c in meta['columns']}
+    wanted = list(by_name) if columns is None else list(columns)
+    missing = [name for name in wanted if name not in by_name]
+    if missing:
+        raise KeyError(f"Columns not found in {store_path}: {', '.join(missing)}")
+    data = {}
+    for name in wanted:
+        column = by_name[name]
+        # Numeric columns (and category codes) are memory-mapped and handed to pandas without copying.
+        use_mmap = mmap and column['kind'] != 'str'
+        values = np.load(os.path.join(store_path, column['file']), mmap_mode='r' if use_mmap else None, allow_pickle=False)
+        if column['kind'] == 'category':
+            categories = np.load(os.path.join(store_path, column['categories']), allow_pickle=False)
+            values = pd.Categorical.from_codes(values, categories=categories.tolist())
+        if 'nulls' in column:
+            null_mask = np.load(os.path.join(store_path, column['nulls']), allow_pickle=False)
+            values = pd.Series(values, dtype='string').mask(null_mask).astype(str)
+        data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+def is_store_current(store_path, csv_path):
+    if not os.path.isdir(store_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    try:
+        source = read_store_meta(store_path).get('source')
+    except (OSError, ValueError):
+        return False
+    stat = os.stat(csv_path)
+    return source is not None and source['mtime_ns'] == stat.st_mtime_ns and source['size'] == stat.st_size
+
+def read_dataset(path, columns=None):
+    store_path = store_path_for(path)
+    if is_store_current(store_path, path):
+        with metrics.span('store_read'):
+            df = read_store(store_path, columns)
+    else:
+        with metrics.span('csv_read'):
+            df = coerce_types(pd.read_csv(path, usecols=columns, na_values=NA_VALUES))
+    metrics.count('rows_read', len(df))
+    return df
+
+def content_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def freeze(df):
+    # The same frame rebuilt on read-only views of its numeric columns, so an in-place write
+    # to a shared frame raises instead of changing it for everyone; copies stay writable.
+    columns = {}
+    for col in df.columns:
+        if df[col].dtype.kind in 'biuf':
+            values = df[col].to_numpy()
+            values.flags.writeable = False
+            columns[col] = values
+        else:
+            columns[col] = df[col]
+    frozen = pd.DataFrame(columns, index=df.index, copy=False)
+    frozen.attrs.update(df.attrs)
+    return frozen
+
+def load_versioned(path):
+    # read_dataset, parsed once per version of the file for the whole process: later calls
+    # get the same DataFrame back, so its long table, panels and fitted trends are reused
+    # too. Its values are read-only. A change in size or mtime
+    # rehashes the file, and only different content is parsed again. Returns (hash, df).
+    key = os.path.abspath(path)
+    with _load_locks.setdefault(key, threading.Lock()):
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        entry = _loaded.get(key)
+        if entry is not None and entry['signature'] == signature:
+            metrics.count('dataset_cache_hits')
+            return entry['hash'], entry['df']
+        content = content_hash(path)
+        if entry is not None and entry['hash'] == content:
+            entry['signature'] = signature
+            metrics.count('dataset_cache_hits')
+            return content, entry['df']
+        metrics.count('dataset_cache_misses')
+        df = freeze(read_dataset(path))
+        _loaded[key] = {'signature': signature, 'hash': content, 'df': df}
+        return content, df
+
+def load_dataset(path):
+    return load_versioned(path)[1]
+
+def clear_loaded():
+    _loaded.clear()
+
+def save_dataset(df, csv_path, columnar=True):
+    with metrics.span('csv_write', stage='save'):
+        df.to_csv(csv_path, index=False)
+    if columnar:
+        write_store(df, store_path_for(csv_path), source_path=csv_path)
+
+def copy_dataset(src_csv, dst_csv):
+    fd, tmp_csv = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst_csv)), prefix='.tmp-')
+    os.close(fd)
+    try:
+        shutil.copy2(src_csv, tmp_csv)
+        os.replace(tmp_csv, dst_csv)
+    except BaseException:
+        if os.path.exists(tmp_csv):
+            os.remove(tmp_csv)
+        raise
+    src_store, dst_store = store_path_for(src_csv), store_path_for(dst_csv)
+    if is_store_current(src_store, src_csv):
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(dst_store)), prefix='.tmp-')
+        os.rmdir(tmp_dir)
+        shutil.copytree(src_store, tmp_dir)
+        if os.path.exists(dst_store):
+            shutil.rmtree(dst_store)
+        os.replace(tmp_dir, dst_store)
+    elif os.path.exists(dst_store):
+        shutil.rmtree(dst_store)
+
+def convert_csv(csv_path, store_path=None, kinds=None):
+    # kinds (column -> 'int'/'float'/'str', as worked out by ingest.Schema) parses each column
+    # as that type directly instead of inferring it again.
+    if kinds is None:
+        df = pd.read_csv(csv_path, na_values=NA_VALUES)
+    else:
+        dtypes = {col: KIND_DTYPES[kind] for col, kind in kinds.items()}
+        df = pd.read_csv(csv_path, dtype=dtypes, na_values=NA_VALUES, keep_default_na=False)
+    return write_store(df, store_path or store_path_for(csv_path), source_path=csv_path, coerce=kinds is None)
+
+def export_csv(store_path, csv_path):
+    df = read_store(store_path)
+    df.to_csv(csv_path, index=False, na_rep='NA')
+    return csv_path
+
+def frame_hash(df, columns=None):
+    # Content hash of the given columns: names, types and values. Worked out on every call, so
+    # a frame edited in place gets a new hash.
+    columns = list(df.columns if columns is None else columns)
+    digest = hashlib.blake2b(repr([(col, str(df[col].dtype)) for col in columns]).encode('utf-8'), digest_size=16)
+    digest.update(len(df).to_bytes(8, 'little'))
+    for col in columns:
+        series = df[col]
+        if series.dtype.kind in 'biuf':
+            digest.update(np.ascontiguousarray(series.to_numpy()))
+        else:
+            digest.update(series.isna().to_numpy())
+            digest.update('\0'.join(series.astype('string').fillna('').tolist()).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+def find_csv_files(root='data'):
+    csv_files = []
+    for dirpath, _, filenames in os.walk(root):
+        csv_files.extend(os.path.join(dirpath, name) for name in sorted(filenames) if name.endswith('.csv'))
+    return csv_files
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ('convert', 'export'):
+        print("Usage: python storage.py convert [CSV ...] | export STORE CSV")
+        return 2
+    if argv[0] == 'convert':
+        for csv_path in argv[1:] or find_csv_files():
+            print(f"✅ {csv_path} -> {convert_csv(csv_path)}")
+        return 0
+    if len(argv) != 3:
+        print("Usage: python storage.py export STORE CSV")
+        return 2
+    print(f"✅ {argv[1]} -> {export_csv(argv[1], argv[2])}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
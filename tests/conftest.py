@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from aiohttp import web
+
+RESOURCE_PATH = '/resource/test-resource'
+
+def paged_handler(total, cap=None, hits=None, short_pages=None):
+    hits = hits if hits is not None else []
+    short_pages = dict(short_pages or {})
+
+    async def handler(request):
+        offset = int(request.query.get('offset', 0))
+        limit = int(request.query.get('limit', 10))
+        if cap is not None:
+            limit = min(limit, cap)
+        if offset in short_pages:
+            limit = min(limit, short_pages.pop(offset))
+        hits.append((offset, limit))
+        records = [{'state': f"State {i}", 'value': str(i)} for i in range(offset, min(offset + limit, total))]
+        return web.json_response({'total': total, 'count': len(records), 'records': records})
+
+    return handler
+
+@pytest.fixture
+def run_stub():
+    def run(handler, client):
+        async def main():
+            app = web.Application()
+            app.router.add_get(RESOURCE_PATH, handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                return await client(f"http://127.0.0.1:{port}{RESOURCE_PATH}?api-key=test&format=json")
+            finally:
+                await runner.cleanup()
+        return asyncio.run(main())
+    return run
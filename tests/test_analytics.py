@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analytics
+import catalog
+from longform import dataset_panel
+
+def plastic_frame(rows):
+    return pd.DataFrame(rows, columns=['state_ut_wise', '_2018_19', '_2019_20', '_2020_21'])
+
+def wastewater_frame(rows):
+    return pd.DataFrame(rows, columns=['state', 'wastewater_discharge__mld_', 'bod_load__tpd_'])
+
+PLASTIC = [['Assam', 10.0, 20.0, 30.0], ['Kerala', 40.0, 40.0, np.nan], ['Orissa', 5.0, 10.0, 30.0], ['Total', 55, 70, 60]]
+
+@pytest.fixture(autouse=True)
+def fresh_tables():
+    analytics._latest.clear()
+    yield
+    analytics._latest.clear()
+
+def table_values(table, column):
+    return table.set_index(['key', 'label'])[column]
+
+def test_region_table_ranks_percentiles_and_growth():
+    table = analytics.region_table(dataset_panel(plastic_frame(PLASTIC)))
+    assert table.attrs['keys'] == ['assam', 'kerala', 'odisha']
+    rank, percentile, growth = (table_values(table, column) for column in ('rank', 'percentile', 'yoy_growth'))
+    assert rank[('kerala', '2018-19')] == 1 and rank[('assam', '2018-19')] == 2 and rank[('odisha', '2018-19')] == 3
+    # Ties share the better rank; Kerala reported nothing in 2020-21.
+    assert rank[('assam', '2020-21')] == 1 and rank[('odisha', '2020-21')] == 1
+    assert np.isnan(rank[('kerala', '2020-21')]) and np.isnan(percentile[('kerala', '2020-21')])
+    assert percentile[('odisha', '2018-19')] == pytest.approx(100 / 3)
+    assert growth[('assam', '2019-20')] == pytest.approx(1.0) and growth[('odisha', '2020-21')] == pytest.approx(2.0)
+    assert np.isnan(growth[('assam', '2018-19')])
+
+def test_refresh_recomputes_only_what_changed():
+    before = analytics.region_table(dataset_panel(plastic_frame(PLASTIC)))
+    rows = [row[:] for row in PLASTIC]
+    rows[0][3] = 50.0  # Assam, 2020-21
+    panel = dataset_panel(plastic_frame(rows))
+    after = analytics.region_table(panel, before)
+    assert after.attrs['recomputed'] == {'rows': 1, 'periods': 1}
+    pd.testing.assert_frame_equal(after, analytics.region_table(panel))
+    assert table_values(after, 'rank')[('odisha', '2020-21')] == 2
+
+    # A state that appears or disappears re-ranks the periods it reported in.
+    rows.append(['Goa', np.nan, 1.0, np.nan])
+    del rows[1]
+    panel = dataset_panel(plastic_frame(rows))
+    again = analytics.region_table(panel, after)
+    assert again.attrs['recomputed'] == {'rows': 1, 'periods': 2}
+    pd.testing.assert_frame_equal(again, analytics.region_table(panel))
+
+def test_joined_table_matches_normalized_state_names():
+    plastic = plastic_frame(PLASTIC)
+    wastewater = wastewater_frame([['Odisha', 3.0, 0.5], ['ASSAM', 2.0, 0.25], ['Bihar', 1.0, 0.1]])
+    joined = analytics.cross_table(plastic, wastewater)
+    assert joined['state'].tolist() == ['Assam', 'Orissa']
+    assert joined['label'].tolist() == ['2020-21', '2020-21']
+    assert joined['plastic_waste_tonnes'].tolist() == [30.0, 30.0]
+    assert joined['bod_load_tpd'].tolist() == [0.25, 0.5]
+
+    wastewater = wastewater_frame([['Odisha', 3.0, 0.75], ['ASSAM', 2.0, 0.25], ['Bihar', 1.0, 0.1]])
+    refreshed = analytics.cross_table(plastic, wastewater)
+    assert refreshed.attrs['recomputed'] == {'rows': 1}
+    assert refreshed['bod_load_tpd'].tolist() == [0.25, 0.75]
+
+def test_materialize_refreshes_from_disk(tmp_path, monkeypatch):
+    saved = tmp_path / 'saved'
+    saved.mkdir()
+    monkeypatch.setitem(catalog.DATA_DIRS, 'saved', str(saved))
+    plastic_frame(PLASTIC).to_csv(saved / 'plastic_waste_data.csv', index=False)
+    wastewater_frame([['Assam', 2.0, 0.25]]).to_csv(saved / 'wastewater_data.csv', index=False)
+    root = str(tmp_path / 'analytics')
+
+    tables = analytics.materialize(root=root)
+    assert sorted(tables) == sorted(analytics.TABLES)
+    assert tables['plastic'].attrs['recomputed']['rows'] == 3
+
+    # A new process: nothing in memory, the previous tables come from disk.
+    analytics._latest.clear()
+    rows = [row[:] for row in PLASTIC]
+    rows[2][1] = 6.0
+    plastic_frame(rows).to_csv(saved / 'plastic_waste_data.csv', index=False)
+    tables = analytics.materialize(root=root)
+    assert tables['plastic'].attrs['recomputed'] == {'rows': 1, 'periods': 1}
+    assert tables['plastic_bod'].attrs['recomputed'] == {'rows': 0}
+    assert analytics.AnalyticsStore(root).load('plastic').attrs['version'] == tables['plastic'].attrs['version']
@@ -0,0 +1,178 @@
+import asyncio
+import email.utils
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from aiohttp import web
+import api
+import metrics
+from conftest import paged_handler
+
+def test_fetch_concatenates_pages_in_order(run_stub):
+    hits = []
+    df = run_stub(paged_handler(1050, hits=hits),
+                  lambda url: api.fetch_data_async(url, 'Test', page_size=100, quiet=True))
+    assert len(df) == 1050
+    assert df['value'].tolist() == [str(i) for i in range(1050)]
+    assert len(hits) == 11
+
+def test_fetch_steps_by_capped_limit(run_stub):
+    hits = []
+    df = run_stub(paged_handler(1050, cap=100, hits=hits),
+                  lambda url: api.fetch_data_async(url, 'Test', page_size=500, quiet=True))
+    assert df['value'].tolist() == [str(i) for i in range(1050)]
+    assert all(limit <= 100 for _, limit in hits)
+
+def test_fetch_refills_short_page(run_stub):
+    df = run_stub(paged_handler(350, short_pages={100: 40}),
+                  lambda url: api.fetch_data_async(url, 'Test', page_size=100, quiet=True))
+    assert df['value'].tolist() == [str(i) for i in range(350)]
+
+def test_fetch_raises_when_rows_are_missing(run_stub):
+    handler = paged_handler(250, cap=100)
+
+    async def truncated(request):
+        if int(request.query.get('offset', 0)) >= 200:
+            return web.json_response({'total': 250, 'records': []})
+        return await handler(request)
+
+    with pytest.raises(Exception, match="Incomplete Test data: received 200 of 250"):
+        run_stub(truncated, lambda url: api.fetch_data_async(url, 'Test', page_size=100, retries=1, quiet=True))
+
+def test_failed_page_cancels_the_other_pages(run_stub):
+    handler = paged_handler(1000)
+
+    async def failing(request):
+        offset = int(request.query.get('offset', 0))
+        if offset == 100:
+            return web.Response(status=500)
+        if offset > 0:
+            await asyncio.sleep(0.5)
+        return await handler(request)
+
+    async def client(url):
+        with pytest.raises(api.HTTPStatusError):
+            await api.fetch_data_async(url, 'Test', page_size=100, retries=1, quiet=True)
+        return [task for task in asyncio.all_tasks() if task.get_coro().__name__ == 'fetch_range']
+
+    assert run_stub(failing, client) == []
+
+def test_progress_percentage_waits_for_page_count():
+    progress = api.DownloadProgress(quiet=True)
+    progress.start_response(1000)
+    progress.advance(1000)
+    assert progress.expected_bytes() is None
+    progress.set_remaining_pages(9)
+    assert progress.expected_bytes() == 10000
+    progress.start_response(1000)
+    progress.advance(1000)
+    assert progress.received / progress.expected_bytes() == pytest.approx(0.2)
+
+def test_retry_after_is_honoured_on_429(run_stub):
+    hits = []
+    handler = paged_handler(50)
+
+    async def limited(request):
+        hits.append(time.monotonic())
+        if len(hits) == 1:
+            return web.Response(status=429, headers={'Retry-After': '1'})
+        return await handler(request)
+
+    df = run_stub(limited, lambda url: api.fetch_data_async(url, 'Test', quiet=True))
+    assert len(df) == 50
+    assert hits[1] - hits[0] >= 1.0
+
+def test_long_retry_after_fails_instead_of_waiting(run_stub):
+    async def limited(request):
+        return web.Response(status=429, headers={'Retry-After': '3600'})
+
+    started = time.monotonic()
+    with pytest.raises(api.HTTPStatusError) as error:
+        run_stub(limited, lambda url: api.fetch_data_async(url, 'Test', quiet=True))
+    assert error.value.status == 429 and error.value.retry_after == 3600
+    assert time.monotonic() - started < 5
+
+def test_retry_after_parses_seconds_and_dates():
+    assert api.parse_retry_after('7') == 7.0
+    assert api.parse_retry_after(None) is None and api.parse_retry_after('soon') is None
+    later = email.utils.format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= api.parse_retry_after(later) <= 30
+    assert api.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+def test_backoff_is_jittered_below_the_exponential_bound():
+    random.seed(1)
+    delays = [api.backoff_delay(3, 2) for _ in range(200)]
+    assert all(0 <= delay <= 8 for delay in delays)
+    assert len(set(delays)) == len(delays)
+    assert all(0 <= api.backoff_delay(20, 2) <= api.MAX_BACKOFF for _ in range(20))
+    assert 5 <= api.backoff_delay(0, 2, retry_after=5) <= 5.5
+
+def test_rate_limiter_spaces_requests_after_the_burst():
+    async def take(count):
+        limiter = api.RateLimiter(rate=50, burst=5)
+        started = time.monotonic()
+        for _ in range(count):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    def waits(count):
+        # How many times the limiter made a caller wait, and how long taking `count` tokens took.
+        metrics.enable(events=False)
+        metrics.reset()
+        try:
+            elapsed = asyncio.run(take(count))
+            return sum(value for (name, _), value in metrics.state()['counters'] if name == 'rate_limit_waits'), elapsed
+        finally:
+            metrics.disable()
+            metrics.reset()
+
+    assert waits(5)[0] == 0
+    # Ten tokens past the burst accrue at 50 a second; a slow machine only makes this longer.
+    count, elapsed = waits(15)
+    assert count >= 1 and elapsed >= 10 / 50 * 0.9
+
+def test_fetch_all_runs_resources_concurrently_on_one_session(tmp_path):
+    delays = {f"r{i}": 0.1 + 0.04 * i for i in range(10)}
+    peers = set()
+
+    async def handler(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        await asyncio.sleep(delays[request.match_info['name']])
+        return await paged_handler(30)(request)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get('/resource/{name}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        specs = [{'name': name, 'topic': name, 'url': f"http://127.0.0.1:{port}/resource/{name}",
+                  'path': str(tmp_path / f"{name}.csv"), 'fields': ['state']} for name in delays]
+        try:
+            started = time.monotonic()
+            results = await api.fetch_all(specs, quiet=True, use_cache=False, max_connections=4, rate=None)
+            return results, time.monotonic() - started
+        finally:
+            await runner.cleanup()
+
+    results, elapsed = asyncio.run(main())
+    assert all(result['rows'] == 30 for result in results.values())
+    # Sequentially this would take the sum of the delays, 3.8 s; four at a time takes about a quarter of it.
+    assert elapsed < sum(delays.values()) / 2
+    assert len(peers) <= 4
+
+def test_fetch_all_reports_a_missing_field_and_keeps_the_old_file(run_stub, tmp_path):
+    csv_path = tmp_path / 'data.csv'
+    csv_path.write_text('state,value\nOld,1\n')
+
+    async def client(url):
+        specs = [{'name': 'test', 'topic': 'Test', 'url': url, 'path': str(csv_path), 'fields': ['state', 'bod']}]
+        return await api.fetch_all(specs, quiet=True, use_cache=False)
+
+    result = run_stub(paged_handler(20), client)['test']
+    assert isinstance(result, ValueError) and "missing field(s) ['bod']" in str(result)
+    assert csv_path.read_text() == 'state,value\nOld,1\n'
+    assert [p.name for p in tmp_path.iterdir()] == ['data.csv']
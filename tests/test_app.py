@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+import app
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def data_dirs(tmp_path, monkeypatch):
+    saved = tmp_path / 'SavedData'
+    shutil.copytree(os.path.join(REPO_ROOT, 'data', 'SavedData'), saved)
+    monkeypatch.setitem(app.DATA_DIRS, 'saved', str(saved))
+    monkeypatch.setitem(app.DATA_DIRS, 'api', str(tmp_path / 'missing'))
+    return tmp_path
+
+def test_predict_writes_csv(data_dirs):
+    out = data_dirs / 'predictions.csv'
+    assert app.cli(['predict', '--dataset', 'plastic', '--years', '2022-2023', '--out', str(out)]) == app.EXIT_OK
+    assert len(out.read_text().splitlines()) == 1 + 2 * 35
+
+def test_predict_parses_the_dataset_once(data_dirs):
+    import metrics
+    log = data_dirs / 'metrics.jsonl'
+    argv = ['--metrics-log', str(log), 'predict', '--dataset', 'plastic', '--years', '2022',
+            '--out', str(data_dirs / 'predictions.csv')]
+    try:
+        assert app.cli(argv) == app.EXIT_OK
+    finally:
+        metrics.disable()
+        metrics.reset()
+    entry = json.loads(log.read_text())
+    reads = [timer['count'] for timer in entry['timers'] if timer['name'] in ('csv_read', 'store_read')]
+    assert reads == [1]
+
+def test_predict_exit_codes(data_dirs):
+    assert app.cli(['predict', '--dataset', 'plastic', '--states', 'Atlantis']) == app.EXIT_USAGE
+    assert app.cli(['predict', '--dataset', 'plastic', '--source', 'api']) == app.EXIT_NO_DATA
+    with pytest.raises(SystemExit) as excinfo:
+        app.cli(['predict', '--dataset', 'plastic', '--years', '2016-2020'])
+    assert excinfo.value.code == app.EXIT_USAGE
+
+def test_backtest_saves_results_and_prints_errors(data_dirs, capsys):
+    out = data_dirs / 'run.npstore'
+    assert app.cli(['backtest', '--dataset', 'plastic', '--out', str(out), '--workers', '1']) == app.EXIT_OK
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == 'model,mae,mape,splits' and [line.split(',')[0] for line in lines[1:]] == ['auto', 'linear', 'loglinear']
+    assert (out / 'meta.json').exists()
+    assert app.cli(['backtest', '--dataset', 'wastewater', '--out', str(out)]) == app.EXIT_NO_DATA
+
+def test_plot_exit_codes(data_dirs):
+    out_dir = data_dirs / 'plots'
+    assert app.cli(['plot', '--dataset', 'plastic', '--out-dir', str(out_dir)]) == app.EXIT_USAGE
+    assert app.cli(['plot', '--dataset', 'wastewater', '--out-dir', str(out_dir)]) == app.EXIT_OK
+    assert app.cli(['plot', '--dataset', 'plastic', '--state', 'Atlantis', '--out-dir', str(out_dir)]) == app.EXIT_FAILURE
+    assert len([name for name in os.listdir(out_dir) if name.endswith('.png')]) == 3
+
+def test_fetch_without_datasets_is_a_usage_error():
+    assert app.cli(['fetch']) == app.EXIT_USAGE
+
+def test_predict_to_closed_pipe_exits_cleanly():
+    command = f'"{sys.executable}" app.py predict --dataset plastic --years 2022-2050 | head -n 1 > /dev/null; echo ${{PIPESTATUS[0]}}'
+    result = subprocess.run(['bash', '-c', command], cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.stdout.strip() in (str(app.EXIT_OK), str(app.EXIT_BROKEN_PIPE))
+    assert 'Traceback' not in result.stderr
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+import backtest
+
+def panel(values, periods=(2017, 2018, 2019, 2020, 2021)):
+    values = np.asarray(values, dtype=float)
+    return {'regions': [f"State {i}" for i in range(len(values))], 'periods': np.asarray(periods), 'values': values}
+
+def test_rolling_origin_replays_history():
+    straight = 100 + 10 * np.arange(5)
+    results = backtest.backtest_panel(panel([straight, [1, np.nan, 3, np.nan, 5]]), models=['linear'], workers=1)
+    # Forecasts of 2019, 2020 and 2021; the second state reported nothing in 2020.
+    assert results['period'].tolist() == [2019, 2019, 2020, 2021, 2021]
+    assert results['trained_to'].tolist() == [2018, 2018, 2019, 2020, 2020]
+    assert results['state'].tolist() == ['State 0', 'State 1', 'State 0', 'State 0', 'State 1']
+    first = results[results['state'] == 'State 0']
+    assert np.allclose(first['predicted'], first['actual'])
+    # With 2017 alone, State 1 cannot fit a line and grows from its mean instead.
+    assert results['predicted'].iloc[1] == pytest.approx(1.0)
+
+def test_pool_matches_serial(monkeypatch):
+    rng = np.random.default_rng(0)
+    values = rng.uniform(1, 100, (500, 5))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    monkeypatch.setattr(backtest, 'MIN_BLOCK_ROWS', 64)
+    serial = backtest.backtest_panel(panel(values), workers=1)
+    pooled = backtest.backtest_panel(panel(values), workers=2)
+    assert len(backtest._tasks('', 500, [], ['linear', 'loglinear'], [2, 3, 4], 0.0, 2)) == 2 * 6
+    pd.testing.assert_frame_equal(serial, pooled)
+
+def test_error_summary():
+    results = pd.DataFrame({'state': ['A', 'A', 'B'], 'model': ['linear'] * 3, 'trained_to': [2019, 2020, 2020],
+                            'period': [2020, 2021, 2021], 'actual': [100.0, 200.0, 0.0],
+                            'predicted': [110.0, 150.0, 5.0]})
+    by_state = backtest.error_summary(results)
+    assert by_state['mae'].tolist() == [30.0, 5.0]
+    assert by_state['mape'].iloc[0] == pytest.approx(17.5) and np.isnan(by_state['mape'].iloc[1])
+    overall = backtest.error_summary(results, ('model',))
+    assert overall['mae'].iloc[0] == pytest.approx(65 / 3) and overall['splits'].iloc[0] == 3
+
+def test_results_round_trip_as_categories(tmp_path):
+    results = backtest.backtest_panel(panel([[1, 2, 3, 4, 5.0], [5, 4, 3, 2, 1.0]]), workers=1)
+    path = backtest.save_results(results, str(tmp_path / 'run.npstore'))
+    loaded = backtest.load_results(path)
+    assert isinstance(loaded['state'].dtype, pd.CategoricalDtype)
+    assert loaded['model'].cat.categories.tolist() == ['auto', 'linear', 'loglinear']
+    for column in results:
+        assert loaded[column].tolist() == results[column].tolist()
@@ -0,0 +1,43 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import run as bench  # noqa: E402
+import synthetic  # noqa: E402
+from storage import read_dataset  # noqa: E402
+
+def test_synthetic_plastic_matches_the_api_schema(tmp_path):
+    path = synthetic.dataset_path('plastic', 50, years=7, directory=str(tmp_path))
+    df = read_dataset(path)
+    assert list(df.columns) == ['_sl__no_', 'state_ut_wise', '_2014_15', '_2015_16', '__2016_17',
+                                '_2017_18', '_2018_19', '_2019_20', '_2020_21']
+    assert len(df) == 50 and df['state_ut_wise'].is_unique
+    assert df['_2020_21'].dtype == float
+    # The same arguments give the same file, which is reused rather than regenerated.
+    assert synthetic.dataset_path('plastic', 50, years=7, directory=str(tmp_path)) == path
+    pd.testing.assert_frame_equal(synthetic.plastic_frame(50, 7), synthetic.plastic_frame(50, 7))
+
+def test_quick_suite_covers_fetch_load_and_predict(tmp_path):
+    results = bench.run_suite(['fetch', 'load', 'predict'], sizes=[200], extra_years=[8], fetch_records=[250],
+                              repeat=1, data_dir=str(tmp_path), quiet=True)
+    names = {result['name'] for result in results['results']}
+    assert 'fetch.ingest_async[records=250 padding=0 latency=0.0]' in names
+    assert 'load.is_file_valid_npstore[data=synthetic dataset=plastic rows=200 years=8]' in names
+    assert 'predict.wastewater_batch_cold[data=shipped dataset=wastewater]' in names
+    assert all(result['median'] > 0 and result['runs'] == 1 for result in results['results'])
+    assert results['meta']['python']
+
+def test_compare_flags_slowdowns_past_the_threshold():
+    baseline = {'results': [{'name': 'a', 'median': 1.0}, {'name': 'b', 'median': 1.0}, {'name': 'gone', 'median': 1.0}]}
+    current = {'results': [{'name': 'a', 'median': 1.2}, {'name': 'b', 'median': 1.5}, {'name': 'new', 'median': 9.0}]}
+    rows = bench.compare(current, baseline, threshold=1.25)
+    assert [(row['name'], row['regressed']) for row in rows] == [('a', False), ('b', True)]
+
+def test_main_exits_nonzero_on_regression(tmp_path):
+    out = tmp_path / 'now.json'
+    baseline = tmp_path / 'before.json'
+    bench.write_results({'meta': {}, 'results': [{'name': 'startup.import_app', 'median': 1e-9}]}, str(baseline))
+    assert bench.main(['--only', 'startup', '--repeat', '1', '--out', str(out), '--baseline', str(baseline)]) == 1
+    assert out.exists()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import sys
+import plotting
+from chart_cache import MANIFEST_FILE, ChartCache
+from charts import wastewater_specs
+from storage import read_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WASTEWATER = os.path.join(REPO_ROOT, 'data', 'SavedData', 'wastewater_data.csv')
+
+def plot_imports(out_dir):
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'app.py', 'plot', '--dataset', 'wastewater',
+                             '--out-dir', str(out_dir), '--workers', '1'],
+                            cwd=REPO_ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')}
+
+def test_cached_charts_skip_matplotlib(tmp_path):
+    assert 'matplotlib' in plot_imports(tmp_path)
+    mtimes = {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path)}
+    assert 'matplotlib' not in plot_imports(tmp_path)
+    assert {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path) if name != MANIFEST_FILE} == \
+        {name: mtime for name, mtime in mtimes.items() if name != MANIFEST_FILE}
+
+def test_changed_data_is_redrawn(tmp_path):
+    data = tmp_path / 'wastewater_data.csv'
+    shutil.copy(WASTEWATER, data)
+    out_dir = str(tmp_path / 'plots')
+    cache = ChartCache(out_dir)
+    first = cache.dataset_hash(str(data))
+    spec = wastewater_specs(out_dir)[0]
+    with open(data, 'a') as f:
+        f.write("Jharkhand,1,1.0,0.1\n")
+    second = cache.dataset_hash(str(data))
+    assert first != second
+    assert cache.key(first, spec) != cache.key(second, spec)
+
+def test_plot_jobs_reuse_saved_files(tmp_path):
+    out_dir = str(tmp_path)
+    df = read_dataset(WASTEWATER)
+    first = plotting.plot_wastewater_charts(df, out_dir, keep_open=False)
+    mtimes = [os.stat(path).st_mtime_ns for path in first]
+    assert plotting.plot_wastewater_charts(df.copy(), out_dir, keep_open=False) == first
+    assert [os.stat(path).st_mtime_ns for path in first] == mtimes
+    changed = df.copy()
+    changed.loc[0, 'bod_load__tpd_'] = 99.0
+    plotting.plot_wastewater_charts(changed, out_dir, keep_open=False)
+    assert [os.stat(path).st_mtime_ns for path in first] != mtimes
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = ChartCache(str(tmp_path), max_bytes=250)
+    for i, name in enumerate(['a.png', 'b.png', 'c.png']):
+        path = str(tmp_path / name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        cache.store(f"key-{i}", path)
+    cache.lookup('key-0')
+    cache._load()['charts']['key-0']['last_used'] += 10
+    cache.save()
+    assert sorted(os.listdir(tmp_path)) == [MANIFEST_FILE, 'a.png', 'c.png']
+    reloaded = ChartCache(str(tmp_path), max_bytes=250)
+    assert reloaded.lookup('key-1') is None
+    assert reloaded.lookup('key-2') == str(tmp_path / 'c.png')
@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+import numpy as np
+import pytest
+from aiohttp import web
+import api
+from conftest import paged_handler
+from ingest import ColumnStats, RecordParser
+from storage import is_store_current, read_dataset, read_store_meta
+
+PAGE = {
+    'title': 'Test "records"', 'field': [{'id': 'state', 'type': 'keyword'}], 'total': 3,
+    'records': [{'state': 'Jammu & Kashmir', 'note': 'say "hi"\\ {x} [y]'}, {'state': 'Goa', 'note': None},
+                {'state': 'उत्तर प्रदेश', 'note': '{"nested": [1]}'}],
+    'count': 3,
+}
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 1 << 20])
+def test_parser_yields_records_across_chunk_boundaries(chunk_size):
+    body = json.dumps(PAGE, ensure_ascii=False, indent=1).encode('utf-8')
+    parser = RecordParser()
+    records = []
+    for start in range(0, len(body), chunk_size):
+        records.extend(parser.feed(body[start:start + chunk_size]))
+    assert records == PAGE['records']
+    assert parser.close() == dict(PAGE, records=[])
+
+def test_parser_rejects_truncated_body():
+    parser = RecordParser()
+    parser.feed(json.dumps(PAGE).encode('utf-8')[:-10])
+    with pytest.raises(ValueError):
+        parser.close()
+
+def test_column_stats_match_storage_coercion():
+    def kind(values):
+        stats = ColumnStats()
+        for value in values:
+            stats.add(value)
+        return stats.kind()
+    assert kind(['1', '2']) == 'int'
+    assert kind(['1', 'NA']) == 'float'
+    assert kind(['1.5', '2']) == 'float'
+    assert kind(['007', '8']) == 'str'
+    assert kind(['Goa', '8']) == 'str'
+
+def test_ingest_streams_pages_into_csv(run_stub, tmp_path):
+    csv_path = tmp_path / 'out.csv'
+    result = run_stub(paged_handler(1050, cap=100),
+                      lambda url: api.ingest_async(url, 'Test', str(csv_path), page_size=100, quiet=True))
+    with open(csv_path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['state', 'value']
+    assert [row[1] for row in rows[1:]] == [str(i) for i in range(1050)]
+    assert result['rows'] == result['total'] == 1050
+    assert result['kinds'] == {'state': 'str', 'value': 'int'}
+    assert sorted(os.listdir(tmp_path)) == ['out.csv', 'out.npstore']
+    # The typed copy is current and reads the inferred types back without parsing the CSV.
+    assert is_store_current(str(tmp_path / 'out.npstore'), str(csv_path))
+    assert [column['kind'] for column in read_store_meta(str(tmp_path / 'out.npstore'))['columns']] == ['str', 'int']
+    assert read_dataset(str(csv_path))['value'].tolist() == list(range(1050))
+
+def test_ingest_keeps_codes_with_leading_zeros_as_text(run_stub, tmp_path):
+    async def handler(request):
+        records = [{'district_code': '007', 'value': '1.5'}, {'district_code': '12', 'value': None}]
+        return web.json_response({'total': 2, 'count': 2, 'records': records})
+
+    csv_path = tmp_path / 'codes.csv'
+    result = run_stub(handler, lambda url: api.ingest_async(url, 'Test', str(csv_path), quiet=True))
+    assert result['kinds'] == {'district_code': 'str', 'value': 'float'}
+    df = read_dataset(str(csv_path))
+    assert df['district_code'].tolist() == ['007', '12']
+    assert df['value'].iloc[0] == 1.5 and np.isnan(df['value'].iloc[1])
+
+def test_ingest_rejects_schema_drift_and_keeps_old_file(run_stub, tmp_path):
+    csv_path = tmp_path / 'out.csv'
+    csv_path.write_text('old\n')
+    handler = paged_handler(250)
+
+    async def drifting(request):
+        if int(request.query.get('offset', 0)) >= 200:
+            return web.json_response({'total': 250, 'records': [{'state': 'X', 'other': '1'}] * 50})
+        return await handler(request)
+
+    with pytest.raises(ValueError, match="expected"):
+        run_stub(drifting, lambda url: api.ingest_async(url, 'Test', str(csv_path), page_size=100, retries=1, quiet=True))
+    assert csv_path.read_text() == 'old\n'
+    assert os.listdir(tmp_path) == ['out.csv']
+
+def test_failed_page_is_rolled_back_before_retry(run_stub, tmp_path):
+    handler = paged_handler(300)
+    failures = []
+
+    async def flaky(request):
+        offset = int(request.query.get('offset', 0))
+        if offset == 100 and not failures:
+            failures.append(offset)
+            response = web.StreamResponse()
+            await response.prepare(request)
+            await response.write(b'{"total": 300, "records": [{"state": "State 100", "value": "100"}, {"sta')
+            raise ConnectionResetError
+        return await handler(request)
+
+    csv_path = tmp_path / 'out.csv'
+    run_stub(flaky, lambda url: api.ingest_async(url, 'Test', str(csv_path), page_size=100,
+                                                 backoff_factor=0, quiet=True))
+    with open(csv_path, newline='') as f:
+        assert [row[1] for row in list(csv.reader(f))[1:]] == [str(i) for i in range(300)]
+    assert failures == [100]
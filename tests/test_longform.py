@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+import charts
+import longform
+import prediction
+from storage import read_dataset
+
+PLASTIC_CSV = 'data/SavedData/plastic_waste_data.csv'
+
+@pytest.mark.parametrize('field,expected', [
+    ('__2016_17', ('value', 2017, '2016-17')),
+    ('_2020_21', ('value', 2021, '2020-21')),
+    ('sales_2019_20', ('sales', 2020, '2019-20')),
+    ('_1999_00', ('value', 2000, '1999-00')),
+    ('population_2011', ('population', 2011, '2011')),
+    ('bod_load__tpd_', None),
+    ('_sl__no_', None),
+])
+def test_parse_period(field, expected):
+    assert longform.parse_period(field) == expected
+
+def test_shipped_plastic_becomes_a_compact_long_table():
+    df = read_dataset(PLASTIC_CSV)
+    long = longform.to_long(df)
+    assert list(long.columns) == ['region', 'measure', 'period', 'value']
+    assert long['region'].dtype == 'category' and long['measure'].dtype == 'category'
+    assert long['period'].dtype == np.int16 and long['value'].dtype == np.float32
+    assert len(long) == len(df) * 5
+    assert sorted(long['period'].unique()) == [2017, 2018, 2019, 2020, 2021]
+    andhra = long[long['region'] == 'Andhra Pradesh']
+    assert np.isnan(andhra.loc[andhra['period'] == 2018, 'value'].iloc[0])
+    assert longform.dataset_panel(df)['labels'] == ['2016-17', '2017-18', '2018-19', '2019-20', '2020-21']
+
+def test_long_table_is_smaller_than_object_columns(tmp_path):
+    rows = 5000
+    wide = pd.DataFrame({'state_ut_wise': [f"State {i}" for i in range(rows)],
+                         **{f"_{year}_{(year + 1) % 100:02d}": np.arange(rows) * 1.5 for year in range(2014, 2021)}})
+    wide.iloc[::7, 3] = np.nan
+    path = tmp_path / 'wide.csv'
+    wide.to_csv(path, index=False, na_rep='NA')
+    as_text = pd.read_csv(path, dtype=str, keep_default_na=False)
+    long = longform.to_long(read_dataset(str(path)))
+    assert long.memory_usage(deep=True).sum() * 2 < as_text.memory_usage(deep=True).sum()
+
+def test_new_financial_year_needs_no_code_change():
+    df = read_dataset(PLASTIC_CSV)
+    df['_2021_22'] = df['_2020_21'] * 2
+    assert charts.plastic_years(df)[-1] == '2021-22'
+    jobs = charts.plastic_state_jobs(df, 'Assam', out_dir='')
+    assert jobs[0]['x'][-1] == '2021-22' and jobs[0]['y'][-1] == pytest.approx(2 * 58765)
+    assert charts.plastic_comparison_job(df, '2021-22', out_dir='') is not None
+    before = prediction.predict_plastic_waste(read_dataset(PLASTIC_CSV), 'Assam', 2025)[0]
+    assert prediction.predict_plastic_waste(df, 'Assam', 2025)[0] > before
+
+def test_district_rows_roll_up_to_states():
+    df = pd.DataFrame({
+        'state_name': ['Assam', 'Assam', 'Goa', 'Goa', 'Total'],
+        'district_name': ['Kamrup', 'Cachar', 'North Goa', 'South Goa', None],
+        '_2019_20': [10.0, 20.0, 5.0, np.nan, 35.0],
+        '_2020_21': [12.0, 22.0, np.nan, np.nan, 34.0],
+    })
+    long = longform.to_long(df)
+    assert list(long.columns) == ['region', 'state', 'measure', 'period', 'value']
+    assert set(long['region']) == {'Kamrup', 'Cachar', 'North Goa', 'South Goa'}
+    states = longform.region_panel(long)
+    assert states['regions'] == ['Assam', 'Goa']
+    np.testing.assert_array_equal(states['values'], [[30.0, 34.0], [5.0, np.nan]])
+    districts = longform.region_panel(long, level='district')
+    assert districts['regions'] == ['Kamrup', 'Cachar', 'North Goa', 'South Goa']
+
+    predicted, _ = prediction.predict_plastic_waste(df, 'assam', 2022)
+    assert predicted == pytest.approx(34.0 + 4.0)
+    batch = prediction.predict_plastic_waste_batch(df, years=[2022])
+    assert batch['state'].tolist() == ['Assam', 'Goa']
+
+def test_totals_are_not_regions():
+    df = read_dataset('data/SavedData/wastewater_data.csv')
+    assert 'Total' not in longform.dataset_panel(df, 'bod_load__tpd_')['regions']
+    assert set(longform.long_table(df)['measure']) == {'no__of_gpis', 'wastewater_discharge__mld_', 'bod_load__tpd_'}
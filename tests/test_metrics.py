@@ -0,0 +1,116 @@
+import json
+import time
+import pytest
+from aiohttp import web
+import api
+import metrics
+from conftest import paged_handler
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+def values(kind):
+    return {(entry['name'], tuple(sorted(entry['labels'].items()))): entry
+            for entry in metrics.summary()[kind]}
+
+def test_disabled_records_nothing():
+    with metrics.span('draw', chart='bar'):
+        pass
+    metrics.count('rows_read', 10)
+    metrics.stop('http_connect', metrics.start())
+    assert metrics.summary() == {'timers': [], 'counters': [], 'spans': [], 'dropped_spans': 0}
+    assert metrics.span('draw') is metrics.span('savefig')
+
+def test_disabled_span_costs_next_to_nothing():
+    calls = 100_000
+    started = time.perf_counter()
+    for _ in range(calls):
+        with metrics.span('json_decode', topic='Test'):
+            pass
+    # A few hundred nanoseconds per call; the bound only catches an accidental real clock or lock.
+    assert (time.perf_counter() - started) / calls < 5e-6
+
+def test_spans_counters_and_timed_functions():
+    metrics.enable()
+
+    @metrics.timed('predict', dataset='plastic')
+    def predict(x):
+        return x * 2
+
+    assert predict(21) == 42 and predict.__name__ == 'predict'
+    with metrics.span('draw', chart='bar'):
+        time.sleep(0.01)
+    metrics.count('http_bytes', 100, topic='Test')
+    metrics.count('http_bytes', 50, topic='Test')
+    timers = values('timers')
+    assert timers[('draw', (('chart', 'bar'),))]['seconds'] >= 0.01
+    assert timers[('predict', (('dataset', 'plastic'),))]['count'] == 1
+    assert values('counters')[('http_bytes', (('topic', 'Test'),))]['value'] == 150
+    assert [span['name'] for span in metrics.summary()['spans']] == ['predict', 'draw']
+
+def test_event_log_is_bounded(monkeypatch):
+    monkeypatch.setattr(metrics, 'MAX_EVENTS', 3)
+    metrics.enable()
+    for _ in range(5):
+        with metrics.span('draw'):
+            pass
+    summary = metrics.summary()
+    assert len(summary['spans']) == 3 and summary['dropped_spans'] == 2
+    assert summary['timers'][0]['count'] == 5
+
+def test_merge_adds_what_a_worker_measured():
+    metrics.enable()
+    metrics.record('savefig', 0.5, chart='bar')
+    metrics.count('png_bytes', 10)
+    worker = metrics.state()
+    metrics.merge(worker)
+    assert values('timers')[('savefig', (('chart', 'bar'),))]['count'] == 2
+    assert values('timers')[('savefig', (('chart', 'bar'),))]['max_seconds'] == 0.5
+    assert values('counters')[('png_bytes', ())]['value'] == 20
+
+def test_exports(tmp_path):
+    metrics.enable()
+    metrics.record('csv_read', 0.25)
+    metrics.count('http_retries', topic='Say "hi"\n')
+    prom = tmp_path / 'out' / 'dharti.prom'
+    metrics.write_prometheus(str(prom))
+    text = prom.read_text()
+    assert '# TYPE dharti_span_seconds summary' in text
+    assert 'dharti_span_seconds_sum{span="csv_read"} 0.25' in text
+    assert 'dharti_span_seconds_count{span="csv_read"} 1' in text
+    assert 'dharti_http_retries_total{topic="Say \\"hi\\"\\n"} 1' in text
+
+    log = tmp_path / 'metrics.jsonl'
+    metrics.write_json_log(str(log), {'command': 'fetch'})
+    metrics.write_json_log(str(log))
+    entries = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(entries) == 2 and entries[0]['command'] == 'fetch'
+    assert entries[0]['timers'][0] == {'name': 'csv_read', 'labels': {}, 'count': 1, 'seconds': 0.25, 'max_seconds': 0.25}
+
+def test_fetch_counts_bytes_rows_and_retries(run_stub):
+    handler = paged_handler(250)
+    failed = []
+
+    async def flaky(request):
+        if request.query.get('offset') == '100' and not failed:
+            failed.append(True)
+            return web.Response(status=503)
+        return await handler(request)
+
+    metrics.enable()
+    df = run_stub(flaky, lambda url: api.fetch_data_async(url, 'Test', page_size=100, quiet=True))
+    assert len(df) == 250
+    counters = values('counters')
+    assert counters[('fetched_rows', (('topic', 'Test'),))]['value'] == 250
+    assert counters[('http_retries', (('topic', 'Test'),))]['value'] == 1
+    assert counters[('http_responses', (('status', '503'), ('topic', 'Test')))]['value'] == 1
+    assert counters[('http_bytes', (('source', 'network'), ('topic', 'Test')))]['value'] > 0
+    timers = values('timers')
+    assert timers[('http_connect', (('topic', 'Test'),))]['count'] == 4
+    assert timers[('http_transfer', (('topic', 'Test'),))]['count'] == 3
+    assert timers[('dataframe_build', (('topic', 'Test'),))]['count'] == 1
+    assert ('json_decode', (('topic', 'Test'),)) in timers
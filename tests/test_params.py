@@ -0,0 +1,18 @@
+import argparse
+import pytest
+import params
+from catalog import LATEST_YEAR
+
+def test_parse_years_accepts_ranges_and_lists():
+    assert params.parse_years('2022-2024') == [2022, 2023, 2024]
+    assert params.parse_years('2025,2030-2031') == [2025, 2030, 2031]
+
+@pytest.mark.parametrize('text', ['abc', '2030-abc', '2016-2020', str(LATEST_YEAR)])
+def test_parse_years_rejects_bad_or_past_years(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        params.parse_years(text)
+
+def test_parse_states():
+    assert params.parse_states('all') is None
+    assert params.parse_states(' ALL ') is None
+    assert params.parse_states('Assam, J&K,') == ['Assam', 'J&K']
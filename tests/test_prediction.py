@@ -0,0 +1,39 @@
+import pytest
+import prediction
+from storage import read_dataset
+
+PLASTIC = 'data/SavedData/plastic_waste_data.csv'
+WASTEWATER = 'data/SavedData/wastewater_data.csv'
+
+@pytest.mark.parametrize('model', prediction.TREND_MODELS)
+def test_plastic_batch_matches_single_predictions(model):
+    df = read_dataset(PLASTIC)
+    batch = prediction.predict_plastic_waste_batch(df, years=[2022, 2030], model=model)
+    assert len(batch) == 2 * batch['state'].nunique()
+    for row in batch.itertuples():
+        single, impacts = prediction.predict_plastic_waste(df, row.state, row.year, model=model)
+        assert row.predicted_waste_tonnes == pytest.approx(single)
+        assert [row.environmental_impact, row.economic_impact] == impacts
+
+def test_wastewater_batch_matches_single_predictions():
+    df = read_dataset(WASTEWATER)
+    batch = prediction.predict_wastewater_bod_batch(df, years=[2025])
+    assert len(batch) > 0
+    for row in batch.itertuples():
+        single, impacts = prediction.predict_wastewater_bod(df, row.state, row.year)
+        assert row.predicted_bod_tpd == pytest.approx(single)
+        assert [row.ecological_impact, row.social_impact] == impacts
+        assert row.impact_level == prediction.IMPACT_LEVELS[prediction.impact_level(single, prediction.BOD_IMPACT_THRESHOLDS)]
+
+def test_batch_keeps_the_requested_states_in_order():
+    df = read_dataset(PLASTIC)
+    batch = prediction.predict_plastic_waste_batch(df, ['orissa', 'Assam'], [2024, 2025, 2026])
+    assert batch['state'].tolist() == ['Odisha'] * 3 + ['Assam'] * 3
+    assert batch['year'].tolist() == [2024, 2025, 2026] * 2
+
+def test_batch_rejects_unknown_states():
+    df = read_dataset(PLASTIC)
+    with pytest.raises(ValueError, match="No data found for state\\(s\\): Atlantis, Lemuria"):
+        prediction.predict_plastic_waste_batch(df, ['Assam', 'Atlantis', 'Lemuria'])
+    assert prediction.predict_plastic_waste(df, 'Atlantis', 2025) == (None, "No data found for state: Atlantis")
+    assert prediction.predict_plastic_waste_batch(df, []).empty
@@ -0,0 +1,59 @@
+import os
+import pandas as pd
+import charts
+import render
+from storage import read_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLASTIC = os.path.join(REPO_ROOT, 'data', 'SavedData', 'plastic_waste_data.csv')
+WASTEWATER = os.path.join(REPO_ROOT, 'data', 'SavedData', 'wastewater_data.csv')
+
+def test_all_state_jobs_cover_every_state_and_chart(tmp_path):
+    df = read_dataset(PLASTIC)
+    jobs = charts.all_state_jobs(df, str(tmp_path), '2020-21')
+    assert len(jobs) == 4 * len(df) + 1
+    assert jobs[-1]['chart'] == 'comparison'
+
+def test_all_state_jobs_follow_the_region_field(tmp_path):
+    df = pd.DataFrame({'state_name': ['Goa', 'Orissa', 'Total'], '_2019_20': [1.0, 2.0, 3.0], '_2020_21': [2.0, 3.0, 5.0]})
+    jobs = charts.all_state_jobs(df, str(tmp_path))
+    assert [job['state'] for job in jobs[::4]] == ['Goa', 'Orissa']
+
+def test_unknown_state_and_year_produce_no_jobs(tmp_path):
+    df = read_dataset(PLASTIC)
+    assert charts.plastic_state_jobs(df, 'Atlantis', str(tmp_path)) == []
+    assert charts.plastic_comparison_job(df, '1999-00', str(tmp_path)) is None
+
+def test_render_jobs_in_worker_processes(tmp_path):
+    jobs = charts.wastewater_jobs(read_dataset(WASTEWATER), str(tmp_path / 'out'))
+    saved = render.render_jobs(jobs, workers=2)
+    assert saved == [job['path'] for job in jobs]
+    assert all(os.path.getsize(path) > 0 for path in saved)
+
+def test_reused_figures_match_fresh_renders(tmp_path):
+    from matplotlib.image import imread
+    df = read_dataset(PLASTIC)
+    renderer = render.ChartRenderer()
+    for state in ('Goa', 'Assam'):
+        jobs = charts.plastic_state_jobs(df, state, str(tmp_path))
+        for job in jobs:
+            renderer.render(job)
+    for job in jobs:
+        fresh = dict(job, path=job['path'] + '.fresh.png')
+        render.ChartRenderer().render(fresh)
+        assert (imread(job['path']) == imread(fresh['path'])).all()
+    assert len(renderer._charts) == 4
+
+def test_bar_pool_grows_and_hides_surplus(tmp_path):
+    wastewater = read_dataset(WASTEWATER)
+    renderer = render.ChartRenderer()
+    full = charts.wastewater_jobs(wastewater, str(tmp_path))[0]
+    short = charts.wastewater_jobs(wastewater.iloc[:2], str(tmp_path))[0]
+    renderer.render(short)
+    renderer.render(full)
+    renderer.render(short)
+    bars = renderer._charts[('wastewater_discharge', (10, 6))]['bars'][0]
+    assert len(bars) == len(full['y'])
+    assert [bar.get_visible() for bar in bars].count(True) == len(short['y'])
+    renderer.close()
+    assert renderer._charts == {}
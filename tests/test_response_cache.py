@@ -0,0 +1,49 @@
+import time
+from aiohttp import web
+import api
+from response_cache import ResponseCache, cache_key
+
+def etag_handler(hits):
+    async def handler(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            hits.append(304)
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        hits.append(200)
+        return web.json_response({'total': 2, 'records': [{'state': 'Assam'}, {'state': 'Bihar'}]},
+                                 headers={'ETag': '"v1"'})
+    return handler
+
+def fetch(cache):
+    return lambda url: api.fetch_data_async(url, 'Test', quiet=True, cache=cache)
+
+def test_fresh_entry_is_served_without_a_request(run_stub, tmp_path):
+    hits = []
+    cache = ResponseCache(str(tmp_path), ttl=3600)
+    first = run_stub(etag_handler(hits), fetch(cache))
+    second = run_stub(etag_handler(hits), fetch(cache))
+    assert hits == [200]
+    assert second.equals(first)
+
+def test_stale_entry_is_revalidated_and_body_reused(run_stub, tmp_path):
+    hits = []
+    run_stub(etag_handler(hits), fetch(ResponseCache(str(tmp_path), ttl=3600)))
+    df = run_stub(etag_handler(hits), fetch(ResponseCache(str(tmp_path), ttl=0)))
+    assert hits == [200, 304]
+    assert df['state'].tolist() == ['Assam', 'Bihar']
+
+def test_cache_key_ignores_api_key_and_param_order():
+    a = cache_key('https://api.data.gov.in/resource/abc?api-key=one&format=json', {'offset': 0, 'limit': 100})
+    b = cache_key('https://api.data.gov.in/resource/abc?format=json&api-key=two', {'limit': '100', 'offset': '0'})
+    c = cache_key('https://api.data.gov.in/resource/abc?format=json', {'offset': 100, 'limit': 100})
+    assert a == b
+    assert a != c
+
+def test_eviction_drops_least_recently_used_first(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+    for key in ('a', 'b', 'c'):
+        cache.store(key, b'x' * 100)
+        time.sleep(0.01)
+    cache.touch('a', cache.lookup('a'))
+    assert cache.evict() == ['b']
+    assert cache.lookup('b') is None and cache.read_body('b') is None
+    assert ResponseCache(str(tmp_path), max_bytes=250).total_bytes() == 200
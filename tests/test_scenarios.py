@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pytest
+import prediction
+import scenarios
+from storage import read_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLASTIC_PATH = os.path.join(REPO_ROOT, 'data', 'SavedData', 'plastic_waste_data.csv')
+PERIODS = np.arange(2017, 2022)
+
+def test_growth_model_measures_growth_and_spread():
+    steady = 1000 * 1.1 ** np.arange(5)
+    values = np.array([steady, [np.nan, np.nan, np.nan, np.nan, 500], [np.nan] * 5, [100, np.nan, 121, np.nan, 146.41]])
+    model = scenarios.growth_model(values, PERIODS, fallback_growth=0.02)
+    assert model['growth'][0] == pytest.approx(np.log(1.1))
+    assert model['growth_spread'][0] == scenarios.MIN_GROWTH_SPREAD
+    assert model['baseline_spread'][0] == pytest.approx(0, abs=1e-9)
+    assert model['last'][1] == 500 and model['growth'][1] == pytest.approx(np.log(1.02))
+    assert model['growth_spread'][1] == scenarios.DEFAULT_GROWTH_SPREAD
+    assert np.isnan(model['last'][2])
+    # A gap year gives one rate over two years, not a missing one.
+    assert model['growth'][3] == pytest.approx(np.log(1.1))
+
+def test_project_bands_and_probabilities():
+    values = np.array([1000 * 1.1 ** np.arange(5), 40 * 1.05 ** np.arange(5)])
+    model = scenarios.growth_model(values, PERIODS)
+    years = np.array([2025, 2030])
+    result = scenarios.project(model, years, (50, 2000), scenarios=20_000, seed=3)
+    bands = result['percentiles']
+    assert all((bands[low] <= bands[high]).all() for low, high in zip(scenarios.PERCENTILES, scenarios.PERCENTILES[1:]))
+    assert bands[50][0, 0] == pytest.approx(1000 * 1.1 ** 8, rel=0.01)
+    assert np.allclose(result['probabilities'].sum(axis=-1), 1.0)
+    assert result['probabilities'][0, 1, 2] > 0.9  # 1000 growing 10% a year is past 2000 by 2030
+    assert result['probabilities'][1, 0, 1] == 1.0  # 48.6 in 2021 is about 59 in 2025
+    # A threshold at the median splits the scenarios in half.
+    median = float(bands[50][1, 0])
+    split = scenarios.project(model, years, (median, 2000), scenarios=20_000, seed=3)
+    assert split['probabilities'][1, 0, 0] == pytest.approx(0.5, abs=0.01)
+
+def test_project_is_reproducible_with_a_seed():
+    model = scenarios.growth_model(np.array([[10, 12, 11, 15, 14.0]]), PERIODS)
+    first = scenarios.project(model, [2030], (12, 20), scenarios=1000, seed=7)
+    second = scenarios.project(model, [2030], (12, 20), scenarios=1000, seed=7)
+    other = scenarios.project(model, [2030], (12, 20), scenarios=1000, seed=8)
+    assert np.array_equal(first['percentiles'][50], second['percentiles'][50])
+    assert not np.array_equal(first['percentiles'][50], other['percentiles'][50])
+
+def test_project_chunks_rows(monkeypatch):
+    values = np.tile([10, 12, 11, 15, 14.0], (7, 1))
+    model = scenarios.growth_model(values, PERIODS)
+    monkeypatch.setattr(scenarios, 'CHUNK_VALUES', 3 * 2 * 500)
+    result = scenarios.project(model, [2025, 2030], (12, 20), scenarios=500, seed=1)
+    assert result['percentiles'][5].shape == (7, 2) and result['probabilities'].shape == (7, 2, 3)
+
+def test_plastic_scenarios_frame():
+    df = read_dataset(PLASTIC_PATH)
+    frame = prediction.predict_plastic_waste_scenarios(df, ['Kerala', 'Assam'], [2025, 2030], scenarios=2000, seed=0)
+    assert frame['state'].tolist() == ['Kerala', 'Kerala', 'Assam', 'Assam']
+    assert list(frame.columns[2:]) == [f"waste_tonnes_p{p}" for p in scenarios.PERCENTILES] + \
+        ['probability_low', 'probability_moderate', 'probability_high']
+    assert np.allclose(frame.filter(like='probability_').sum(axis=1), 1.0)
+    with pytest.raises(ValueError, match="No data found for state"):
+        prediction.predict_plastic_waste_scenarios(df, ['Atlantis'], [2030], scenarios=10)
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import aiohttp
+from aiohttp import web
+import server
+
+def run_server(client, workers=1):
+    async def main():
+        runner = web.AppRunner(server.create_app(workers=workers))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with aiohttp.ClientSession(f"http://127.0.0.1:{port}") as session:
+                return await client(session, runner.app)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+async def get(session, path, **params):
+    async with session.get(path, params=params) as response:
+        body = await response.read()
+        return response.status, response.content_type, body
+
+def test_predict_endpoint():
+    async def client(session, app):
+        async with session.get('/predict/plastic', params={'states': 'Assam,Goa', 'years': '2022-2023'}) as response:
+            assert response.status == 200
+            payload = await response.json()
+        assert [(row['state'], row['year']) for row in payload['predictions']] == [
+            ('Assam', 2022), ('Assam', 2023), ('Goa', 2022), ('Goa', 2023)]
+        assert {row['impact_level'] for row in payload['predictions']} <= {'Low', 'Moderate', 'High'}
+        return [await get(session, '/predict/plastic', states='Atlantis'),
+                await get(session, '/predict/plastic', years='2010'),
+                await get(session, '/predict/nothing')]
+    statuses = [status for status, _, _ in run_server(client)]
+    assert statuses == [404, 400, 404]
+
+def test_concurrent_chart_requests_share_one_render():
+    async def client(session, app):
+        requests = [get(session, '/charts/plastic/line.png', state='Assam') for _ in range(150)]
+        requests += [get(session, '/predict/wastewater', years='2025') for _ in range(150)]
+        results = await asyncio.gather(*requests)
+        return results, app[server.PNGS].renders
+    results, renders = run_server(client)
+    assert all(status == 200 for status, _, _ in results)
+    charts = {body for status, content_type, body in results if content_type == 'image/png'}
+    assert len(charts) == 1 and next(iter(charts)).startswith(b'\x89PNG')
+    assert renders == 1
+
+def test_chart_errors():
+    async def client(session, app):
+        return [(await get(session, path, **params))[0] for path, params in [
+            ('/charts/plastic/line.png', {'state': 'Atlantis'}),
+            ('/charts/plastic/comparison.png', {}),
+            ('/charts/wastewater/pie.png', {}),
+            ('/charts/wastewater/bod_load.png', {}),
+        ]]
+    assert run_server(client) == [404, 404, 404, 200]
+
+def test_metrics_endpoint_includes_worker_render_times():
+    import metrics
+    metrics.reset()
+    metrics.enable(events=False)
+
+    async def client(session, app):
+        await get(session, '/charts/plastic/bar.png', state='Assam')
+        await get(session, '/charts/plastic/bar.png', state='Assam')
+        await get(session, '/predict/nothing')
+        return await get(session, '/metrics')
+    try:
+        status, content_type, body = run_server(client)
+    finally:
+        metrics.disable()
+        metrics.reset()
+    text = body.decode('utf-8')
+    assert status == 200 and content_type == 'text/plain'
+    assert 'dharti_span_seconds_count{span="savefig",chart="bar"} 1' in text
+    assert 'dharti_png_cache_hits_total 1' in text
+    assert 'dharti_requests_total{route="/predict/{dataset}",status="404"} 1' in text
+
+def test_predictions_run_off_the_event_loop(monkeypatch):
+    # While a prediction blocks its thread, the loop keeps answering other requests.
+    entered, release = threading.Event(), threading.Event()
+    predict = server.PREDICTORS['plastic']
+
+    def slow_predict(*args, **kwargs):
+        entered.set()
+        release.wait(10)
+        return predict(*args, **kwargs)
+
+    monkeypatch.setitem(server.PREDICTORS, 'plastic', slow_predict)
+
+    async def client(session, app):
+        finished = []
+
+        async def tracked(name, path, **params):
+            status = (await get(session, path, **params))[0]
+            finished.append(name)
+            return status
+
+        prediction = asyncio.ensure_future(tracked('predict', '/predict/plastic', states='Assam', years='2025'))
+        await asyncio.to_thread(entered.wait, 10)
+        health = await tracked('health', '/health')
+        release.set()
+        return [await prediction, health], finished
+    assert run_server(client) == ([200, 200], ['health', 'predict'])
+
+def test_server_does_not_import_the_cli():
+    result = subprocess.run([sys.executable, '-c', "import server, sys; print('app' in sys.modules)"],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'False'
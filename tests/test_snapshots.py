@@ -0,0 +1,66 @@
+import csv
+import os
+import pytest
+import app
+from snapshots import SnapshotStore, format_diff, read_csv_rows
+
+COLUMNS = ['state', 'value']
+ROWS = [['Assam', '10'], ['Bihar', 'NA'], ['Goa', '3']]
+
+def files_under(path):
+    return sorted(os.path.relpath(os.path.join(d, f), path) for d, _, names in os.walk(path) for f in names)
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = store.commit('demo', COLUMNS, ROWS, ref='api')
+    before = files_under(tmp_path)
+    assert store.commit('demo', COLUMNS, [list(row) for row in ROWS], ref='api') == first
+    assert files_under(tmp_path) == before
+    assert store.rows('demo', first) == (COLUMNS, ROWS)
+
+def test_rows_are_shared_between_versions(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = store.commit('demo', COLUMNS, ROWS)
+    second = store.commit('demo', COLUMNS, ROWS[:2] + [['Goa', '4'], ['Kerala', '7']])
+    assert [m['new_rows'] for m in store.history('demo')] == [3, 2]
+    # A fresh store reads everything back from disk.
+    assert SnapshotStore(tmp_path).rows('demo', first) == (COLUMNS, ROWS)
+    assert second != first
+
+def test_diff_pairs_rows_by_key(tmp_path):
+    store = SnapshotStore(tmp_path)
+    old = store.commit('demo', COLUMNS, ROWS)
+    new = store.commit('demo', COLUMNS, [['Assam', '10'], ['Goa', '4'], ['Kerala', '7']])
+    diff = store.diff('demo', old, new, key='state')
+    assert diff['changed'] == [('Goa', {'value': ('3', '4')})]
+    assert [row['state'] for row in diff['added']] == ['Kerala']
+    assert [row['state'] for row in diff['removed']] == ['Bihar']
+    assert diff['unchanged'] == 1
+    assert '1 added, 1 removed, 1 changed, 1 unchanged rows' in format_diff(diff, key='state')
+
+def test_export_round_trips_csv_text(tmp_path):
+    store = SnapshotStore(tmp_path / 'store')
+    source = tmp_path / 'source.csv'
+    with open(source, 'w', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows([COLUMNS, ['Jammu, Kashmir', '0012'], *ROWS])
+    snapshot = store.commit_csv('demo', str(source), ref='saved')
+    assert store.resolve('demo', 'saved') == snapshot
+    exported = store.export_csv('demo', snapshot, str(tmp_path / 'out.csv'))
+    assert read_csv_rows(exported) == read_csv_rows(str(source))
+
+def test_update_saved_shows_diff_and_keeps_history(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    for source in app.DATA_DIRS:
+        monkeypatch.setitem(app.DATA_DIRS, source, str(tmp_path / source))
+        os.makedirs(tmp_path / source)
+    saved_path, api_path = app.dataset_path('wastewater', 'saved'), app.dataset_path('wastewater', 'api')
+    with open(saved_path, 'w') as f:
+        f.write("state,no__of_gpis,wastewater_discharge__mld_,bod_load__tpd_\nBihar,328,40.3,1.2\n")
+    with open(api_path, 'w') as f:
+        f.write("state,no__of_gpis,wastewater_discharge__mld_,bod_load__tpd_\nBihar,328,41.0,1.2\n")
+    assert app.review_saved_update('wastewater', api_path, lambda: False) is False
+    assert 'Bihar: wastewater_discharge__mld_ 40.3 -> 41.0' in capsys.readouterr().out
+    assert app.review_saved_update('wastewater', api_path, lambda: True) is True
+    assert open(saved_path).read() == open(api_path).read()
+    assert app.review_saved_update('wastewater', api_path, pytest.fail) is False
+    assert len(SnapshotStore().history('wastewater')) == 2
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = {'pandas', 'numpy', 'matplotlib', 'aiohttp'}
+# Importing app.py took about 1.5 s while it imported pyplot, pandas and aiohttp eagerly.
+# Which modules it pulls in is checked rather than how long that takes, which depends on
+# the machine: only the standard library and these light modules of the project.
+STARTUP_MODULES = {'app', 'catalog', 'params'}
+
+def import_times(args, stdin=None):
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=REPO_ROOT,
+                            input=stdin, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('| imported package'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+    return times
+
+@pytest.mark.parametrize('args,stdin', [
+    (['-c', 'import app'], None),
+    (['app.py', '--help'], None),
+    (['app.py'], '0\n'),
+], ids=['import', 'help', 'menu-exit'])
+def test_startup_skips_heavy_modules(args, stdin):
+    times = import_times(args, stdin)
+    assert not HEAVY_MODULES & {name.split('.')[0] for name in times}
+
+def test_app_imports_only_light_modules():
+    # Compared with a bare interpreter, whose site hooks import modules of their own.
+    baseline = set(import_times(['-c', 'pass']))
+    imported = {name.split('.')[0] for name in set(import_times(['-c', 'import app'])) - baseline}
+    assert imported - set(sys.stdlib_module_names) == STARTUP_MODULES
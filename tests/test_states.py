@@ -0,0 +1,24 @@
+import pytest
+from states import build_state_index, normalize_state_name, state_key
+
+@pytest.mark.parametrize('name,key', [
+    ('J&K', 'jammu and kashmir'),
+    ('Jammu & Kashmir', 'jammu and kashmir'),
+    ('NCT of Delhi', 'delhi'),
+    ('Orissa', 'odisha'),
+    ('A&N Islands', 'andaman and nicobar islands'),
+    ('Andaman & Nicobar Islands', 'andaman and nicobar islands'),
+    ('  tamil   NADU ', 'tamil nadu'),
+    ('The Dadra & Nagar Haveli and Daman & Diu', 'dadra and nagar haveli and daman and diu'),
+])
+def test_state_key_matches_aliases_case_and_punctuation(name, key):
+    assert state_key(name) == key
+
+def test_normalize_keeps_digits_and_drops_punctuation():
+    assert normalize_state_name('Uttar-Pradesh.') == 'uttar pradesh'
+    assert normalize_state_name(2021) == '2021'
+
+def test_index_keeps_the_first_row_of_each_state():
+    index = build_state_index(['Odisha', None, 'Delhi', 'orissa', float('nan'), 'NCT of Delhi'])
+    assert index == {'odisha': 0, 'delhi': 2}
+    assert index[state_key('Orissa')] == 0 and index[state_key('New Delhi')] == 2
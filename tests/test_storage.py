@@ -0,0 +1,54 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import storage
+
+def test_store_round_trip_keeps_types_and_missing_names(tmp_path):
+    df = pd.DataFrame({
+        'state_ut_wise': ['Assam', None, 'Bihar'],
+        'lgd_code': ['018', '010', '005'],
+        '_2020_21': ['58765', 'NA', '74263.69'],
+    })
+    store_path = storage.write_store(df, str(tmp_path / 'x.npstore'))
+    loaded = storage.read_store(store_path)
+    assert loaded['state_ut_wise'].isna().tolist() == [False, True, False]
+    assert loaded['lgd_code'].tolist() == ['018', '010', '005']
+    assert loaded['_2020_21'].dtype == np.float64
+    assert np.isnan(loaded['_2020_21'][1])
+
+def test_read_dataset_uses_current_store_and_column_subset(tmp_path):
+    csv_path = str(tmp_path / 'plastic.csv')
+    storage.save_dataset(pd.DataFrame({'state_ut_wise': ['Goa'], '_2019_20': ['26068']}), csv_path)
+    loaded = storage.read_dataset(csv_path, columns=['_2019_20'])
+    assert loaded['_2019_20'].tolist() == [26068]
+    assert list(loaded.columns) == ['_2019_20']
+    with open(csv_path, 'a') as f:
+        f.write('Kerala,131400\n')
+    assert len(storage.read_dataset(csv_path)) == 2
+
+def test_load_dataset_parses_each_version_once(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'plastic.csv'
+    csv_path.write_text('state_ut_wise,_2019_20\nGoa,26068\n')
+    parses = []
+    read_dataset = storage.read_dataset
+    monkeypatch.setattr(storage, 'read_dataset', lambda path: parses.append(path) or read_dataset(path))
+    from prediction import is_file_valid
+
+    assert is_file_valid(str(csv_path))
+    df = storage.load_dataset(str(csv_path))
+    assert storage.load_dataset(str(csv_path)) is df and len(parses) == 1
+    with pytest.raises(ValueError, match="read-only"):
+        df.loc[0, '_2019_20'] = 0
+    copy = df.copy()
+    copy.loc[0, '_2019_20'] = 0
+    assert df.loc[0, '_2019_20'] == 26068
+
+    # Same bytes with a new mtime: rehashed, not parsed again.
+    os.utime(csv_path, ns=(1, 1))
+    assert storage.load_dataset(str(csv_path)) is df and len(parses) == 1
+
+    csv_path.write_text('state_ut_wise,_2019_20\nGoa,26068\nKerala,131400\n')
+    changed = storage.load_dataset(str(csv_path))
+    assert changed is not df and len(changed) == 2 and len(parses) == 2
+    assert storage.load_versioned(str(csv_path))[0] == storage.content_hash(str(csv_path))
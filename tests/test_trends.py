@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+import prediction
+import trends
+from storage import read_dataset
+
+TIMES = [-4, -3, -2, -1, 0]
+
+def test_linear_fit_ignores_missing_cells():
+    values = np.array([[10, np.nan, 30, 40, np.nan], [5, 5, 5, 5, 5]], dtype=float)
+    params = trends.fit_trends(TIMES, values)
+    assert params['slope'] == pytest.approx([10, 0])
+    assert trends.evaluate_trends(params, [1, 2]) == pytest.approx(np.array([[60, 70], [5, 5]]))
+
+def test_linear_fit_floors_at_zero():
+    params = trends.fit_trends(TIMES, [[50, 40, 30, 20, 10]])
+    assert trends.evaluate_trends(params, [2]).tolist() == [[0.0]]
+
+def test_auto_model_follows_the_log_trend_of_a_falling_line():
+    values = np.array([[50, 40, 30, 20, 10], [10, 20, 30, 40, 50]], dtype=float)
+    auto = trends.evaluate_trends(trends.fit_trends(TIMES, values, model='auto'), [2, 9])
+    loglinear = trends.evaluate_trends(trends.fit_trends(TIMES, values, model='loglinear'), [2, 9])
+    assert auto[0] == pytest.approx(loglinear[0]) and (auto[0] > 0).all()
+    assert auto[1] == pytest.approx([70, 140])
+
+def test_default_model_never_predicts_zero():
+    df = read_dataset('data/SavedData/plastic_waste_data.csv')
+    batch = prediction.predict_plastic_waste_batch(df, years=[2025, 2030])
+    assert (batch['predicted_waste_tonnes'].dropna() > 0).all()
+    andhra, _ = prediction.predict_plastic_waste(df, 'Andhra Pradesh', 2030)
+    assert 0 < andhra < 39626.45
+
+def test_loglinear_fit_recovers_growth_rate():
+    values = 100 * 1.1 ** np.array([TIMES], dtype=float)
+    values[0, 1] = np.nan
+    params = trends.fit_trends(TIMES, values, model='loglinear')
+    assert trends.evaluate_trends(params, [3])[0, 0] == pytest.approx(100 * 1.1 ** 3)
+
+def test_short_history_falls_back_to_growth_rate():
+    values = np.array([[np.nan, np.nan, np.nan, np.nan, 2.0], [np.nan] * 5])
+    predicted = trends.evaluate_trends(trends.fit_trends(TIMES, values, fallback_growth=0.01), [4])
+    assert predicted[0, 0] == pytest.approx(2.0 * 1.01 ** 4)
+    assert np.isnan(predicted[1, 0])
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError):
+        trends.fit_trends(TIMES, [[1, 2, 3, 4, 5]], model='cubic')
+
+def test_fits_are_reused_until_the_data_changes():
+    trends.clear_cache()
+    df = read_dataset('data/SavedData/plastic_waste_data.csv')
+    prediction.predict_plastic_waste(df, 'Assam', 2025)
+    prediction.predict_plastic_waste(df, 'Goa', 2030)
+    prediction.predict_plastic_waste(df.copy(), 'Goa', 2030)
+    assert trends.cache_stats == {'hits': 2, 'misses': 1}
+    changed = df.copy()
+    changed.loc[0, '_2020_21'] = 1.0
+    prediction.predict_plastic_waste(changed, 'Assam', 2025)
+    assert trends.cache_stats['misses'] == 2
+
+def test_in_place_edit_gives_a_new_prediction():
+    df = read_dataset('data/SavedData/plastic_waste_data.csv')
+    state = df['state_ut_wise'].iloc[0]
+    before, _ = prediction.predict_plastic_waste(df, state, 2025)
+    df.loc[0, '_2020_21'] = 9e6
+    after, _ = prediction.predict_plastic_waste(df, state, 2025)
+    assert after == pytest.approx(prediction.predict_plastic_waste(df.copy(), state, 2025)[0])
+    assert after > before
+
+def test_batch_matches_single_predictions():
+    df = read_dataset('data/SavedData/plastic_waste_data.csv')
+    batch = prediction.predict_plastic_waste_batch(df, ['Assam', 'Delhi'], [2024, 2030], model='loglinear')
+    for row in batch.itertuples():
+        single, _ = prediction.predict_plastic_waste(df, row.state, row.year, model='loglinear')
+        assert row.predicted_waste_tonnes == pytest.approx(single)
+
+def test_wastewater_keeps_one_percent_growth():
+    df = read_dataset('data/SavedData/wastewater_data.csv')
+    bihar = float(df.loc[df['state'] == 'Bihar', 'bod_load__tpd_'].iloc[0])
+    predicted, _ = prediction.predict_wastewater_bod(df, 'Bihar', prediction.LATEST_YEAR + 4)
+    assert predicted == pytest.approx(bihar * 1.01 ** 4)
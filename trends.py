@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import metrics
+from catalog import TREND_MODELS as MODELS
+
+MAX_CACHED_FITS = 32
+
+_fit_cache = OrderedDict()
+_fit_lock = threading.Lock()
+cache_stats = {'hits': 0, 'misses': 0}
+
+def fit_trends(times, values, model='linear', fallback_growth=0.0):
+    # One least-squares line per row of `values` (states x periods), all rows at once.
+    # Missing cells are masked out of every sum. Rows with fewer than two usable points
+    # cannot show a trend and grow from their mean at `fallback_growth` per year instead.
+    if model not in MODELS:
+        raise ValueError(f"Unknown trend model: {model} (choose from {', '.join(MODELS)})")
+    if model == 'auto':
+        linear = fit_trends(times, values, 'linear', fallback_growth)
+        loglinear = fit_trends(times, values, 'loglinear', fallback_growth)
+        falling = ~linear['log'] & (linear['slope'] < 0)
+        return {key: np.where(falling, loglinear[key], linear[key]) for key in linear}
+    values = np.asarray(values, dtype=float)
+    times = np.broadcast_to(np.asarray(times, dtype=float), values.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y = np.log(np.where(values > 0, values, np.nan)) if model == 'loglinear' else values
+        mask = ~np.isnan(y)
+        points = mask.sum(axis=1)
+        t_mean = np.where(mask, times, 0).sum(axis=1) / points
+        y_mean = np.where(mask, y, 0).sum(axis=1) / points
+        dt = np.where(mask, times - t_mean[:, None], 0)
+        dy = np.where(mask, y - y_mean[:, None], 0)
+        spread = (dt * dt).sum(axis=1)
+        slope = (dt * dy).sum(axis=1) / spread
+        intercept = y_mean - slope * t_mean
+        log_scale = np.full(len(values), model == 'loglinear')
+
+        flat = (points < 2) | ~(spread > 0)
+        observed = ~np.isnan(values)
+        mean_value = np.where(observed, values, 0).sum(axis=1) / observed.sum(axis=1)
+        mean_time = np.where(observed, times, 0).sum(axis=1) / observed.sum(axis=1)
+        growth = np.log1p(fallback_growth)
+        use_growth = flat & (mean_value > 0)
+        slope = np.where(flat, np.where(use_growth, growth, 0.0), slope)
+        intercept = np.where(use_growth, np.log(np.where(use_growth, mean_value, 1.0)) - growth * mean_time,
+                             np.where(flat, mean_value, intercept))
+        log_scale = np.where(flat, use_growth, log_scale)
+    return {'intercept': intercept, 'slope': slope, 'log': log_scale, 'points': observed.sum(axis=1)}
+
+def evaluate_trends(params, times, rows=None):
+    intercept, slope, log_scale = params['intercept'], params['slope'], params['log']
+    if rows is not None:
+        intercept, slope, log_scale = intercept[rows], slope[rows], log_scale[rows]
+    line = intercept[:, None] + slope[:, None] * np.asarray(times, dtype=float)[None, :]
+    with np.errstate(over='ignore'):
+        # A falling straight line is floored at zero rather than predicting negative amounts.
+        return np.where(log_scale[:, None], np.exp(line), np.maximum(line, 0.0))
+
+def fitted_trends(panel, times, model='linear', fallback_growth=0.0):
+    # panel is a longform region panel; its content hash identifies the fit.
+    key = (panel['hash'], tuple(times), model, fallback_growth)
+    with _fit_lock:
+        params = _fit_cache.get(key)
+        if params is not None:
+            _fit_cache.move_to_end(key)
+    if params is not None:
+        cache_stats['hits'] += 1
+        metrics.count('trend_cache_hits', model=model)
+        return params
+    cache_stats['misses'] += 1
+    metrics.count('trend_cache_misses', model=model)
+    with metrics.span('trend_fit', model=model):
+        params = fit_trends(times, panel['values'], model, fallback_growth)
+    with _fit_lock:
+        _fit_cache[key] = params
+        if len(_fit_cache) > MAX_CACHED_FITS:
+            _fit_cache.popitem(last=False)
+    return params
+
+def clear_cache():
+    _fit_cache.clear()
+    cache_stats.update(hits=0, misses=0)